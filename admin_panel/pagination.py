@@ -0,0 +1,266 @@
+"""
+admin_panel/pagination.py - Keyset (cursor) pagination for admin list views
+
+Pages continue strictly after (or before) the last row seen on a unique
+ordering such as (created_at, id), so every page is an index range scan of
+`page_size + 1` rows: page 500 costs the same as page 1, and no COUNT(*)
+runs over the filtered queryset. The position travels in an opaque `cursor`
+query parameter; every other filter parameter is kept as is.
+
+Pages cannot jump to an arbitrary number, so the pager only links to the
+first, previous, next and last pages. The last page is read backwards from
+the end of the ordering. Totals are estimates (rollups, pg_class or the
+planner) and are labelled as such in the templates, so on PostgreSQL the
+page numbers counted back from the last page are approximate too.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import Http404
+
+from core.keyset import keyset_filter
+
+
+def _reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+def _field_name(order_field):
+    return order_field.lstrip('-')
+
+
+def encode_cursor(values, direction, start_index):
+    """Opaque cursor for the rows after ('n') or before ('p') `values`, or the last page ('l')."""
+    payload = json.dumps({'v': values, 'd': direction, 'i': start_index}, default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor; raises ValueError if it was tampered with."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return payload['v'], payload['d'], int(payload['i'])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def estimate_count(queryset):
+    """
+    Approximate number of rows of a queryset.
+
+    PostgreSQL: pg_class.reltuples for an unfiltered table, otherwise the
+    planner's row estimate. Other backends (development): an exact count.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CursorPaginator:
+    """Paginator-like object for templates: count and num_pages are estimates."""
+
+    is_estimate = True
+
+    def __init__(self, count, per_page):
+        self.count = count
+        self.per_page = per_page
+
+    @property
+    def num_pages(self):
+        return max(1, -(-self.count // self.per_page))
+
+
+class CursorPage:
+    """One page of a keyset paginated queryset, with links to its neighbours."""
+
+    def __init__(self, object_list, paginator, start_index, query_params,
+                 next_cursor=None, previous_cursor=None, last_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = start_index // paginator.per_page + 1
+        self._start_index = start_index
+        self._query_params = query_params
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.last_cursor = last_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def start_index(self):
+        return self._start_index + 1 if self.object_list else 0
+
+    def end_index(self):
+        return self._start_index + len(self.object_list)
+
+    def _query(self, cursor):
+        params = self._query_params.copy()
+        params.pop('cursor', None)
+        params.pop('page', None)
+        if cursor:
+            params['cursor'] = cursor
+        return params.urlencode()
+
+    @property
+    def first_query(self):
+        return self._query(None)
+
+    @property
+    def next_query(self):
+        return self._query(self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._query(self.previous_cursor)
+
+    @property
+    def last_query(self):
+        return self._query(self.last_cursor)
+
+
+class OffsetPage(CursorPage):
+    """Same interface over a regular page, for orderings that are not keyset friendly."""
+
+    def __init__(self, page, query_params):
+        super().__init__(
+            list(page.object_list), page.paginator, page.start_index() - 1 if page.object_list else 0,
+            query_params,
+            next_cursor=str(page.next_page_number()) if page.has_next() else None,
+            previous_cursor=str(page.previous_page_number()) if page.has_previous() else None,
+            last_cursor=str(page.paginator.num_pages) if page.has_next() else None,
+        )
+        self.number = page.number
+
+    def _query(self, cursor):
+        params = self._query_params.copy()
+        params.pop('cursor', None)
+        params.pop('page', None)
+        if cursor:
+            params['page'] = cursor
+        return params.urlencode()
+
+
+class CursorPaginationMixin:
+    """
+    ListView mixin replacing OFFSET pagination with keyset pagination.
+
+    `cursor_ordering` must end in a unique field, e.g. ('-created_at', '-id').
+    Views return None from `get_cursor_ordering()` when the current request
+    needs another ordering (such as ranked search results); those requests
+    fall back to regular page numbers with the same template interface.
+    """
+    cursor_ordering = ('-created_at', '-id')
+
+    def get_cursor_ordering(self):
+        return self.cursor_ordering
+
+    def get_total_estimate(self, queryset):
+        """Approximate total of the filtered queryset, shown next to the pages."""
+        return estimate_count(queryset)
+
+    def paginate_queryset(self, queryset, page_size):
+        ordering = self.get_cursor_ordering()
+        query_params = self.request.GET.copy()
+
+        if ordering is None:
+            paginator = Paginator(queryset, page_size)
+            page = paginator.get_page(self.request.GET.get('page'))
+            offset_page = OffsetPage(page, query_params)
+            return paginator, offset_page, offset_page.object_list, page.has_other_pages()
+
+        ordering = tuple(ordering)
+        key_fields = [_field_name(field) for field in ordering]
+        model_fields = [queryset.model._meta.get_field(name) for name in key_fields]
+
+        total = self.get_total_estimate(queryset)
+        direction, start_index = 'n', 0
+        rows = queryset.order_by(*ordering)
+        limit = page_size
+
+        cursor = self.request.GET.get('cursor')
+        if cursor:
+            try:
+                values, direction, start_index = decode_cursor(cursor)
+                if direction not in ('n', 'p', 'l') or (direction != 'l' and len(values) != len(model_fields)):
+                    raise ValueError(f"Invalid cursor: {cursor}")
+                if direction != 'l':
+                    values = [field.to_python(value) for field, value in zip(model_fields, values)]
+            except (ValueError, TypeError, ValidationError):
+                raise Http404("Página inválida")
+
+            reverse_ordering = _reverse_ordering(ordering)
+            if direction == 'l':
+                # Rows left over after the full pages, so going back from the
+                # last page lands on the same boundaries as going forward
+                rows = queryset.order_by(*reverse_ordering)
+                limit = total % page_size or page_size
+            elif direction == 'p':
+                rows = queryset.order_by(*reverse_ordering).filter(keyset_filter(reverse_ordering, values))
+            else:
+                rows = rows.filter(keyset_filter(ordering, values))
+
+        # One extra row tells whether there is another page in that direction
+        object_list = list(rows[:limit + 1])
+        has_more = len(object_list) > limit
+        object_list = object_list[:limit]
+
+        if direction == 'l':
+            object_list.reverse()
+            start_index = max(total - len(object_list), 0) if has_more else 0
+            has_next, has_previous = False, has_more
+        elif direction == 'p':
+            object_list.reverse()
+            start_index = max(start_index - len(object_list), 0)
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        def key_of(obj):
+            return [getattr(obj, name) for name in key_fields]
+
+        next_cursor = previous_cursor = last_cursor = None
+        if object_list and has_next:
+            next_cursor = encode_cursor(key_of(object_list[-1]), 'n', start_index + len(object_list))
+            last_cursor = encode_cursor([], 'l', 0)
+        if object_list and has_previous:
+            previous_cursor = encode_cursor(key_of(object_list[0]), 'p', start_index)
+
+        paginator = CursorPaginator(total, page_size)
+        page = CursorPage(
+            object_list, paginator, start_index, query_params,
+            next_cursor=next_cursor, previous_cursor=previous_cursor, last_cursor=last_cursor,
+        )
+        return paginator, page, object_list, page.has_other_pages()
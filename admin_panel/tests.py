@@ -1,3 +1,178 @@
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from core.models import User
+from prospects.models import Prospect, ProspectInquiry
+from scoring.models import ScoreResult
+from surveys.models import Survey, SurveySubmission
+
+
+class ProspectListViewQueryTests(TestCase):
+    """The prospect list renders a page in a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            email='admin@example.com', password='test-password', first_name='Admin', last_name='SCG'
+        )
+        cls.survey = Survey.objects.create(title='Diagnóstico', max_score=100)
+
+    def create_prospects(self, count, offset=0):
+        for i in range(offset, offset + count):
+            prospect = Prospect.objects.create(
+                email=f'prospect{i}@example.com',
+                name=f'Prospect {i}',
+                company_name=f'Empresa {i}',
+                initial_source='SURVEY',
+            )
+            ProspectInquiry.objects.create(prospect=prospect, message='Consulta')
+            submission = SurveySubmission.objects.create(
+                prospect=prospect, survey=self.survey, completed_at=timezone.now()
+            )
+            ScoreResult.objects.create(
+                submission=submission,
+                total_points=40 + i,
+                score_percentage=40 + i,
+                risk_level='MODERATE',
+                primary_package='PROTECCION_ESENCIAL',
+            )
+
+    def get_list(self):
+        return self.client.get(reverse('admin_panel:prospects_list'))
+
+    def test_query_count_does_not_depend_on_rows(self):
+        self.client.force_login(self.user)
+        self.create_prospects(3)
+
+        # Warm up the session and measure a small page
+        self.get_list()
+        with self.assertNumQueries(4):
+            response = self.get_list()
+        self.assertEqual(len(response.context['prospects']), 3)
+
+        self.create_prospects(27, offset=3)
+        with self.assertNumQueries(4):
+            response = self.get_list()
+        self.assertEqual(len(response.context['prospects']), 25)
+
+    def test_annotations(self):
+        self.create_prospects(1)
+        prospect = Prospect.objects.with_activity().get()
+
+        self.assertEqual(prospect.inquiry_count, 1)
+        self.assertEqual(prospect.submission_count, 1)
+        self.assertEqual(prospect.latest_score_percentage, 40)
+        self.assertEqual(prospect.latest_risk_level, 'MODERATE')
+        self.assertEqual(prospect.get_latest_score().score_percentage, 40)
+        self.assertIsNotNone(prospect.last_activity_at)
+
+    def test_disabled_submissions_are_not_counted(self):
+        self.create_prospects(1)
+        SurveySubmission.objects.update(status='DISABLED')
+        prospect = Prospect.objects.with_activity().get()
+
+        self.assertEqual(prospect.submission_count, 0)
+        self.assertIsNone(prospect.latest_score_percentage)
+
+
+class ScoreResultListCountTests(TestCase):
+    """The score result list counts every row it can show."""
+
+    def test_disabled_submissions_are_counted(self):
+        user = User.objects.create_superuser(
+            email='admin@example.com', password='test-password', first_name='Admin', last_name='SCG'
+        )
+        survey = Survey.objects.create(title='Diagnóstico', max_score=100)
+        for i, status in enumerate(['ACTIVE', 'DISABLED']):
+            prospect = Prospect.objects.create(
+                email=f'prospect{i}@example.com', name=f'Prospect {i}', company_name='ACME'
+            )
+            submission = SurveySubmission.objects.create(
+                prospect=prospect, survey=survey, status=status, completed_at=timezone.now()
+            )
+            ScoreResult.objects.create(
+                submission=submission, total_points=40, score_percentage=40,
+                risk_level='MODERATE', primary_package='PROTECCION_ESENCIAL',
+            )
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('admin_panel:score_results_list'), {'survey': survey.id})
+
+        self.assertEqual(len(response.context['score_results']), 2)
+        self.assertEqual(response.context['paginator'].count, 2)
+
+
+class CursorPaginationTests(TestCase):
+    """Keyset pages of the prospect list cover every row once, in both directions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            email='admin@example.com', password='test-password', first_name='Admin', last_name='SCG'
+        )
+        cls.create_prospects(60)
+
+    @classmethod
+    def create_prospects(cls, count, offset=0):
+        Prospect.objects.bulk_create(
+            Prospect(email=f'prospect{i}@example.com', name=f'Prospect {i}', company_name='ACME')
+            for i in range(offset, offset + count)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get_page(self, query=''):
+        response = self.client.get(reverse('admin_panel:prospects_list') + '?' + query)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def ids(self, page):
+        return [prospect.id for prospect in page]
+
+    def expected_ids(self):
+        return list(Prospect.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_forward_and_back(self):
+        pages = [self.get_page()]
+        while pages[-1].has_next():
+            pages.append(self.get_page(pages[-1].next_query))
+
+        self.assertEqual([len(page) for page in pages], [25, 25, 10])
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+        self.assertEqual(sum((self.ids(page) for page in pages), []), self.expected_ids())
+
+        back = [pages[-1]]
+        while back[-1].has_previous():
+            back.append(self.get_page(back[-1].previous_query))
+
+        self.assertEqual([self.ids(page) for page in reversed(back)], [self.ids(page) for page in pages])
+        self.assertEqual(self.get_page(back[-1].first_query).number, 1)
+
+    def test_last_page_lines_up_with_the_forward_pages(self):
+        first = self.get_page()
+        last = self.get_page(first.last_query)
+
+        self.assertEqual(self.ids(last), self.expected_ids()[50:])
+        self.assertEqual((last.number, last.start_index()), (3, 51))
+        self.assertFalse(last.has_next())
+
+        middle = self.get_page(last.previous_query)
+        self.assertEqual(self.ids(middle), self.expected_ids()[25:50])
+        self.assertEqual(middle.number, 2)
+
+    def test_next_page_is_stable_under_inserts(self):
+        first = self.get_page()
+        expected_second = self.expected_ids()[25:50]
+
+        # New prospects sort first; the cursor keeps its place after page one
+        self.create_prospects(5, offset=60)
+        second = self.get_page(first.next_query)
+
+        self.assertEqual(self.ids(second), expected_second)
+
+    def test_tampered_cursor(self):
+        response = self.client.get(reverse('admin_panel:prospects_list'), {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, 404)
@@ -6,19 +6,23 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, TemplateView, View, DeleteView
 from django.urls import reverse_lazy
-from django.db.models import Q, Count, Avg, Min, Max
-from django.http import JsonResponse, HttpResponse
+from django.db.models import Q, Count, Avg
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.core.paginator import Paginator
 from django.utils import timezone
 from datetime import timedelta, datetime
-import csv
 
 from surveys.models import Survey, SurveySubmission, SurveySection, Question, QuestionOption
 from prospects.models import Prospect, ProspectInquiry, InteractionNote
-from scoring.models import ScoreResult, SurveyRiskConfiguration, RiskLevelPackageRecommendation, RiskLevel
+from prospects.search import search_filter
+from .pagination import CursorPaginationMixin
+from scoring.models import ScoreResult, ScoreRollup, SurveyRiskConfiguration, RiskLevelPackageRecommendation, RiskLevel
 from scoring.signals import recalculate_scores_for_survey
 from core.models import User
+from core.cache import cached
 from core.email_service import SurveyEmailService
+from core.keyset import keyset_values
+from core.tabular_export import stream_csv, stream_xlsx, CSV_CONTENT_TYPE, XLSX_CONTENT_TYPE
 import json
 
 import logging
@@ -65,6 +69,19 @@ class AdminLogoutView(LoginRequiredMixin, View):
 # DASHBOARD
 # ====================================
 
+@cached('dashboard', timeout=60)
+def get_dashboard_stats():
+    """Dashboard counts, computed once per minute for every worker"""
+    return {
+        'total_prospects': Prospect.objects.count(),
+        'total_surveys': Survey.objects.count(),
+        'active_surveys': Survey.objects.filter(is_active=True).count(),
+        'recent_submissions': SurveySubmission.objects.filter(status='ACTIVE').count(),
+        # Leído desde los rollups, no escanea ScoreResult
+        'score_summary': ScoreRollup.summarize(),
+    }
+
+
 class DashboardView(LoginRequiredMixin, TemplateView):
     """Main dashboard - placeholder for now"""
     template_name = 'admin_panel/dashboard.html'
@@ -72,13 +89,8 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Basic counts for placeholder
-        context.update({
-            'total_prospects': Prospect.objects.count(),
-            'total_surveys': Survey.objects.count(),
-            'active_surveys': Survey.objects.filter(is_active=True).count(),
-            'recent_submissions': SurveySubmission.objects.filter(status='ACTIVE').count(),
-        })
+        # Basic counts for placeholder (shared cache, up to a minute old)
+        context.update(get_dashboard_stats())
         
         return context
 
@@ -87,7 +99,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 # SURVEYS CRUD
 # ====================================
 
-class SurveyListView(LoginRequiredMixin, ListView):
+class SurveyListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """List all surveys with filters"""
     model = Survey
     template_name = 'admin_panel/surveys/list.html'
@@ -178,26 +190,27 @@ class SurveyUpdateView(LoginRequiredMixin, UpdateView):
 # PROSPECTS CRUD
 # ====================================
 
-class ProspectListView(LoginRequiredMixin, ListView):
+class ProspectListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """List all prospects with filters and search"""
     model = Prospect
     template_name = 'admin_panel/prospects/list.html'
     context_object_name = 'prospects'
     paginate_by = 25
     
+    def get_cursor_ordering(self):
+        # Search results are ordered by relevance, not by creation date
+        if self.request.GET.get('search'):
+            return None
+        return self.cursor_ordering
+    
     def get_queryset(self):
-        queryset = Prospect.objects.all().prefetch_related(
-            'inquiries', 'survey_submissions'
-        ).order_by('-created_at')
+        # Conteos y último score anotados: una sola query por página
+        queryset = Prospect.objects.with_activity().order_by('-created_at')
         
-        # Search filter
+        # Search filter (indexed, ranked by relevance on PostgreSQL)
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(company_name__icontains=search)
-            )
+            queryset = queryset.search(search)
         
         # Status filter
         status = self.request.GET.get('status')
@@ -731,19 +744,11 @@ class OptionBulkSaveView(LoginRequiredMixin, View):
 # SCORING VIEWS
 # ====================================
 
-class ScoreResultListView(LoginRequiredMixin, ListView):
-    """Lista todos los resultados de scoring con filtros"""
-    model = ScoreResult
-    template_name = 'admin_panel/scoring/list.html'
-    context_object_name = 'score_results'
-    paginate_by = 25
+class ScoreResultFilterMixin:
+    """Filtros de ScoreResult compartidos por la lista y la exportación"""
     
-    def get_queryset(self):
-        queryset = ScoreResult.objects.select_related(
-            'submission__prospect', 
-            'submission__survey'
-        ).order_by('-calculated_at')
-        
+    def filter_score_results(self, queryset):
+        """Aplica los filtros GET (risk level, survey, score, fecha, búsqueda)."""
         # Filtro por risk level
         risk_level = self.request.GET.get('risk_level')
         if risk_level and risk_level in dict(RiskLevel.choices):
@@ -769,32 +774,106 @@ class ScoreResultListView(LoginRequiredMixin, ListView):
                 pass
         
         # Filtro por fecha
-        date_from = self.request.GET.get('date_from')
-        date_to = self.request.GET.get('date_to')
+        date_from = self._get_date_filter('date_from')
+        date_to = self._get_date_filter('date_to')
         if date_from:
-            try:
-                date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
-                queryset = queryset.filter(calculated_at__date__gte=date_from)
-            except ValueError:
-                pass
+            queryset = queryset.filter(calculated_at__date__gte=date_from)
         if date_to:
-            try:
-                date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
-                queryset = queryset.filter(calculated_at__date__lte=date_to)
-            except ValueError:
-                pass
+            queryset = queryset.filter(calculated_at__date__lte=date_to)
         
-        # Búsqueda por nombre o email del prospect
+        # Búsqueda por nombre, email o empresa del prospect (indexada)
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(submission__prospect__name__icontains=search) |
-                Q(submission__prospect__email__icontains=search) |
-                Q(submission__prospect__company_name__icontains=search)
-            )
+            condition = search_filter(search, prefix='submission__prospect__')
+            if condition is not None:
+                queryset = queryset.filter(condition)
         
         return queryset
     
+    def _get_date_filter(self, name):
+        """Fecha (YYYY-MM-DD) de un filtro GET, o None si falta o es inválida."""
+        value = self.request.GET.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            return None
+
+
+class ScoreResultListView(LoginRequiredMixin, ScoreResultFilterMixin, CursorPaginationMixin, ListView):
+    """Lista todos los resultados de scoring con filtros"""
+    model = ScoreResult
+    template_name = 'admin_panel/scoring/list.html'
+    context_object_name = 'score_results'
+    paginate_by = 25
+    cursor_ordering = ('-calculated_at', '-id')
+    
+    def get_queryset(self):
+        queryset = ScoreResult.objects.select_related(
+            'submission__prospect', 
+            'submission__survey'
+        ).order_by('-calculated_at')
+        
+        return self.filter_score_results(queryset)
+    
+    def get_total_estimate(self, queryset):
+        # Los rollups solo cuentan submissions activas; la lista también
+        # muestra las deshabilitadas, así que solo sirven si no hay ninguna
+        if self._stats_from_rollups() and not self._has_inactive_submissions():
+            return self._get_filtered_stats()['total']
+        return super().get_total_estimate(queryset)
+    
+    def _has_inactive_submissions(self):
+        """Si hay submissions no activas en el survey filtrado (o en todos)."""
+        inactive = SurveySubmission.objects.exclude(status='ACTIVE')
+        survey = self.request.GET.get('survey')
+        if survey:
+            inactive = inactive.filter(survey_id=int(survey))
+        return inactive.exists()
+    
+    def _stats_from_rollups(self):
+        """Si los filtros actuales se pueden responder con ScoreRollup."""
+        if any(self.request.GET.get(name) for name in ('search', 'min_score', 'max_score')):
+            return False
+        survey = self.request.GET.get('survey')
+        return not survey or survey.isdigit()
+    
+    def _get_filtered_stats(self):
+        if not hasattr(self, '_filtered_stats'):
+            self._filtered_stats = self._build_filtered_stats()
+        return self._filtered_stats
+    
+    def _build_filtered_stats(self):
+        """
+        Estadísticas de los resultados filtrados (solo submissions activas).
+        
+        Los filtros por survey, risk level y fecha coinciden con las claves de
+        ScoreRollup, así que se responden leyendo unas pocas filas. La búsqueda
+        y el rango de score necesitan agregar sobre los resultados filtrados.
+        """
+        survey = self.request.GET.get('survey')
+        risk_level = self.request.GET.get('risk_level')
+        if risk_level not in dict(RiskLevel.choices):
+            risk_level = None
+        
+        if self._stats_from_rollups():
+            return ScoreRollup.summarize(
+                survey_id=int(survey) if survey else None,
+                risk_level=risk_level,
+                date_from=self._get_date_filter('date_from'),
+                date_to=self._get_date_filter('date_to'),
+            )
+        
+        active_queryset = self.object_list.filter(submission__status='ACTIVE')
+        return {
+            'total': active_queryset.count(),
+            'avg_score': active_queryset.aggregate(avg=Avg('score_percentage'))['avg'] or 0,
+            'risk_distribution': active_queryset.values('risk_level').annotate(
+                count=Count('id')
+            ).order_by('risk_level')
+        }
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
@@ -814,14 +893,7 @@ class ScoreResultListView(LoginRequiredMixin, ListView):
         }
         
         # Estadísticas rápidas de la query actual
-        current_queryset = self.get_queryset()
-        context['filtered_stats'] = {
-            'total': current_queryset.count(),
-            'avg_score': current_queryset.aggregate(avg=Avg('score_percentage'))['avg'] or 0,
-            'risk_distribution': current_queryset.values('risk_level').annotate(
-                count=Count('id')
-            ).order_by('risk_level')
-        }
+        context['filtered_stats'] = self._get_filtered_stats()
         
         return context
 
@@ -913,28 +985,15 @@ class ScoreResultDetailView(LoginRequiredMixin, DetailView):
                 'excellent': 100 - risk_config.good_max,
             }
         
-        # Estadísticas del mismo survey
-        same_survey_stats = ScoreResult.objects.filter(
-            submission__survey=survey
-        ).aggregate(
-            avg_score=Avg('score_percentage'),
-            min_score=Min('score_percentage'),
-            max_score=Max('score_percentage'),
-            total_count=Count('id')
-        )
+        # Estadísticas del mismo survey (distribución mantenida, sin escanear scores)
+        same_survey_stats = score_result.get_survey_standing()
         
-        if same_survey_stats['total_count'] > 0:
+        if same_survey_stats:
             context['same_survey_stats'] = same_survey_stats
             
-            # Calcular percentil (posición relativa)
-            lower_scores_count = ScoreResult.objects.filter(
-                submission__survey=survey,
-                score_percentage__lt=score_result.score_percentage
-            ).count()
-            
-            if same_survey_stats['total_count'] > 1:
-                percentile = round((lower_scores_count / (same_survey_stats['total_count'] - 1)) * 100)
-                context['score_percentile'] = percentile
+            # Percentil (posición relativa)
+            if same_survey_stats['percentile'] is not None:
+                context['score_percentile'] = same_survey_stats['percentile']
                 
                 # Calcular posición del marcador para visualización
                 score_range = same_survey_stats['max_score'] - same_survey_stats['min_score']
@@ -1093,25 +1152,8 @@ class SurveyRiskConfigDetailView(LoginRequiredMixin, DetailView):
             'excellent': 100 - risk_config.good_max,  # good_max to 100
         }
         
-        # Debug: imprimir para verificar
-        print("🔍 Range widths:", context['range_widths'])
-        print("🔍 Risk config values:", {
-            'critical_max': risk_config.critical_max,
-            'high_max': risk_config.high_max,
-            'moderate_max': risk_config.moderate_max,
-            'good_max': risk_config.good_max,
-        })
-        
-        # Estadísticas de scores con esta configuración
-        scores_stats_queryset = ScoreResult.objects.filter(
-            submission__survey=survey
-        ).values('risk_level').annotate(
-            count=Count('id'),
-            avg_score=Avg('score_percentage')
-        ).order_by('risk_level')
-        
-        # Convertir queryset a lista
-        scores_stats = list(scores_stats_queryset)
+        # Estadísticas de scores con esta configuración (desde los rollups)
+        scores_stats = ScoreRollup.summarize(survey_id=survey.id)['risk_distribution']
         
         # Calcular porcentajes para las barras de estadísticas
         total_scores = sum(stat['count'] for stat in scores_stats)
@@ -1124,8 +1166,6 @@ class SurveyRiskConfigDetailView(LoginRequiredMixin, DetailView):
                 stat_copy['percentage_width'] = 0
             scores_stats_with_percentages.append(stat_copy)
         
-        print("🔍 Scores stats:", scores_stats_with_percentages)
-        
         context['scores_stats'] = scores_stats_with_percentages
         
         # Recomendaciones de paquetes para este survey
@@ -1190,72 +1230,107 @@ class RecalculateScoresView(LoginRequiredMixin, View):
             }, status=500)
 
 
-class ExportScoresView(LoginRequiredMixin, View):
-    """Vista para exportar scores en CSV"""
+class ExportScoresView(LoginRequiredMixin, ScoreResultFilterMixin, View):
+    """
+    Vista para exportar scores en CSV o XLSX.
+    
+    El archivo se genera en streaming: las filas se leen por keyset sobre
+    (calculated_at, id) trayendo solo las columnas exportadas, así que la
+    memoria usada no depende de la cantidad de resultados.
+    """
+    
+    COLUMNS = [
+        ('Prospect', 'submission__prospect__name'),
+        ('Email', 'submission__prospect__email'),
+        ('Empresa', 'submission__prospect__company_name'),
+        ('Survey', 'submission__survey__title'),
+        ('Score (%)', 'score_percentage'),
+        ('Puntos', 'total_points'),
+        ('Risk Level', 'risk_level'),
+        ('Paquete Primario', 'primary_package'),
+        ('Paquete Secundario', 'secondary_package'),
+        ('Fecha Cálculo', 'calculated_at'),
+        ('Fecha Completion', 'submission__completed_at'),
+    ]
     
     def get(self, request):
         # Aplicar los mismos filtros que en la lista
-        queryset = ScoreResult.objects.select_related(
-            'submission__prospect', 
-            'submission__survey'
-        ).order_by('-calculated_at')
+        queryset = self.filter_score_results(ScoreResult.objects.all())
         
-        # Aplicar filtros (misma lógica que ScoreResultListView)
-        risk_level = request.GET.get('risk_level')
-        if risk_level and risk_level in dict(RiskLevel.choices):
-            queryset = queryset.filter(risk_level=risk_level)
+        export_format = 'xlsx' if request.GET.get('format') == 'xlsx' else 'csv'
+        sections = self._get_export_sections() if request.GET.get('sections') else []
         
-        survey = request.GET.get('survey')
-        if survey:
-            queryset = queryset.filter(submission__survey_id=survey)
+        header = [label for label, field in self.COLUMNS]
+        header += [f"{title} (%)" for order, title in sections]
         
-        search = request.GET.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(submission__prospect__name__icontains=search) |
-                Q(submission__prospect__email__icontains=search) |
-                Q(submission__prospect__company_name__icontains=search)
-            )
+        fields = [field for label, field in self.COLUMNS] + ['submission__survey__max_score']
+        if sections:
+            fields.append('section_scores')
         
-        # Crear response CSV
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="scores_export_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-        
-        writer = csv.writer(response)
-        
-        # Headers
-        writer.writerow([
-            'Prospect',
-            'Email', 
-            'Empresa',
-            'Survey',
-            'Score (%)',
-            'Puntos',
-            'Risk Level',
-            'Paquete Primario',
-            'Paquete Secundario',
-            'Fecha Cálculo',
-            'Fecha Completion'
-        ])
-        
-        # Datos
-        for score in queryset:
-            writer.writerow([
-                score.submission.prospect.name,
-                score.submission.prospect.email,
-                score.submission.prospect.company_name or '',
-                score.submission.survey.title,
-                f"{score.score_percentage}%",
-                f"{score.total_points}/{score.submission.survey.max_score}",
-                score.get_risk_level_display(),
-                score.primary_package,
-                score.secondary_package or '',
-                score.calculated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                score.submission.completed_at.strftime('%Y-%m-%d %H:%M:%S') if score.submission.completed_at else ''
-            ])
+        rows = self._format_rows(keyset_values(queryset, fields), sections, export_format)
         
+        if export_format == 'xlsx':
+            content, content_type = stream_xlsx(header, rows, sheet_name='Scores'), XLSX_CONTENT_TYPE
+        else:
+            content, content_type = stream_csv(header, rows), CSV_CONTENT_TYPE
+        
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="scores_export_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{export_format}"'
+        )
         return response
     
+    def _get_export_sections(self):
+        """
+        Columnas de sección como (order, título).
+        
+        Con un survey filtrado se usan sus títulos; si no, las secciones se
+        alinean por orden entre surveys.
+        """
+        survey = self.request.GET.get('survey')
+        if survey:
+            try:
+                return list(
+                    SurveySection.objects.filter(survey_id=int(survey)).order_by('order').values_list('order', 'title')
+                )
+            except ValueError:
+                pass
+        
+        orders = SurveySection.objects.order_by('order').values_list('order', flat=True).distinct()
+        return [(order, f"Sección {order}") for order in orders]
+    
+    def _format_rows(self, values, sections, export_format):
+        """Convierte las tuplas de values_list en filas del archivo."""
+        risk_levels = dict(RiskLevel.choices)
+        
+        for (name, email, company_name, survey_title, score_percentage, total_points, risk_level,
+                primary_package, secondary_package, calculated_at, completed_at, max_score, *extra) in values:
+            if export_format == 'xlsx':
+                score_cell = score_percentage
+            else:
+                score_cell = f"{score_percentage}%"
+            
+            row = [
+                name,
+                email,
+                company_name or '',
+                survey_title,
+                score_cell,
+                f"{total_points}/{max_score}",
+                risk_levels.get(risk_level, risk_level),
+                primary_package,
+                secondary_package or '',
+                calculated_at.strftime('%Y-%m-%d %H:%M:%S'),
+                completed_at.strftime('%Y-%m-%d %H:%M:%S') if completed_at else '',
+            ]
+            
+            if sections:
+                section_scores = extra[0] or {}
+                for order, title in sections:
+                    row.append(section_scores.get(f"section_{order}", {}).get('percentage', ''))
+            
+            yield row
+    
     
 # ====================================
 # SCORING CONFIG
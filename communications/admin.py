@@ -1,3 +1,13 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import OutboundEmail
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['to_email', 'kind', 'status', 'attempts', 'created_at', 'sent_at', 'latency_ms']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['to_email', 'subject', 'idempotency_key']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'sent_at', 'latency_ms', 'send_ms', 'locked_until', 'locked_by', 'last_error']
+    raw_id_fields = ['score_result']
@@ -0,0 +1,77 @@
+"""
+communications/backends.py - Local email backend for tests and development
+
+Behaves like a connection-oriented backend (O365, SMTP): it counts how many
+times a connection is opened and can be told to answer with throttling or
+errors, so the outbox sender can be exercised without a mailbox.
+"""
+import threading
+
+from django.core.mail.backends.base import BaseEmailBackend
+
+
+class ThrottledError(Exception):
+    """Stand-in for a Graph API 429 response, with its Retry-After header."""
+
+    def __init__(self, retry_after=None):
+        super().__init__('429 Too Many Requests')
+        self.retry_after = retry_after
+
+
+class FakeEmailBackend(BaseEmailBackend):
+    """
+    Records sent messages in `FakeEmailBackend.sent`.
+
+    Tests queue failures with `FakeEmailBackend.failures.append(exception)`:
+    each send raises the next queued exception instead of delivering.
+    """
+    sent = []
+    failures = []
+    opened = 0
+    _lock = threading.Lock()
+
+    def __init__(self, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.is_open = False
+
+    @classmethod
+    def reset(cls):
+        """Forget sent messages, queued failures and connection counts."""
+        with cls._lock:
+            cls.sent = []
+            cls.failures = []
+            cls.opened = 0
+
+    def open(self):
+        if self.is_open:
+            return False
+        with self._lock:
+            FakeEmailBackend.opened += 1
+        self.is_open = True
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+
+        new_connection = self.open()
+        try:
+            sent = 0
+            for message in email_messages:
+                with self._lock:
+                    failure = FakeEmailBackend.failures.pop(0) if FakeEmailBackend.failures else None
+                if failure is not None:
+                    if self.fail_silently:
+                        continue
+                    raise failure
+                message.message()  # Same validation as a real send
+                with self._lock:
+                    FakeEmailBackend.sent.append(message)
+                sent += 1
+            return sent
+        finally:
+            if new_connection:
+                self.close()
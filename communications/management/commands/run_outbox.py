@@ -0,0 +1,61 @@
+"""
+Django management command that delivers the email outbox
+"""
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from communications.outbox import OutboxSender, get_outbox_setting
+
+
+class Command(BaseCommand):
+    """Management command to run the outbox sender"""
+
+    help = 'Deliver queued emails in batches over a reused backend connection'
+
+    def add_arguments(self, parser):
+        """Add command arguments"""
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Deliver the emails that are currently due and exit',
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command execution"""
+        stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+        signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+
+        sender = OutboxSender(f'{socket.gethostname()}:{os.getpid()}:outbox')
+        poll_interval = get_outbox_setting('POLL_INTERVAL')
+        self.stdout.write(self.style.SUCCESS(f'Starting outbox sender {sender.worker_id}'))
+
+        totals = {'sent': 0, 'failed': 0, 'released': 0}
+        try:
+            while not stop_event.is_set():
+                close_old_connections()
+                OutboxSender.expire_exhausted()
+
+                # None while nothing is due or the sender is throttled
+                stats = sender.run_once()
+                if stats is None:
+                    if options['once']:
+                        break
+                    stop_event.wait(poll_interval)
+                    continue
+
+                for key in totals:
+                    totals[key] += stats[key]
+        finally:
+            sender.close()
+            connection.close()
+
+        self.stdout.write(
+            f"Outbox sender stopped: {totals['sent']} sent, {totals['failed']} failed, "
+            f"{totals['released']} postponed"
+        )
@@ -1,3 +1,146 @@
+"""
+Communications models - persistent outbox for outbound email.
+"""
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class OutboundEmailStatus(models.TextChoices):
+    """Lifecycle of an outbox message."""
+    PENDING = 'PENDING', 'Pending'
+    SENDING = 'SENDING', 'Sending'
+    SENT = 'SENT', 'Sent'
+    FAILED = 'FAILED', 'Failed'
+
+
+class OutboundEmail(models.Model):
+    """
+    Email waiting in (or delivered from) the outbox.
+
+    Messages are rendered when they are queued and delivered later by
+    `manage.py run_outbox`. The idempotency key is unique: queueing the same
+    key twice returns the existing row, so a prospect never receives the same
+    report twice even if the job that queues it runs again.
+    """
+    idempotency_key = models.CharField(
+        max_length=150,
+        unique=True,
+        help_text="Deduplication key, e.g. survey-completion:<submission id>"
+    )
+    kind = models.CharField(
+        max_length=50,
+        help_text="Type of email (SURVEY_COMPLETION, ...)"
+    )
+
+    # Message
+    from_email = models.CharField(max_length=255)
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body_text = models.TextField()
+    body_html = models.TextField(blank=True, default='')
+
+    # The PDF report is read from the report cache when the email is sent
+    score_result = models.ForeignKey(
+        'scoring.ScoreResult',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='outbound_emails'
+    )
+    attach_report = models.BooleanField(
+        default=False,
+        help_text="Attach the PDF report of the score result"
+    )
+
+    # Delivery control
+    status = models.CharField(
+        max_length=20,
+        choices=OutboundEmailStatus.choices,
+        default=OutboundEmailStatus.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Earliest time the message can be sent"
+    )
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Lease expiry for the sender currently holding the message"
+    )
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    last_error = models.TextField(blank=True, null=True)
+
+    # Delivery latency
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    latency_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Milliseconds from queueing to delivery"
+    )
+    send_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Milliseconds spent in the backend call that delivered it"
+    )
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Outbound Email'
+        verbose_name_plural = 'Outbound Emails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} -> {self.to_email} ({self.status})"
+
+    @classmethod
+    def queue(cls, idempotency_key, kind, to_email, subject, body_text, body_html='',
+              from_email=None, score_result=None, attach_report=False, max_attempts=5):
+        """
+        Queue an email once per idempotency key.
+
+        Returns:
+            tuple: (OutboundEmail, created)
+        """
+        return cls.objects.get_or_create(
+            idempotency_key=idempotency_key,
+            defaults={
+                'kind': kind,
+                'from_email': from_email or settings.DEFAULT_FROM_EMAIL,
+                'to_email': to_email,
+                'subject': subject,
+                'body_text': body_text,
+                'body_html': body_html,
+                'score_result': score_result,
+                'attach_report': attach_report,
+                'max_attempts': max_attempts,
+            }
+        )
+
+    def build_message(self, connection=None):
+        """EmailMultiAlternatives for this row, with the PDF report if requested."""
+        from core.email_service import SurveyEmailService
+
+        email = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body_text,
+            from_email=self.from_email,
+            to=[self.to_email],
+            connection=connection
+        )
+        if self.body_html:
+            email.attach_alternative(self.body_html, "text/html")
+
+        if self.attach_report and self.score_result_id:
+            attachment = SurveyEmailService._generate_pdf_attachment(self.score_result)
+            if attachment is None:
+                raise RuntimeError(f"No se pudo generar el PDF del score {self.score_result_id}")
+            email.attach(*attachment)
+
+        return email
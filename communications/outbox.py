@@ -0,0 +1,304 @@
+"""
+communications/outbox.py - Batched delivery of the email outbox
+
+`OutboxSender` claims due messages in batches and delivers them through one
+backend connection that stays open across messages and batches, so the O365
+backend authenticates once instead of acquiring a token per email. The
+connection is reopened after `CONNECTION_MAX_AGE` seconds or after an error.
+
+Graph API throttling (429/503) pauses the whole sender for the Retry-After
+interval, or an exponential backoff with jitter when the header is missing;
+the rest of the batch is released untouched. Other errors retry the message
+with backoff until `max_attempts`. Delivery is at least once: a sender that
+dies between the send and the status update resends after its lease expires.
+"""
+import logging
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboundEmail, OutboundEmailStatus
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_OUTBOX_SETTINGS = {
+    'BACKEND': None,
+    'BATCH_SIZE': 20,
+    'POLL_INTERVAL': 5,
+    'LEASE': 300,
+    'MAX_PER_MINUTE': 30,
+    'BACKOFF_BASE': 30,
+    'BACKOFF_MAX': 3600,
+    'CONNECTION_MAX_AGE': 2700,
+}
+
+THROTTLING_STATUS_CODES = (429, 503)
+
+
+def get_outbox_setting(name):
+    """Read an OUTBOX setting."""
+    return getattr(settings, 'OUTBOX', {}).get(name, DEFAULT_OUTBOX_SETTINGS[name])
+
+
+def backoff_delay(attempt):
+    """Exponential backoff in seconds for the n-th attempt, with jitter."""
+    delay = min(
+        get_outbox_setting('BACKOFF_BASE') * (2 ** max(attempt - 1, 0)),
+        get_outbox_setting('BACKOFF_MAX')
+    )
+    return delay * random.uniform(0.8, 1.2)
+
+
+def throttle_delay(error):
+    """
+    Seconds requested by a throttling error, or None for any other error.
+
+    Understands requests' HTTPError (raised by O365) and errors carrying a
+    `retry_after` attribute (the fake backend).
+    """
+    retry_after = getattr(error, 'retry_after', None)
+    response = getattr(error, 'response', None)
+
+    if retry_after is None and response is not None:
+        if getattr(response, 'status_code', None) not in THROTTLING_STATUS_CODES:
+            return None
+        retry_after = response.headers.get('Retry-After', 0)
+    elif retry_after is None:
+        return None
+
+    try:
+        return max(float(retry_after), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class OutboxSender:
+    """Deliver outbox messages through a reused backend connection."""
+
+    def __init__(self, worker_id, backend=None):
+        self.worker_id = worker_id
+        self.backend = backend or get_outbox_setting('BACKEND')
+        self.connection = None
+        self.connection_opened_at = None
+        self.throttle_count = 0
+        self.paused_until = 0
+        self.last_send_at = 0
+
+    # ====================================
+    # CONNECTION
+    # ====================================
+
+    def get_connection(self):
+        """Open connection, reopened once it is older than CONNECTION_MAX_AGE."""
+        max_age = get_outbox_setting('CONNECTION_MAX_AGE')
+        if self.connection is not None and time.monotonic() - self.connection_opened_at > max_age:
+            self.close()
+
+        if self.connection is None:
+            connection = get_connection(self.backend)
+            connection.open()
+            self.connection = connection
+            self.connection_opened_at = time.monotonic()
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception as e:
+                logger.warning(f"Error cerrando conexión de email: {str(e)}")
+        self.connection = None
+
+    # ====================================
+    # QUEUE
+    # ====================================
+
+    @staticmethod
+    def available(now):
+        """Messages that are due, or whose sender lease has expired."""
+        return OutboundEmail.objects.filter(
+            Q(status=OutboundEmailStatus.PENDING, next_attempt_at__lte=now) |
+            Q(status=OutboundEmailStatus.SENDING, locked_until__lte=now),
+            attempts__lt=F('max_attempts'),
+        )
+
+    def claim_batch(self):
+        """
+        Lease up to BATCH_SIZE due messages to this sender.
+
+        The lease is a conditional UPDATE, so two senders never claim the
+        same row.
+        """
+        now = timezone.now()
+        candidate_ids = list(
+            self.available(now).order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:get_outbox_setting('BATCH_SIZE')]
+        )
+        if not candidate_ids:
+            return []
+
+        self.available(now).filter(id__in=candidate_ids).update(
+            status=OutboundEmailStatus.SENDING,
+            locked_by=self.worker_id,
+            locked_until=now + timedelta(seconds=get_outbox_setting('LEASE')),
+            attempts=F('attempts') + 1,
+        )
+        return list(
+            OutboundEmail.objects.select_related('score_result__submission__prospect')
+            .filter(id__in=candidate_ids, status=OutboundEmailStatus.SENDING, locked_by=self.worker_id)
+            .order_by('next_attempt_at', 'id')
+        )
+
+    def _update(self, email, **fields):
+        """Update a leased message, only if this sender still holds it."""
+        return OutboundEmail.objects.filter(
+            id=email.id, status=OutboundEmailStatus.SENDING, locked_by=self.worker_id
+        ).update(locked_until=None, **fields)
+
+    def release(self, emails, delay):
+        """Put untried messages back in the queue without using up an attempt."""
+        for email in emails:
+            self._update(
+                email,
+                status=OutboundEmailStatus.PENDING,
+                next_attempt_at=timezone.now() + timedelta(seconds=delay),
+                attempts=F('attempts') - 1,
+            )
+
+    # ====================================
+    # DELIVERY
+    # ====================================
+
+    def pace(self):
+        """Stay under MAX_PER_MINUTE (Exchange Online allows 30 per mailbox)."""
+        max_per_minute = get_outbox_setting('MAX_PER_MINUTE')
+        if not max_per_minute:
+            return
+        wait = self.last_send_at + 60 / max_per_minute - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+    def deliver(self, email):
+        """Send one message on the shared connection; returns milliseconds spent."""
+        started = time.monotonic()
+        sent = self.get_connection().send_messages([email.build_message()])
+        self.last_send_at = time.monotonic()
+        if not sent:
+            raise RuntimeError(f"El backend no envió el email a {email.to_email}")
+        return int((self.last_send_at - started) * 1000)
+
+    def send_batch(self, emails):
+        """
+        Deliver a claimed batch.
+
+        Returns:
+            dict: sent, failed and released counts
+        """
+        stats = {'sent': 0, 'failed': 0, 'released': 0}
+
+        for index, email in enumerate(emails):
+            self.pace()
+            try:
+                send_ms = self.deliver(email)
+            except Exception as e:
+                delay = throttle_delay(e)
+                if delay is not None:
+                    self.throttled(delay)
+                    self.release(emails[index:], self.paused_until - time.monotonic())
+                    stats['released'] += len(emails) - index
+                    break
+
+                self.failed(email, e)
+                stats['failed'] += 1
+                # The connection may be unusable after an error
+                self.close()
+                continue
+
+            self.throttle_count = 0
+            now = timezone.now()
+            self._update(
+                email,
+                status=OutboundEmailStatus.SENT,
+                sent_at=now,
+                send_ms=send_ms,
+                latency_ms=int((now - email.created_at).total_seconds() * 1000),
+                last_error=None,
+            )
+            stats['sent'] += 1
+
+        return stats
+
+    def throttled(self, retry_after):
+        """Pause the sender after a throttling response."""
+        self.throttle_count += 1
+        delay = retry_after or backoff_delay(self.throttle_count)
+        # Jitter so several senders do not come back at the same instant
+        delay = delay * random.uniform(1.0, 1.2)
+        self.paused_until = time.monotonic() + delay
+        logger.warning(f"Envío de emails limitado por el servidor, pausa de {int(delay)}s")
+
+    def failed(self, email, error):
+        """Retry a failed message with backoff, or give up."""
+        if email.attempts >= email.max_attempts:
+            self._update(
+                email,
+                status=OutboundEmailStatus.FAILED,
+                last_error=str(error),
+            )
+            logger.error(
+                f"Email {email.idempotency_key} a {email.to_email} falló definitivamente "
+                f"tras {email.attempts} intentos: {error}"
+            )
+            return
+
+        delay = backoff_delay(email.attempts)
+        self._update(
+            email,
+            status=OutboundEmailStatus.PENDING,
+            last_error=str(error),
+            next_attempt_at=timezone.now() + timedelta(seconds=delay),
+        )
+        logger.warning(
+            f"Email {email.idempotency_key} falló (intento {email.attempts}), "
+            f"reintento en {int(delay)}s: {error}"
+        )
+
+    def run_once(self):
+        """
+        Claim and deliver one batch, unless the sender is paused.
+
+        Returns:
+            dict with the batch counts, or None if nothing was claimed
+        """
+        if time.monotonic() < self.paused_until:
+            return None
+
+        emails = self.claim_batch()
+        if not emails:
+            return None
+
+        stats = self.send_batch(emails)
+        logger.info(
+            f"Outbox: {stats['sent']} enviados, {stats['failed']} fallidos, "
+            f"{stats['released']} pospuestos"
+        )
+        return stats
+
+    @staticmethod
+    def expire_exhausted():
+        """Mark abandoned messages that have no attempts left as FAILED."""
+        return OutboundEmail.objects.filter(
+            status=OutboundEmailStatus.SENDING,
+            locked_until__lte=timezone.now(),
+            attempts__gte=F('max_attempts'),
+        ).update(
+            status=OutboundEmailStatus.FAILED,
+            last_error='Lease expired on last attempt',
+            locked_until=None,
+        )
@@ -1,3 +1,96 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .backends import FakeEmailBackend, ThrottledError
+from .models import OutboundEmail, OutboundEmailStatus
+from .outbox import OutboxSender
+
+
+FAKE_BACKEND = 'communications.backends.FakeEmailBackend'
+
+
+@override_settings(OUTBOX={'BACKEND': FAKE_BACKEND, 'BATCH_SIZE': 10, 'MAX_PER_MINUTE': 0})
+class OutboxSenderTests(TestCase):
+    """Outbox delivery against the fake backend."""
+
+    def setUp(self):
+        FakeEmailBackend.reset()
+        self.sender = OutboxSender('test-sender')
+
+    def tearDown(self):
+        self.sender.close()
+
+    def queue(self, count, prefix='test'):
+        return [
+            OutboundEmail.queue(
+                idempotency_key=f'{prefix}:{i}',
+                kind='TEST',
+                to_email=f'prospect{i}@example.com',
+                subject=f'Asunto {i}',
+                body_text='Texto',
+                body_html='<p>Texto</p>',
+            )[0]
+            for i in range(count)
+        ]
+
+    def test_queue_is_idempotent(self):
+        first, created = OutboundEmail.queue('survey-completion:1', 'TEST', 'a@example.com', 'Asunto', 'Texto')
+        second, created_again = OutboundEmail.queue('survey-completion:1', 'TEST', 'a@example.com', 'Asunto', 'Texto')
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.id, second.id)
+
+    def test_batches_reuse_one_connection(self):
+        self.queue(25)
+
+        while self.sender.run_once():
+            pass
+
+        self.assertEqual(len(FakeEmailBackend.sent), 25)
+        self.assertEqual(FakeEmailBackend.opened, 1)
+        sent = OutboundEmail.objects.filter(status=OutboundEmailStatus.SENT)
+        self.assertEqual(sent.count(), 25)
+        self.assertFalse(sent.filter(latency_ms__isnull=True).exists())
+
+    def test_sent_emails_are_not_sent_again(self):
+        self.queue(3)
+        self.sender.run_once()
+        self.queue(3)
+
+        self.assertIsNone(self.sender.run_once())
+        self.assertEqual(len(FakeEmailBackend.sent), 3)
+
+    def test_throttling_pauses_and_releases_the_batch(self):
+        self.queue(5)
+        FakeEmailBackend.failures.append(None)
+        FakeEmailBackend.failures.append(ThrottledError(retry_after=60))
+
+        stats = self.sender.run_once()
+
+        self.assertEqual(stats, {'sent': 1, 'failed': 0, 'released': 4})
+        self.assertIsNone(self.sender.run_once())
+        pending = OutboundEmail.objects.filter(status=OutboundEmailStatus.PENDING)
+        self.assertEqual(pending.count(), 4)
+        # Throttled messages keep their attempts and wait for the Retry-After
+        self.assertFalse(pending.exclude(attempts=0).exists())
+        self.assertFalse(pending.filter(next_attempt_at__lt=timezone.now() + timedelta(seconds=55)).exists())
+
+    def test_errors_retry_with_backoff_then_fail(self):
+        email = self.queue(1)[0]
+        OutboundEmail.objects.filter(id=email.id).update(max_attempts=2)
+
+        FakeEmailBackend.failures.append(RuntimeError('Graph error'))
+        self.sender.run_once()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmailStatus.PENDING)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        OutboundEmail.objects.filter(id=email.id).update(next_attempt_at=timezone.now())
+        FakeEmailBackend.failures.append(RuntimeError('Graph error'))
+        self.sender.run_once()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmailStatus.FAILED)
+        self.assertEqual(email.last_error, 'Graph error')
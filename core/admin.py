@@ -0,0 +1,24 @@
+from django.contrib import admin
+
+from .models import ThrottledSource
+from .ratelimit import reset_limit
+
+
+@admin.register(ThrottledSource)
+class ThrottledSourceAdmin(admin.ModelAdmin):
+    list_display = ['value', 'dimension', 'scope', 'blocked_count', 'first_blocked_at', 'last_blocked_at']
+    list_filter = ['scope', 'dimension', 'last_blocked_at']
+    search_fields = ['value']
+    ordering = ['-last_blocked_at']
+    readonly_fields = ['scope', 'dimension', 'value', 'blocked_count', 'first_blocked_at', 'last_blocked_at']
+    actions = ['reset_limits']
+
+    def has_add_permission(self, request):
+        return False
+
+    def reset_limits(self, request, queryset):
+        """Reset the rate limit budget of the selected sources."""
+        for source in queryset:
+            reset_limit(source.scope, source.dimension, source.value)
+        self.message_user(request, f'{queryset.count()} fuentes pueden enviar solicitudes nuevamente.')
+    reset_limits.short_description = 'Reset rate limit (unblock)'
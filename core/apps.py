@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        # Count database connections from the first one this process opens
+        from django.db.backends.signals import connection_created
+        from .db import count_connection
+
+        connection_created.connect(count_connection, dispatch_uid='core.count_connection')
@@ -0,0 +1,226 @@
+"""
+core/cache.py - Shared application cache with versioned namespaces and
+stampede protection
+
+Values live in the shared cache backend (Redis in production, see CACHES),
+so a hot value is computed once per cluster instead of once per gunicorn
+worker.
+
+- Keys are namespaced and versioned: `<namespace>:v<version>:<parts>`.
+  `invalidate_namespace()` bumps the version, dropping every key of the
+  namespace at once without scanning the cache.
+- Each value is stored with its logical expiry and the time it took to
+  compute. Readers refresh it early with a probability that grows as the
+  expiry approaches (probabilistic early expiration), so a hot key is
+  recomputed before it expires instead of by every reader after it does.
+- Recomputation is single-flight: one process takes a short lock and
+  recomputes, the others keep serving the previous value, or wait for the
+  new one on a cold key. The lock is cache.add(), atomic on Redis and the
+  database cache and best effort on the file cache.
+- Cache outages never break a page: errors are logged and the value is
+  computed directly.
+"""
+import functools
+import hashlib
+import logging
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_APP_CACHE_SETTINGS = {
+    'ALIAS': 'default',
+    'LOCK_TIMEOUT': 30,   # Longest expected recompute, in seconds
+    'WAIT_TIMEOUT': 5,    # How long a reader waits for another process on a cold key
+    'STALE_GRACE': 300,   # Seconds an expired value is kept to serve during a refresh
+    'EARLY_REFRESH_BETA': 1.0,
+}
+
+_MAX_KEY_LENGTH = 200
+
+
+def get_app_cache_setting(name):
+    """Read an APP_CACHE setting with its default."""
+    return getattr(settings, 'APP_CACHE', {}).get(name, DEFAULT_APP_CACHE_SETTINGS[name])
+
+
+def get_cache():
+    """Cache backend used by the application cache."""
+    return caches[get_app_cache_setting('ALIAS')]
+
+
+def _namespace_key(namespace):
+    return f"ns:{namespace}"
+
+
+def namespace_version(namespace):
+    """
+    Current version of a namespace.
+
+    A missing version starts at the current time in milliseconds, so it
+    never reuses a version whose keys may still be in the cache.
+    """
+    cache = get_cache()
+    version = cache.get(_namespace_key(namespace))
+    if version is None:
+        cache.add(_namespace_key(namespace), int(time.time() * 1000), timeout=None)
+        version = cache.get(_namespace_key(namespace))
+    return version
+
+
+def invalidate_namespace(namespace):
+    """Drop every key of a namespace by bumping its version."""
+    cache = get_cache()
+    try:
+        try:
+            cache.incr(_namespace_key(namespace))
+        except ValueError:
+            # No version yet: nothing cached under this namespace
+            namespace_version(namespace)
+    except Exception as e:
+        logger.warning(f"No se pudo invalidar el namespace de cache {namespace}: {str(e)}")
+
+
+def make_key(namespace, *parts):
+    """Versioned cache key of a namespace and key parts."""
+    suffix = ':'.join(str(part) for part in parts)
+    if len(suffix) > _MAX_KEY_LENGTH or any(char.isspace() for char in suffix):
+        suffix = hashlib.sha256(suffix.encode('utf-8')).hexdigest()
+    return f"{namespace}:v{namespace_version(namespace)}:{suffix}"
+
+
+def invalidate(namespace, *parts):
+    """Drop one key of a namespace."""
+    try:
+        get_cache().delete(make_key(namespace, *parts))
+    except Exception as e:
+        logger.warning(f"No se pudo invalidar la clave de cache {namespace}: {str(e)}")
+
+
+def _needs_refresh(envelope, now):
+    """Probabilistic early expiration: refresh sooner for slow values near expiry."""
+    beta = get_app_cache_setting('EARLY_REFRESH_BETA')
+    if not beta:
+        return now >= envelope['expires']
+    jitter = -envelope['delta'] * beta * math.log(1 - random.random())
+    return now + jitter >= envelope['expires']
+
+
+def _compute_and_store(cache, key, compute, timeout):
+    started = time.time()
+    value = compute()
+    finished = time.time()
+
+    envelope = {'value': value, 'expires': finished + timeout, 'delta': finished - started}
+    try:
+        cache.set(key, envelope, timeout + get_app_cache_setting('STALE_GRACE'))
+    except Exception as e:
+        logger.warning(f"No se pudo guardar {key} en cache: {str(e)}")
+    return value
+
+
+def _acquire(cache, lock_key):
+    try:
+        return cache.add(lock_key, 1, get_app_cache_setting('LOCK_TIMEOUT'))
+    except Exception:
+        return True
+
+
+def _compute_locked(cache, key, lock_key, compute, timeout):
+    try:
+        return _compute_and_store(cache, key, compute, timeout)
+    finally:
+        try:
+            cache.delete(lock_key)
+        except Exception:
+            pass
+
+
+def get_or_compute(namespace, parts, compute, timeout):
+    """
+    Cached value of `compute()` under a namespace.
+
+    Args:
+        namespace: group of keys invalidated together
+        parts: tuple identifying the value inside the namespace
+        compute: callable producing the value (any picklable value, None included)
+        timeout: seconds the value is considered fresh
+    """
+    cache = get_cache()
+    try:
+        key = make_key(namespace, *parts)
+        envelope = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Cache no disponible, calculando {namespace} sin cache: {str(e)}")
+        return compute()
+
+    if envelope is not None and not _needs_refresh(envelope, time.time()):
+        return envelope['value']
+
+    # Single flight: only the holder of the lock recomputes
+    lock_key = f"{key}:lock"
+    if _acquire(cache, lock_key):
+        return _compute_locked(cache, key, lock_key, compute, timeout)
+
+    # Another process is refreshing: serve the current value meanwhile
+    if envelope is not None:
+        return envelope['value']
+
+    # Cold key: wait for the other process instead of piling onto the database.
+    # If it released the lock without storing a value (compute() raised), the
+    # next waiter to take the lock computes instead of waiting out the timeout.
+    deadline = time.time() + get_app_cache_setting('WAIT_TIMEOUT')
+    delay = 0.02
+    while time.time() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+        envelope = cache.get(key)
+        if envelope is not None:
+            return envelope['value']
+        if _acquire(cache, lock_key):
+            # The value may have been stored between the read and the lock
+            envelope = cache.get(key)
+            if envelope is not None:
+                cache.delete(lock_key)
+                return envelope['value']
+            return _compute_locked(cache, key, lock_key, compute, timeout)
+
+    logger.warning(f"Tiempo de espera agotado para {key}, calculando sin lock")
+    return _compute_and_store(cache, key, compute, timeout)
+
+
+def cached(namespace, timeout, key=None):
+    """
+    Decorator caching a function's result with get_or_compute.
+
+    Args:
+        namespace: cache namespace
+        timeout: seconds the value is considered fresh
+        key: callable receiving the function arguments and returning the key
+            parts; defaults to the function name and its arguments
+
+    The wrapped function gains `invalidate(*args, **kwargs)` to drop the
+    value cached for those arguments.
+    """
+    def decorator(func):
+        def key_parts(*args, **kwargs):
+            if key is not None:
+                parts = key(*args, **kwargs)
+                return parts if isinstance(parts, (tuple, list)) else (parts,)
+            return (func.__module__, func.__qualname__) + args + tuple(sorted(kwargs.items()))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return get_or_compute(
+                namespace, key_parts(*args, **kwargs), lambda: func(*args, **kwargs), timeout
+            )
+
+        wrapper.invalidate = lambda *args, **kwargs: invalidate(namespace, *key_parts(*args, **kwargs))
+        return wrapper
+
+    return decorator
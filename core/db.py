@@ -0,0 +1,78 @@
+"""
+core/db.py - Database connection health and usage metrics
+
+`connections_opened` counts the connections Django has set up in this
+process (the connection_created signal). With persistent connections it
+stays flat under load; a counter that grows with every request means each
+request is paying the TCP and authentication setup. With the pool it counts
+checkouts, and `pool.connections_num` counts the real server connections.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_stats = {'connections_opened': 0}
+
+
+def count_connection(sender, connection, **kwargs):
+    """connection_created receiver."""
+    with _lock:
+        _stats['connections_opened'] += 1
+
+
+def connection_mode(using='default'):
+    """How connections of a database alias are managed: pool, persistent or per-request."""
+    database = settings.DATABASES[using]
+    if database.get('OPTIONS', {}).get('pool'):
+        return 'pool'
+    if database.get('CONN_MAX_AGE'):
+        return 'persistent'
+    return 'per-request'
+
+
+def database_health(using='default'):
+    """
+    Round trip to the database plus connection usage of this process.
+
+    Returns:
+        dict: ok, latency_ms, mode, connections_opened and, for pooled
+        connections, the psycopg pool statistics
+    """
+    connection = connections[using]
+    health = {
+        'vendor': connection.vendor,
+        'mode': connection_mode(using),
+    }
+
+    started = time.monotonic()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        health['ok'] = True
+    except Exception as e:
+        # Details go to the log only, the endpoint is public
+        logger.error(f"Health check de base de datos falló: {str(e)}")
+        health['ok'] = False
+    health['latency_ms'] = round((time.monotonic() - started) * 1000, 2)
+
+    with _lock:
+        health['connections_opened'] = _stats['connections_opened']
+
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        stats = pool.get_stats()
+        health['pool'] = {
+            key: stats.get(key, 0)
+            for key in ('pool_min', 'pool_max', 'pool_size', 'pool_available',
+                        'requests_waiting', 'requests_num', 'requests_queued',
+                        'requests_wait_ms', 'requests_errors', 'connections_num', 'connections_lost')
+        }
+
+    return health
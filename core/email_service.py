@@ -27,22 +27,9 @@ class SurveyEmailService:
             bool: True if email was sent successfully, False otherwise
         """
         try:
-            # Get data from score_result
-            submission = score_result.submission
-            prospect = submission.prospect
-            survey = submission.survey
-            
-            # Prepare email context
-            context = SurveyEmailService._prepare_email_context(score_result)
-            
-            # Render email content
-            html_content = render_to_string('emails/survey_completion.html', context)
-            text_content = strip_tags(html_content)  # Fallback plain text
-            
-            # Email details
-            subject = (
-                f"Su Evaluación de Ciberseguridad - "
-                f"{prospect.company_name or prospect.name}"
+            prospect = score_result.submission.prospect
+            subject, text_content, html_content, context = (
+                SurveyEmailService._render_survey_completion(score_result)
             )
             from_email = settings.DEFAULT_FROM_EMAIL
             to_email = [prospect.email]
@@ -92,6 +79,62 @@ class SurveyEmailService:
             )
             return False
     
+    @staticmethod
+    def queue_survey_completion_email(score_result):
+        """
+        Queue the survey completion email in the outbox (sent by run_outbox).
+
+        Queued once per submission: calling it again for the same
+        submission returns the existing outbox row.
+
+        Args:
+            score_result: ScoreResult instance
+
+        Returns:
+            tuple: (OutboundEmail, created)
+        """
+        from communications.models import OutboundEmail
+
+        prospect = score_result.submission.prospect
+        subject, text_content, html_content, context = (
+            SurveyEmailService._render_survey_completion(score_result)
+        )
+
+        outbound_email, created = OutboundEmail.queue(
+            idempotency_key=f"survey-completion:{score_result.submission_id}",
+            kind='SURVEY_COMPLETION',
+            to_email=prospect.email,
+            subject=subject,
+            body_text=text_content,
+            body_html=html_content,
+            score_result=score_result,
+            # The PDF is read from the report cache at send time
+            attach_report=not settings.DEBUG,
+        )
+        if created:
+            logger.info(f"Survey completion email queued for {prospect.email}")
+        else:
+            logger.info(f"Survey completion email already queued for {prospect.email}, skipping")
+        return outbound_email, created
+    
+    @staticmethod
+    def _render_survey_completion(score_result):
+        """Subject, plain text, HTML and context of the survey completion email"""
+        prospect = score_result.submission.prospect
+        
+        # Prepare email context
+        context = SurveyEmailService._prepare_email_context(score_result)
+        
+        # Render email content
+        html_content = render_to_string('emails/survey_completion.html', context)
+        text_content = strip_tags(html_content)  # Fallback plain text
+        
+        subject = (
+            f"Su Evaluación de Ciberseguridad - "
+            f"{prospect.company_name or prospect.name}"
+        )
+        return subject, text_content, html_content, context
+    
     @staticmethod
     def _prepare_email_context(score_result):
         """Prepare context data for email template"""
@@ -138,16 +181,18 @@ class SurveyEmailService:
     def _generate_pdf_attachment(score_result):
         """Generate PDF attachment for email"""
         try:
-            # Generate PDF
+            # Reuse the stored report artifact; render only the first time
             generator = SecurityReportGenerator(score_result)
-            pdf_buffer = generator.generate_report()
+            artifact, pdf_content = generator.get_or_render()
+            if pdf_content is None:
+                pdf_content = artifact.read()
             
             # Get filename info
             filename_info = generator.get_filename_info()
             filename = filename_info['full_name']
             
             # Return attachment tuple (filename, content, mimetype)
-            return (filename, pdf_buffer.getvalue(), 'application/pdf')
+            return (filename, pdf_content, 'application/pdf')
             
         except Exception as e:
             logger.error(f"Error generating PDF attachment: {str(e)}")
@@ -0,0 +1,258 @@
+"""
+core/jobs.py - Database-backed job queue used to move scoring, PDF rendering
+and email delivery out of the request/response cycle.
+"""
+import logging
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from datetime import timedelta
+
+from .models import Job, JobStatus, JobType
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_JOB_QUEUE_SETTINGS = {
+    'POLL_INTERVAL': 2,
+    'BACKOFF_BASE': 30,
+    'BACKOFF_MAX': 3600,
+    'VISIBILITY_TIMEOUT': {
+        JobType.SCORE_SUBMISSION: 120,
+        JobType.RENDER_REPORT: 600,
+        JobType.SEND_EMAIL: 300,
+        JobType.EXPORT_REPORTS: 3600,
+    },
+    'CONCURRENCY': {
+        JobType.SCORE_SUBMISSION: 4,
+        JobType.RENDER_REPORT: 1,
+        JobType.SEND_EMAIL: 2,
+        JobType.EXPORT_REPORTS: 1,
+    },
+}
+
+
+def get_queue_setting(name, job_type=None):
+    """Read a JOB_QUEUE setting, optionally resolved for a job type."""
+    value = getattr(settings, 'JOB_QUEUE', {}).get(name, DEFAULT_JOB_QUEUE_SETTINGS[name])
+    if job_type is not None and isinstance(value, dict):
+        return value.get(job_type, DEFAULT_JOB_QUEUE_SETTINGS[name][job_type])
+    return value
+
+
+class JobQueue:
+    """Claim, run and retry jobs stored in the Job table."""
+
+    @staticmethod
+    def available_jobs(now):
+        """Jobs that are due, or whose worker lease has expired."""
+        return Job.objects.filter(
+            Q(status=JobStatus.PENDING, run_at__lte=now) |
+            Q(status=JobStatus.RUNNING, locked_until__lte=now),
+            attempts__lt=F('max_attempts'),
+        )
+
+    @classmethod
+    def claim(cls, worker_id, job_types=None):
+        """
+        Claim the next available job honouring per-type concurrency limits.
+
+        Claims of a job type are serialized: the worker locks the first
+        available row of the type (SELECT ... FOR UPDATE) before counting
+        the running jobs, so a concurrent claimer waits on that row and
+        counts again once this claim is committed. Two workers can never
+        both start a job beyond the limit.
+
+        SQLite ignores FOR UPDATE, so in development the limit only holds
+        for claims that do not overlap in time.
+
+        Returns:
+            Job instance or None if nothing can be claimed right now
+        """
+        job_types = list(job_types or JobType.values)
+        random.shuffle(job_types)
+        now = timezone.now()
+
+        for job_type in job_types:
+            with transaction.atomic():
+                job = cls.available_jobs(now).filter(
+                    job_type=job_type
+                ).order_by('run_at', 'id').select_for_update().first()
+                if job is None:
+                    continue
+
+                running = Job.objects.filter(
+                    job_type=job_type,
+                    status=JobStatus.RUNNING,
+                    locked_until__gt=now
+                ).count()
+                if running >= get_queue_setting('CONCURRENCY', job_type):
+                    continue
+
+                lease = timedelta(seconds=get_queue_setting('VISIBILITY_TIMEOUT', job_type))
+                Job.objects.filter(id=job.id).update(
+                    status=JobStatus.RUNNING,
+                    locked_by=worker_id,
+                    locked_until=now + lease,
+                    attempts=F('attempts') + 1,
+                )
+            return Job.objects.get(id=job.id)
+
+        return None
+
+    @classmethod
+    def run(cls, job, worker_id):
+        """Execute a claimed job and record its outcome."""
+        handler = JOB_HANDLERS[job.job_type]
+
+        try:
+            result = handler(job.payload) or {}
+        except Exception as e:
+            cls.fail(job, worker_id, e)
+            return False
+
+        Job.objects.filter(id=job.id, locked_by=worker_id).update(
+            status=JobStatus.DONE,
+            result=result,
+            last_error=None,
+            locked_until=None,
+            finished_at=timezone.now(),
+        )
+        logger.info(f"Job {job} completado por {worker_id}")
+        return True
+
+    @classmethod
+    def fail(cls, job, worker_id, error):
+        """Schedule a retry with exponential backoff, or give up."""
+        now = timezone.now()
+
+        if job.attempts >= job.max_attempts:
+            Job.objects.filter(id=job.id, locked_by=worker_id).update(
+                status=JobStatus.FAILED,
+                last_error=str(error),
+                locked_until=None,
+                finished_at=now,
+            )
+            logger.error(f"Job {job} falló definitivamente tras {job.attempts} intentos: {error}")
+            return
+
+        delay = min(
+            get_queue_setting('BACKOFF_BASE') * (2 ** (job.attempts - 1)),
+            get_queue_setting('BACKOFF_MAX')
+        )
+        # Jitter keeps retries of a failing batch from landing together
+        delay = delay * random.uniform(0.8, 1.2)
+
+        Job.objects.filter(id=job.id, locked_by=worker_id).update(
+            status=JobStatus.PENDING,
+            last_error=str(error),
+            locked_until=None,
+            run_at=now + timedelta(seconds=delay),
+        )
+        logger.warning(f"Job {job} falló (intento {job.attempts}), reintento en {int(delay)}s: {error}")
+
+    @staticmethod
+    def expire_exhausted():
+        """Mark abandoned jobs that have no attempts left as FAILED."""
+        return Job.objects.filter(
+            status=JobStatus.RUNNING,
+            locked_until__lte=timezone.now(),
+            attempts__gte=F('max_attempts'),
+        ).update(
+            status=JobStatus.FAILED,
+            last_error='Visibility timeout expired on last attempt',
+            locked_until=None,
+            finished_at=timezone.now(),
+        )
+
+
+# ====================================
+# JOB HANDLERS
+# ====================================
+
+def score_submission(payload):
+    """Calculate the score of a completed submission and chain the report."""
+    from surveys.models import SurveySubmission
+    from scoring.models import ScoreResult
+
+    submission = SurveySubmission.objects.select_related(
+        'prospect', 'survey'
+    ).get(id=payload['submission_id'])
+
+    with transaction.atomic():
+        score_result = ScoreResult.calculate_for_submission(submission)
+
+        logger.info(
+            f"Score calculado exitosamente: {score_result.score_percentage}% "
+            f"({score_result.risk_level}) para {submission.prospect.name}"
+        )
+
+        if payload.get('notify'):
+            submission.prospect.last_contact_at = submission.completed_at
+            submission.prospect.save(update_fields=['last_contact_at'])
+
+            Job.enqueue(JobType.RENDER_REPORT, {'score_result_id': score_result.id})
+
+    return {'score_result_id': score_result.id}
+
+
+def render_report(payload):
+    """Render the PDF report into the report cache and queue the completion email."""
+    from scoring.models import ScoreResult
+    from reports.pdf_generator import SecurityReportGenerator
+    from .email_service import SurveyEmailService
+
+    score_result = ScoreResult.objects.select_related(
+        'submission__prospect', 'submission__survey'
+    ).get(id=payload['score_result_id'])
+
+    # The completion email carries no PDF in development
+    if not settings.DEBUG:
+        # Store the report artifact so the outbox only reads the file
+        SecurityReportGenerator(score_result).get_or_render()
+
+    # Delivered by `manage.py run_outbox`, once per submission
+    outbound_email, created = SurveyEmailService.queue_survey_completion_email(score_result)
+
+    return {'outbound_email_id': outbound_email.id, 'queued': created}
+
+
+def send_email(payload):
+    """
+    Queue the completion email in the outbox.
+
+    Reports now queue their email directly; this handler drains SEND_EMAIL
+    jobs created before the outbox existed.
+    """
+    from scoring.models import ScoreResult
+    from .email_service import SurveyEmailService
+
+    score_result = ScoreResult.objects.select_related(
+        'submission__prospect', 'submission__survey'
+    ).get(id=payload['score_result_id'])
+
+    outbound_email, created = SurveyEmailService.queue_survey_completion_email(score_result)
+
+    return {'outbound_email_id': outbound_email.id, 'queued': created}
+
+
+def export_reports(payload):
+    """Build a bulk report export ZIP on disk."""
+    from reports.export import build_export
+    from reports.models import ReportExport
+
+    export = ReportExport.objects.get(id=payload['export_id'])
+    build_export(export)
+
+    return {'file_path': export.file_path, 'processed': export.processed, 'failed': export.failed}
+
+
+JOB_HANDLERS = {
+    JobType.SCORE_SUBMISSION: score_submission,
+    JobType.RENDER_REPORT: render_report,
+    JobType.SEND_EMAIL: send_email,
+    JobType.EXPORT_REPORTS: export_reports,
+}
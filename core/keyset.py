@@ -0,0 +1,60 @@
+"""
+core/keyset.py - Keyset (seek) iteration over large querysets
+
+Instead of OFFSET pages, each batch continues strictly after the last row
+of the previous one on a unique ordering such as (calculated_at, id). Every
+batch is an index range scan, so iterating the whole table costs the same
+per row at the end as at the start, and only one batch is held in memory.
+"""
+from django.db.models import Q
+
+
+def _field_name(order_field):
+    """Field name of an order_by entry ('-calculated_at' -> 'calculated_at')."""
+    return order_field.lstrip('-')
+
+
+def keyset_filter(order_by, last_values):
+    """
+    Q selecting the rows strictly after `last_values` on `order_by`.
+
+    For ('-calculated_at', '-id') and (t, 5) this is
+    calculated_at < t OR (calculated_at = t AND id < 5).
+    """
+    condition = Q()
+    for position in range(len(order_by) - 1, -1, -1):
+        order_field = order_by[position]
+        lookup = 'lt' if order_field.startswith('-') else 'gt'
+        step = Q(**{f'{_field_name(order_field)}__{lookup}': last_values[position]})
+        if position < len(order_by) - 1:
+            step |= Q(**{_field_name(order_field): last_values[position]}) & condition
+        condition = step
+    return condition
+
+
+def keyset_values(queryset, fields, order_by=('-calculated_at', '-id'), batch_size=2000):
+    """
+    Yield value tuples of `fields` for every row of `queryset`, in order.
+
+    Args:
+        queryset: filtered queryset to iterate
+        fields: field names passed to values_list
+        order_by: unique ordering; the last entry must be a unique field
+        batch_size: rows fetched per query
+    """
+    key_fields = [_field_name(order_field) for order_field in order_by]
+    queryset = queryset.order_by(*order_by).values_list(*key_fields, *fields)
+
+    last_values = None
+    while True:
+        batch = queryset
+        if last_values is not None:
+            batch = batch.filter(keyset_filter(order_by, last_values))
+
+        rows = list(batch[:batch_size])
+        for row in rows:
+            yield row[len(key_fields):]
+
+        if len(rows) < batch_size:
+            return
+        last_values = rows[-1][:len(key_fields)]
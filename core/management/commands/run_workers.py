@@ -0,0 +1,111 @@
+"""
+Django management command that consumes the background job queue
+"""
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from core.jobs import JobQueue, get_queue_setting
+from core.models import JobType
+from surveys.idempotency import purge_expired
+
+
+# Seconds between purges of expired submission idempotency keys
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    """Management command to run background job workers"""
+
+    help = 'Run background workers for scoring, PDF rendering and email jobs'
+
+    def add_arguments(self, parser):
+        """Add command arguments"""
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=int(os.environ.get('JOB_WORKER_THREADS', 2)),
+            help='Number of worker threads in this process',
+        )
+        parser.add_argument(
+            '--types',
+            type=str,
+            help='Comma separated job types to consume (default: all)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs that are currently due and exit',
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command execution"""
+        job_types = None
+        if options['types']:
+            job_types = [job_type.strip().upper() for job_type in options['types'].split(',')]
+            invalid = set(job_types) - set(JobType.values)
+            if invalid:
+                raise CommandError(f'Unknown job types: {", ".join(sorted(invalid))}')
+
+        self.stop_event = threading.Event()
+        self.purge_lock = threading.Lock()
+        self.next_purge = 0
+        signal.signal(signal.SIGTERM, lambda *args: self.stop_event.set())
+        signal.signal(signal.SIGINT, lambda *args: self.stop_event.set())
+
+        worker_prefix = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(
+            self.style.SUCCESS(f'Starting {options["threads"]} worker thread(s) on {worker_prefix}')
+        )
+
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f'{worker_prefix}:{index}', job_types, options['once']),
+                daemon=True,
+            )
+            for index in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Join with a timeout so signals are still delivered to the main thread
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+
+        self.stdout.write('Workers stopped')
+
+    def purge_idempotency_keys(self):
+        """Delete expired submission idempotency keys, once per interval per process"""
+        with self.purge_lock:
+            if time.monotonic() < self.next_purge:
+                return
+            self.next_purge = time.monotonic() + PURGE_INTERVAL
+        purge_expired()
+
+    def work(self, worker_id, job_types, once):
+        """Claim and run jobs until stopped"""
+        poll_interval = get_queue_setting('POLL_INTERVAL')
+
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                JobQueue.expire_exhausted()
+                self.purge_idempotency_keys()
+
+                job = JobQueue.claim(worker_id, job_types)
+                if job is None:
+                    if once:
+                        break
+                    self.stop_event.wait(poll_interval)
+                    continue
+
+                JobQueue.run(job, worker_id)
+        finally:
+            connection.close()
@@ -2,8 +2,9 @@
 Core models for SCG Presales system.
 """
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.core.validators import EmailValidator
+from django.utils import timezone
 
 
 class UserManager(BaseUserManager):
@@ -72,4 +73,162 @@ class User(AbstractUser):
         verbose_name_plural = 'Users'
     
     def __str__(self):
-        return f"{self.first_name} {self.last_name} ({self.email})"
\ No newline at end of file
+        return f"{self.first_name} {self.last_name} ({self.email})"
+
+
+class JobType(models.TextChoices):
+    """Types of background jobs processed by `manage.py run_workers`."""
+    SCORE_SUBMISSION = 'SCORE_SUBMISSION', 'Score submission'
+    RENDER_REPORT = 'RENDER_REPORT', 'Render PDF report'
+    SEND_EMAIL = 'SEND_EMAIL', 'Send completion email'
+    EXPORT_REPORTS = 'EXPORT_REPORTS', 'Export PDF reports'
+
+
+class JobStatus(models.TextChoices):
+    """Lifecycle of a background job."""
+    PENDING = 'PENDING', 'Pending'
+    RUNNING = 'RUNNING', 'Running'
+    DONE = 'DONE', 'Done'
+    FAILED = 'FAILED', 'Failed'
+
+
+class Job(models.Model):
+    """
+    Durable background job stored in the database.
+    
+    Jobs are created inside the same transaction as the data they refer to,
+    so they only become visible to workers once that data is committed.
+    A RUNNING job whose locked_until has passed is considered abandoned
+    and can be claimed again by another worker (visibility timeout).
+    """
+    job_type = models.CharField(
+        max_length=30,
+        choices=JobType.choices,
+        help_text="Handler that processes this job"
+    )
+    
+    payload = models.JSONField(
+        default=dict,
+        help_text="Arguments passed to the job handler"
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=JobStatus.choices,
+        default=JobStatus.PENDING
+    )
+    
+    # Retry control
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of times this job has been claimed"
+    )
+    max_attempts = models.PositiveIntegerField(
+        default=5,
+        help_text="Attempts before the job is marked as FAILED"
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Earliest time the job can be claimed"
+    )
+    
+    # Visibility timeout
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Lease expiry for the worker currently running the job"
+    )
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        help_text="Identifier of the worker holding the lease"
+    )
+    
+    last_error = models.TextField(
+        blank=True,
+        null=True,
+        help_text="Error raised by the last failed attempt"
+    )
+    result = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Value returned by the job handler"
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['run_at']
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        indexes = [
+            models.Index(fields=['job_type', 'status', 'run_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.job_type} #{self.pk} ({self.status})"
+    
+    @classmethod
+    def enqueue(cls, job_type, payload=None, run_at=None, max_attempts=5):
+        """Create a pending job. Call it inside the caller's transaction."""
+        return cls.objects.create(
+            job_type=job_type,
+            payload=payload or {},
+            run_at=run_at or timezone.now(),
+            max_attempts=max_attempts,
+        )
+
+
+class ThrottledSource(models.Model):
+    """
+    Client IP or email whose requests were rejected by the rate limiter
+    (core/ratelimit.py), for review in the admin.
+    """
+    scope = models.CharField(
+        max_length=50,
+        help_text="Rate limited endpoint (e.g. survey_submit, contact)"
+    )
+    dimension = models.CharField(
+        max_length=20,
+        help_text="What identifies the source: ip or email"
+    )
+    value = models.CharField(
+        max_length=254,
+        help_text="IP address or email"
+    )
+    
+    blocked_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Requests rejected with 429"
+    )
+    first_blocked_at = models.DateTimeField(default=timezone.now)
+    last_blocked_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        ordering = ['-last_blocked_at']
+        verbose_name = 'Throttled Source'
+        verbose_name_plural = 'Throttled Sources'
+        unique_together = ['scope', 'dimension', 'value']
+    
+    def __str__(self):
+        return f"{self.scope} {self.dimension} {self.value} ({self.blocked_count})"
+    
+    @classmethod
+    def record(cls, scope, dimension, value, count=1):
+        """Add rejected requests to the source, creating it on the first one."""
+        now = timezone.now()
+        source = cls.objects.filter(scope=scope, dimension=dimension, value=value)
+        changes = {'blocked_count': models.F('blocked_count') + count, 'last_blocked_at': now}
+        if source.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    scope=scope, dimension=dimension, value=value,
+                    blocked_count=count, first_blocked_at=now, last_blocked_at=now,
+                )
+        except IntegrityError:
+            # Created concurrently by another process
+            source.update(**changes)
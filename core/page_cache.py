@@ -0,0 +1,179 @@
+"""
+core/page_cache.py - Full-page cache for anonymous public pages
+
+Public pages (landing, surveys) render the same HTML for every anonymous
+visitor, so they are rendered once into the shared cache (core/cache.py)
+and served from it with an ETag and a Last-Modified date: repeat visits get
+`304 Not Modified`, and cache hits do no database work at all.
+
+A request is served from the page cache only when its output cannot depend
+on the visitor: GET/HEAD without a session or flash messages cookie, unless
+the view declares that its page never varies per visitor. Cached pages are
+rendered with `page_cache` in the context and must not embed a CSRF token;
+forms fetch one from `landing:csrf` when they are submitted (see
+static/js/script.js and static/js/survey.js).
+
+Responses carry `Cache-Control: public, max-age=...`, so nginx can keep them
+in its own proxy cache (nginx/conf.d) and answer bursts of identical
+requests without reaching Django.
+
+Every key includes the release of the deployed code, so a deploy never
+serves HTML rendered by the previous one: the RELEASE setting when set,
+otherwise the git commit of the checkout or a hash of the static files
+manifest written by collectstatic.
+"""
+import functools
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from core.cache import get_or_compute
+
+
+DEFAULT_PAGE_CACHE_SETTINGS = {
+    'ENABLED': True,
+    'TIMEOUT': 60 * 60,  # Seconds a rendered page stays in the shared cache
+    'MAX_AGE': 60,       # Cache-Control max-age sent to browsers and proxies
+    'RELEASE': '',       # Part of every key; detected when empty (see current_release)
+}
+
+# Cookies that make the page differ per visitor
+VISITOR_COOKIES = ('messages',)
+
+
+def get_page_cache_setting(name):
+    """Read a PAGE_CACHE setting with its default."""
+    return getattr(settings, 'PAGE_CACHE', {}).get(name, DEFAULT_PAGE_CACHE_SETTINGS[name])
+
+
+def _git_commit(base_dir):
+    """Commit checked out in base_dir, read from .git without running git."""
+    git_dir = os.path.join(base_dir, '.git')
+    try:
+        with open(os.path.join(git_dir, 'HEAD')) as head_file:
+            head = head_file.read().strip()
+        if not head.startswith('ref: '):
+            return head
+        ref = head[len('ref: '):]
+        ref_path = os.path.join(git_dir, *ref.split('/'))
+        if os.path.exists(ref_path):
+            with open(ref_path) as ref_file:
+                return ref_file.read().strip()
+        with open(os.path.join(git_dir, 'packed-refs')) as packed_file:
+            for line in packed_file:
+                if line.rstrip('\n').endswith(f' {ref}'):
+                    return line.split()[0]
+    except OSError:
+        pass
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def detect_release():
+    """Git commit of the deployed code, else a hash of the static manifest, else ''."""
+    commit = _git_commit(str(settings.BASE_DIR))
+    if commit:
+        return commit[:12]
+
+    manifest = os.path.join(str(settings.STATIC_ROOT or ''), 'staticfiles.json')
+    try:
+        with open(manifest, 'rb') as manifest_file:
+            return hashlib.sha256(manifest_file.read()).hexdigest()[:12]
+    except OSError:
+        return ''
+
+
+def current_release():
+    """Release that versions every page cache key."""
+    return get_page_cache_setting('RELEASE') or detect_release()
+
+
+def is_cacheable_request(request, varies_by_visitor=True):
+    """
+    True if the page is the same for every visitor sending this request.
+
+    Only cookies are inspected: resolving request.user would load the
+    session from the database.
+    """
+    if not get_page_cache_setting('ENABLED') or request.method not in ('GET', 'HEAD'):
+        return False
+    if not varies_by_visitor:
+        return True
+    cookies = (settings.SESSION_COOKIE_NAME,) + VISITOR_COOKIES
+    return not any(name in request.COOKIES for name in cookies)
+
+
+def page_response(request, page):
+    """Response for a cached page, or 304 if the client copy is current."""
+    response = HttpResponse(page['content'], content_type=page['content_type'])
+    response['ETag'] = page['etag']
+    response['Last-Modified'] = http_date(page['last_modified'])
+    patch_cache_control(response, public=True, max_age=get_page_cache_setting('MAX_AGE'))
+    return get_conditional_response(
+        request, etag=page['etag'], last_modified=page['last_modified'], response=response
+    )
+
+
+class CachedPageMixin:
+    """
+    Serve a TemplateView's GET from the page cache for anonymous visitors.
+
+    Views set `page_cache_namespace` and override `get_page_cache_parts()`
+    with whatever else identifies the page (a survey code, a version).
+    Invalidate with core.cache.invalidate_namespace(page_cache_namespace),
+    or make a version part of the key.
+
+    Views whose template never shows per-visitor content (messages, the
+    user) set `page_cache_varies_by_visitor = False` to serve every GET
+    from the cache.
+    """
+
+    page_cache_namespace = None
+    page_cache_varies_by_visitor = True
+    page_cache = False
+
+    def get_page_cache_parts(self):
+        """Key parts identifying the page inside its namespace."""
+        return ()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page_cache'] = self.page_cache
+        return context
+
+    def render_page(self, request, *args, **kwargs):
+        """Render the page for the cache, or None if it is not a plain 200 page."""
+        self.page_cache = True
+        response = super().get(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code != 200:
+            return None
+
+        content = response.content
+        return {
+            'content': content,
+            'content_type': response['Content-Type'],
+            'etag': '"%s"' % hashlib.sha256(content).hexdigest()[:32],
+            'last_modified': int(time.time()),
+        }
+
+    def get(self, request, *args, **kwargs):
+        if not is_cacheable_request(request, self.page_cache_varies_by_visitor):
+            return super().get(request, *args, **kwargs)
+
+        page = get_or_compute(
+            self.page_cache_namespace,
+            (current_release(),) + tuple(self.get_page_cache_parts()),
+            lambda: self.render_page(request, *args, **kwargs),
+            get_page_cache_setting('TIMEOUT'),
+        )
+        if page is None:
+            self.page_cache = False
+            return super().get(request, *args, **kwargs)
+        return page_response(request, page)
@@ -0,0 +1,135 @@
+"""
+core/protected_media.py - Deliver generated files after the permission check
+
+Generated reports and exports live under MEDIA_ROOT, which nginx does not
+expose. Views check permissions and return `protected_file_response`:
+
+- With X_ACCEL_REDIRECT enabled (production), the response is empty and
+  carries an `X-Accel-Redirect` header; nginx serves the file from its
+  `internal` location, with sendfile and range requests, and the gunicorn
+  worker is free as soon as the headers are sent.
+- Otherwise (development, or files outside MEDIA_ROOT) Django streams the
+  file itself, honouring single `Range: bytes=` requests so interrupted
+  downloads of large ZIPs can resume.
+"""
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header
+
+
+DEFAULT_PROTECTED_MEDIA_SETTINGS = {
+    'X_ACCEL_REDIRECT': False,
+    'ROOT': None,  # Defaults to MEDIA_ROOT
+    'INTERNAL_URL': '/protected/',
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_protected_media_setting(name):
+    """Read a PROTECTED_MEDIA setting with its default."""
+    return getattr(settings, 'PROTECTED_MEDIA', {}).get(name, DEFAULT_PROTECTED_MEDIA_SETTINGS[name])
+
+
+def _internal_path(path):
+    """Path relative to the protected root, or None if the file is outside it."""
+    root = os.path.realpath(str(get_protected_media_setting('ROOT') or settings.MEDIA_ROOT))
+    path = os.path.realpath(str(path))
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return os.path.relpath(path, root)
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive of a single byte range, None for no/unsupported
+    range, or False if the range cannot be satisfied.
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+
+    start, end = match.groups()
+    if start == '':
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+class _FileRange:
+    """File-like object returning only `length` bytes from the current position."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def protected_file_response(request, path, filename, content_type, as_attachment=True):
+    """
+    Response delivering a file under MEDIA_ROOT.
+
+    Args:
+        request: current request (for the Range header)
+        path: absolute path of the file
+        filename: download name
+        content_type: MIME type
+        as_attachment: download (True) or display inline (False)
+    """
+    internal_path = _internal_path(path)
+
+    if get_protected_media_setting('X_ACCEL_REDIRECT') and internal_path is not None:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = get_protected_media_setting('INTERNAL_URL') + quote(internal_path)
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        return response
+
+    size = os.path.getsize(path)
+    byte_range = parse_range(request.headers.get('Range'), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file_obj = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(
+            file_obj, as_attachment=as_attachment, filename=filename, content_type=content_type
+        )
+    else:
+        start, end = byte_range
+        file_obj.seek(start)
+        response = FileResponse(
+            _FileRange(file_obj, end - start + 1),
+            as_attachment=as_attachment, filename=filename, content_type=content_type
+        )
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+
+    response['Accept-Ranges'] = 'bytes'
+    return response
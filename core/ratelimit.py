@@ -0,0 +1,177 @@
+"""
+core/ratelimit.py - Rate limiting for public POST endpoints
+
+The survey submit and contact form endpoints are public and every accepted
+request writes prospects and, for surveys, triggers scoring, a WeasyPrint
+render and an email. Each endpoint (scope) has a budget per client IP and
+per submitted email, kept in the shared cache (core/cache.py):
+
+- A budget allows N requests per fixed window of the period ('5/h').
+- Each request increments the counter of the current window with
+  cache.add() + cache.incr(), so concurrent requests never get more than N
+  through. Incr is atomic on Redis and the local memory cache and best
+  effort on the file and database caches.
+- A request over budget answers 429 with the seconds until the window ends
+  in Retry-After, before any database work.
+- Throttled sources are recorded in ThrottledSource (at most once per
+  RECORD_INTERVAL per source, so a flood does not turn into database
+  writes) and listed in the Django admin, where their budget can be reset.
+
+Limits fail open: if the cache is unavailable requests are let through.
+"""
+import hashlib
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from core.cache import get_cache
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_RATE_LIMIT_SETTINGS = {
+    'ENABLED': True,
+    # Reverse proxies in front of Django that append to X-Forwarded-For
+    'PROXY_COUNT': 0,
+    'RECORD_INTERVAL': 60,
+    'RULES': {
+        'survey_submit': {'ip': '20/h', 'email': '5/h'},
+        'contact': {'ip': '10/h', 'email': '5/h'},
+    },
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+def get_rate_limit_setting(name):
+    """Read a RATE_LIMITS setting with its default."""
+    return getattr(settings, 'RATE_LIMITS', {}).get(name, DEFAULT_RATE_LIMIT_SETTINGS[name])
+
+
+def parse_rate(rate):
+    """'5/h' -> (capacity 5, period 3600 seconds)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period.strip()[0].lower()]
+
+
+def get_rule(scope, dimension):
+    """Rate of a scope and dimension ('ip', 'email'), or None if unlimited."""
+    return get_rate_limit_setting('RULES').get(scope, {}).get(dimension)
+
+
+def client_ip(request):
+    """
+    Client IP address.
+
+    Behind PROXY_COUNT proxies the client is the entry those proxies
+    appended to X-Forwarded-For; earlier entries are set by the client and
+    cannot be trusted.
+    """
+    proxy_count = get_rate_limit_setting('PROXY_COUNT')
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxy_count and forwarded_for:
+        addresses = [address.strip() for address in forwarded_for.split(',')]
+        return addresses[max(len(addresses) - proxy_count, 0)]
+    return request.META.get('REMOTE_ADDR')
+
+
+def source_key(scope, dimension, value):
+    """Key prefix of a source's counters; the value is hashed, not stored."""
+    digest = hashlib.sha256(str(value).strip().lower().encode('utf-8')).hexdigest()[:32]
+    return f"ratelimit:{scope}:{dimension}:{digest}"
+
+
+def window_key(scope, dimension, value, period, now):
+    """Counter of the current window of a source."""
+    return f"{source_key(scope, dimension, value)}:{int(now // period)}"
+
+
+def consume(scope, dimension, value):
+    """
+    Count a request against the budget of a source.
+
+    Returns:
+        0 if the request is allowed, otherwise the seconds until the
+        window ends (the Retry-After)
+    """
+    rule = get_rule(scope, dimension)
+    if not get_rate_limit_setting('ENABLED') or not rule or not value:
+        return 0
+
+    capacity, period = parse_rate(rule)
+    now = time.time()
+    key = window_key(scope, dimension, value, period, now)
+
+    try:
+        cache = get_cache()
+        # The counter outlives its window, the next window uses a new key
+        cache.add(key, 0, period)
+        count = cache.incr(key)
+    except Exception as e:
+        logger.warning(f"Rate limiting no disponible para {scope}: {str(e)}")
+        return 0
+
+    if count <= capacity:
+        return 0
+
+    record_throttled(cache, scope, dimension, value, source_key(scope, dimension, value))
+    return max(1, math.ceil(period - now % period))
+
+
+def check_limits(scope, **sources):
+    """
+    Count a request against the budget of every source (ip=..., email=...).
+
+    Returns:
+        0 if the request is allowed, otherwise the longest Retry-After
+    """
+    retry_after = 0
+    for dimension, value in sources.items():
+        retry_after = max(retry_after, consume(scope, dimension, value))
+    return retry_after
+
+
+def record_throttled(cache, scope, dimension, value, key):
+    """Count a throttled request; flush the count to the database once per interval."""
+    from core.models import ThrottledSource
+
+    counter_key = f"{key}:blocked"
+    interval = get_rate_limit_setting('RECORD_INTERVAL')
+    try:
+        # Outlives the interval between flushes, then goes away with the flood
+        cache.add(counter_key, 0, interval * 2)
+        cache.incr(counter_key)
+        if not cache.add(f"{key}:recorded", 1, interval):
+            return
+        count = cache.get(counter_key) or 1
+        cache.decr(counter_key, count)
+    except Exception as e:
+        logger.warning(f"No se pudo contar la solicitud limitada de {scope}: {str(e)}")
+        count = 1
+
+    logger.warning(f"Solicitudes limitadas en {scope} por {dimension} {value}: {count}")
+    ThrottledSource.record(scope, dimension, str(value).strip().lower(), count)
+
+
+def reset_limit(scope, dimension, value):
+    """Reset the counter of the current window of a source (unblock it)."""
+    rule = get_rule(scope, dimension)
+    if not rule:
+        return
+    _, period = parse_rate(rule)
+    try:
+        get_cache().delete(window_key(scope, dimension, value, period, time.time()))
+    except Exception as e:
+        logger.warning(f"No se pudo reiniciar el límite de {scope}: {str(e)}")
+
+
+def rate_limited_response(retry_after):
+    """429 JSON response with Retry-After."""
+    response = JsonResponse({
+        'success': False,
+        'message': 'Demasiadas solicitudes. Por favor intente nuevamente más tarde.'
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
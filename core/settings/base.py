@@ -2,6 +2,7 @@
 Base settings for SCG Presales project.
 """
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -115,6 +116,135 @@ AUTH_USER_MODEL = 'core.User'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Shared cache (see core/cache.py). CACHE_BACKEND: redis, file, db or locmem.
+# Redis is shared by the whole cluster; the file and database caches are
+# opt-in stand-ins shared by every process of one machine. Development and
+# tests default to locmem: per process, nothing left behind on disk.
+CACHE_BACKENDS = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'scg_presales_cache'),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'app_cache',
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'scg_presales',
+    },
+}
+CACHES = {
+    'default': {
+        **CACHE_BACKENDS[os.environ.get('CACHE_BACKEND', 'locmem')],
+        'KEY_PREFIX': 'scg',
+        'TIMEOUT': 300,
+    }
+}
+
+# Application cache: stampede protection timings in seconds
+APP_CACHE = {
+    'ALIAS': 'default',
+    'LOCK_TIMEOUT': 30,
+    'WAIT_TIMEOUT': 5,
+    'STALE_GRACE': 300,
+    'EARLY_REFRESH_BETA': 1.0,
+}
+
+# Full-page cache for anonymous public pages (core/page_cache.py)
+PAGE_CACHE = {
+    'ENABLED': os.environ.get('PAGE_CACHE_ENABLED', 'true').lower() == 'true',
+    'TIMEOUT': int(os.environ.get('PAGE_CACHE_TIMEOUT', 60 * 60)),
+    'MAX_AGE': int(os.environ.get('PAGE_CACHE_MAX_AGE', 60)),
+    'RELEASE': os.environ.get('RELEASE', ''),
+}
+
+# Survey submissions: seconds an Idempotency-Key replays its stored response
+SUBMISSION_IDEMPOTENCY = {
+    'WINDOW': int(os.environ.get('SUBMISSION_IDEMPOTENCY_WINDOW', 24 * 60 * 60)),
+}
+
+# Rate limits for public POST endpoints (core/ratelimit.py)
+# Rates are '<requests>/<period>' with period s, m, h or d, counted per fixed window
+RATE_LIMITS = {
+    'ENABLED': os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true',
+    'PROXY_COUNT': int(os.environ.get('RATE_LIMIT_PROXY_COUNT', 0)),
+    'RECORD_INTERVAL': 60,
+    'RULES': {
+        'survey_submit': {
+            'ip': os.environ.get('RATE_LIMIT_SURVEY_IP', '20/h'),
+            'email': os.environ.get('RATE_LIMIT_SURVEY_EMAIL', '5/h'),
+        },
+        'contact': {
+            'ip': os.environ.get('RATE_LIMIT_CONTACT_IP', '10/h'),
+            'email': os.environ.get('RATE_LIMIT_CONTACT_EMAIL', '5/h'),
+        },
+    },
+}
+
+# Background job queue (consumed by `manage.py run_workers`)
+# Per job type visibility timeouts (seconds) and concurrency limits
+JOB_QUEUE = {
+    'POLL_INTERVAL': int(os.environ.get('JOB_QUEUE_POLL_INTERVAL', 2)),
+    'BACKOFF_BASE': 30,
+    'BACKOFF_MAX': 3600,
+    'VISIBILITY_TIMEOUT': {
+        'SCORE_SUBMISSION': 120,
+        'RENDER_REPORT': 600,
+        'SEND_EMAIL': 300,
+        'EXPORT_REPORTS': 3600,
+    },
+    'CONCURRENCY': {
+        'SCORE_SUBMISSION': int(os.environ.get('JOB_CONCURRENCY_SCORE', 4)),
+        'RENDER_REPORT': int(os.environ.get('JOB_CONCURRENCY_RENDER', 1)),
+        'SEND_EMAIL': int(os.environ.get('JOB_CONCURRENCY_EMAIL', 2)),
+        'EXPORT_REPORTS': int(os.environ.get('JOB_CONCURRENCY_EXPORT', 1)),
+    },
+}
+
+# Email outbox (delivered by `manage.py run_outbox` over one reused connection)
+# BACKEND defaults to EMAIL_BACKEND; Exchange Online allows 30 messages/minute
+OUTBOX = {
+    'BACKEND': os.environ.get('OUTBOX_EMAIL_BACKEND') or None,
+    'BATCH_SIZE': int(os.environ.get('OUTBOX_BATCH_SIZE', 20)),
+    'POLL_INTERVAL': int(os.environ.get('OUTBOX_POLL_INTERVAL', 5)),
+    'LEASE': 300,
+    'MAX_PER_MINUTE': int(os.environ.get('OUTBOX_MAX_PER_MINUTE', 30)),
+    'BACKOFF_BASE': 30,
+    'BACKOFF_MAX': 3600,
+    'CONNECTION_MAX_AGE': 2700,
+}
+
+# Rendered PDF report cache (content-addressed, LRU eviction by size). The
+# directories of the cache and the exports default to the final MEDIA_ROOT
+# (production.py can override it), resolved when they are used
+REPORT_CACHE = {
+    'ENABLED': os.environ.get('REPORT_CACHE_ENABLED', 'true').lower() == 'true',
+    'DIR': os.environ.get('REPORT_CACHE_DIR') or None,  # Defaults to MEDIA_ROOT/report_cache
+    'MAX_BYTES': int(os.environ.get('REPORT_CACHE_MAX_MB', 500)) * 1024 * 1024,
+}
+
+# Bulk report exports: render processes per export, batch size streamed
+# inside the request (larger batches run as a background job)
+REPORT_EXPORT = {
+    'WORKERS': int(os.environ.get('REPORT_EXPORT_WORKERS', min(4, os.cpu_count() or 1))),
+    'INLINE_MAX': int(os.environ.get('REPORT_EXPORT_INLINE_MAX', 50)),
+    'DIR': os.environ.get('REPORT_EXPORT_DIR') or None,  # Defaults to MEDIA_ROOT/exports
+    'RETENTION_DAYS': 7,
+}
+
+# Generated files under MEDIA_ROOT are delivered after the permission check:
+# by nginx through X-Accel-Redirect to its internal location, or by Django
+PROTECTED_MEDIA = {
+    'X_ACCEL_REDIRECT': os.environ.get('PROTECTED_MEDIA_X_ACCEL', 'false').lower() == 'true',
+    'ROOT': None,  # Defaults to MEDIA_ROOT
+    'INTERNAL_URL': '/protected/',
+}
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -12,6 +12,8 @@ load_dotenv(BASE_DIR / '.env' / 'production.env')
 DEBUG = False
 
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '').split(',') + ['159.65.239.205']
+# Compose service names, used as Host by probes from inside the Docker network
+ALLOWED_HOSTS += os.environ.get('INTERNAL_HOSTS', 'backend,backend_admin').split(',')
 
 # Add whitenoise middleware for static files
 MIDDLEWARE = [
@@ -41,9 +43,40 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': os.environ.get('DB_PORT'),
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
+# Database connections (DB_CONNECTION_MODE):
+# - pool: psycopg connection pool per process (gunicorn worker, run_workers)
+# - persistent: one connection per thread reused for DB_CONN_MAX_AGE seconds
+# - pgbouncer: persistent connections to pgbouncer in transaction pooling
+#   mode; server-side cursors are disabled because they do not survive
+#   across transactions there
+DB_CONNECTION_MODE = os.environ.get('DB_CONNECTION_MODE', 'pool')
+
+# Connections are checked before use (for the pool: before being handed out)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+if DB_CONNECTION_MODE == 'pool':
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # Required by the pool
+    DATABASES['default']['OPTIONS']['pool'] = {
+        # Size max_size to the threads of a process (GUNICORN_THREADS)
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 8)),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+    }
+elif DB_CONNECTION_MODE in ('persistent', 'pgbouncer'):
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+    if DB_CONNECTION_MODE == 'pgbouncer':
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+else:
+    raise ValueError("DB_CONNECTION_MODE must be one of: pool, persistent, pgbouncer")
+
 # Email settings for production - Microsoft 365 via Graph API
 EMAIL_BACKEND = 'django_o365mail.EmailBackend'
 O365_MAIL_CLIENT_ID = os.environ.get('O365_MAIL_CLIENT_ID')
@@ -57,7 +90,7 @@ SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_SECONDS = 31536000
-SECURE_REDIRECT_EXEMPT = []
+SECURE_REDIRECT_EXEMPT = [r'^health/$']  # Probes from inside the Docker network
 SECURE_SSL_REDIRECT = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 SESSION_COOKIE_SECURE = True
@@ -70,18 +103,30 @@ STATIC_ROOT = os.environ.get('STATIC_ROOT', BASE_DIR / 'staticfiles')
 # Whitenoise settings for static files
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Page cache keys include the release, so a deploy never serves the previous
+# HTML. Set RELEASE to the commit SHA or image tag at deploy time, e.g.
+# RELEASE=$(git rev-parse --short HEAD) docker compose up -d. When unset, the
+# git checkout mounted at /app or the collectstatic manifest hash is used
+# (see core.page_cache.current_release).
+PAGE_CACHE['RELEASE'] = os.environ.get('RELEASE', '')
+
 # Media files for production
 MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'media')
 
-# # Cache for production - Redis
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-#         'LOCATION': os.environ.get(
-#             'REDIS_URL', 'redis://127.0.0.1:6379/1'
-#         ),
-#     }
-# }
+# nginx serves generated reports and exports from its internal /protected/ location
+PROTECTED_MEDIA['X_ACCEL_REDIRECT'] = os.environ.get('PROTECTED_MEDIA_X_ACCEL', 'true').lower() == 'true'
+
+# Behind nginx: the client IP is the X-Forwarded-For entry nginx appends
+RATE_LIMITS['PROXY_COUNT'] = int(os.environ.get('RATE_LIMIT_PROXY_COUNT', 1))
+
+# Cache for production - Redis, shared by every worker and container
+CACHES = {
+    'default': {
+        **CACHE_BACKENDS[os.environ.get('CACHE_BACKEND', 'redis')],
+        'KEY_PREFIX': 'scg',
+        'TIMEOUT': 300,
+    }
+}
 
 # Production logging - adjusted for Docker
 LOGGING['handlers']['file']['filename'] = os.environ.get(
@@ -0,0 +1,124 @@
+"""
+core/tabular_export.py - Streamed CSV and XLSX files for StreamingHttpResponse
+
+Rows are consumed from an iterator and written out as they arrive, so the
+memory used does not depend on the number of rows. XLSX files are written
+as a minimal Office Open XML package with inline strings (no shared string
+table) on top of core/zip_stream.
+"""
+import csv
+import math
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from .zip_stream import stream_zip
+
+
+CSV_CONTENT_TYPE = 'text/csv'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Characters XML 1.0 does not allow even escaped (C0 controls other than tab,
+# newline and carriage return, lone surrogates, U+FFFE and U+FFFF); Excel
+# refuses to open a workbook that contains them
+_XML_ILLEGAL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+
+
+class _Echo:
+    """File-like object whose write returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    """Yield the lines of a CSV file as UTF-8 bytes."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header).encode('utf-8')
+    for row in rows:
+        yield writer.writerow(row).encode('utf-8')
+
+
+_CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xml_text(value):
+    """Escaped XML text for a value, without the characters XML cannot hold."""
+    return escape(_XML_ILLEGAL_CHARS.sub('', str(value)))
+
+
+def _workbook_xml(sheet_name):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{_xml_text(sheet_name[:31]).replace(chr(34), "&quot;")}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _xlsx_cell(value):
+    """Cell XML for a value; numbers stay numeric, everything else is an inline string."""
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool):
+        value = 'Sí' if value else 'No'
+    if isinstance(value, (int, float, Decimal)) and math.isfinite(value):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+    elif isinstance(value, date):
+        value = value.strftime('%Y-%m-%d')
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{_xml_text(value)}</t></is></c>'
+
+
+def _sheet_xml(header, rows):
+    """Yield the worksheet XML row by row."""
+    yield (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+    )
+    yield '<row>' + ''.join(_xlsx_cell(value) for value in header) + '</row>'
+    for row in rows:
+        yield '<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>'
+    yield '</sheetData></worksheet>'
+
+
+def stream_xlsx(header, rows, sheet_name='Datos'):
+    """Yield the bytes of a single-sheet XLSX workbook."""
+    return stream_zip([
+        ('[Content_Types].xml', _CONTENT_TYPES_XML),
+        ('_rels/.rels', _ROOT_RELS_XML),
+        ('xl/workbook.xml', _workbook_xml(sheet_name)),
+        ('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS_XML),
+        ('xl/worksheets/sheet1.xml', _sheet_xml(header, rows)),
+    ])
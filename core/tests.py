@@ -0,0 +1,579 @@
+import csv
+import io
+import os
+import runpy
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from xml.etree import ElementTree
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import cached, get_or_compute, invalidate_namespace, make_key
+from .jobs import JOB_HANDLERS, JobQueue
+from .models import Job, JobStatus, JobType, User
+from .page_cache import current_release, detect_release
+from .protected_media import parse_range, protected_file_response
+from .ratelimit import consume, record_throttled, reset_limit
+from .tabular_export import stream_csv, stream_xlsx
+from .zip_stream import stream_zip
+
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests'}}
+
+
+class HealthCheckViewTests(TestCase):
+    """The public health endpoint only tells the status."""
+
+    def test_anonymous_gets_the_status_only(self):
+        response = self.client.get(reverse('health'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_staff_gets_the_database_details(self):
+        user = User.objects.create_superuser(
+            email='admin@example.com', password='test-password', first_name='Admin', last_name='SCG'
+        )
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('health'))
+
+        self.assertEqual(response.json()['status'], 'ok')
+        self.assertIn('latency_ms', response.json()['database'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GetOrComputeTests(SimpleTestCase):
+    """Shared cache values computed once, with stampede protection."""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='report', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def store(self, value, expires_in, delta):
+        cache.set(make_key('reports', 1), {'value': value, 'expires': time.time() + expires_in, 'delta': delta})
+
+    def test_value_is_computed_once(self):
+        get_or_compute('reports', (1,), self.compute(), 60)
+
+        self.assertEqual(get_or_compute('reports', (1,), self.compute(), 60), 'report')
+        self.assertEqual(self.calls, 1)
+
+    def test_invalidate_namespace_bumps_the_version(self):
+        @cached('reports', 60)
+        def report(report_id):
+            return self.compute(f'report {self.calls}')()
+
+        old_key = make_key('reports', 1)
+        report(1)
+        invalidate_namespace('reports')
+
+        self.assertNotEqual(make_key('reports', 1), old_key)
+        self.assertEqual(report(1), 'report 1')
+        self.assertEqual(self.calls, 2)
+
+    @override_settings(APP_CACHE={'EARLY_REFRESH_BETA': 1.0})
+    def test_slow_value_near_expiry_is_refreshed_early(self):
+        self.store('old', expires_in=1, delta=10)
+
+        with mock.patch('core.cache.random.random', return_value=0.5):
+            value = get_or_compute('reports', (1,), self.compute('new'), 60)
+
+        self.assertEqual(value, 'new')
+
+    @override_settings(APP_CACHE={'EARLY_REFRESH_BETA': 0})
+    def test_without_beta_values_are_served_until_they_expire(self):
+        self.store('old', expires_in=1, delta=10)
+
+        self.assertEqual(get_or_compute('reports', (1,), self.compute('new'), 60), 'old')
+        self.assertEqual(self.calls, 0)
+
+    def test_stale_value_is_served_while_another_process_refreshes(self):
+        self.store('old', expires_in=-1, delta=0)
+        cache.add(f"{make_key('reports', 1)}:lock", 1, 30)
+
+        self.assertEqual(get_or_compute('reports', (1,), self.compute('new'), 60), 'old')
+        self.assertEqual(self.calls, 0)
+
+    def test_cold_key_is_computed_by_a_single_thread(self):
+        barrier = threading.Barrier(5)
+        values = []
+
+        def read():
+            barrier.wait()
+            values.append(get_or_compute('reports', (1,), self.compute(delay=0.2), 60))
+
+        threads = [threading.Thread(target=read) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(values, ['report'] * 5)
+        self.assertEqual(self.calls, 1)
+
+    def test_cache_down_computes_the_value(self):
+        with mock.patch.object(caches['default'], 'get', side_effect=ConnectionError('cache down')), \
+                self.assertLogs('core.cache', 'WARNING'):
+            value = get_or_compute('reports', (1,), self.compute(), 60)
+
+        self.assertEqual(value, 'report')
+
+    def test_waiter_takes_over_when_the_computing_process_fails(self):
+        lock_key = f"{make_key('reports', 1)}:lock"
+        # Another process holds the lock and its compute() raises
+        cache.add(lock_key, 1, 30)
+        threading.Timer(0.1, cache.delete, [lock_key]).start()
+
+        started = time.monotonic()
+        value = get_or_compute('reports', (1,), lambda: 'report', 60)
+
+        self.assertEqual(value, 'report')
+        self.assertLess(time.monotonic() - started, 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMITS={'RULES': {'contact': {'ip': '5/h'}}})
+class RateLimitTests(SimpleTestCase):
+    """Per source request budgets kept in the shared cache."""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('core.ratelimit.record_throttled')
+        self.record_throttled = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_concurrent_requests_get_exactly_the_budget(self):
+        attempts = 20
+        barrier = threading.Barrier(attempts)
+        results = []
+
+        def request():
+            barrier.wait()
+            results.append(consume('contact', 'ip', '203.0.113.7'))
+
+        threads = [threading.Thread(target=request) for _ in range(attempts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(0), 5)
+        self.assertTrue(all(0 < retry_after <= 3600 for retry_after in results if retry_after))
+        self.assertEqual(self.record_throttled.call_count, attempts - 5)
+
+    def test_reset_limit_unblocks_the_source(self):
+        for _ in range(6):
+            consume('contact', 'ip', '203.0.113.7')
+
+        reset_limit('contact', 'ip', '203.0.113.7')
+
+        self.assertEqual(consume('contact', 'ip', '203.0.113.7'), 0)
+
+    def test_throttled_count_expires(self):
+        locmem = caches['default']
+
+        with mock.patch.object(locmem, 'add', wraps=locmem.add) as add, \
+                mock.patch('core.models.ThrottledSource.record') as record, \
+                self.assertLogs('core.ratelimit', 'WARNING'):
+            record_throttled(locmem, 'contact', 'ip', '203.0.113.7', 'ratelimit:test')
+
+        record.assert_called_once_with('contact', 'ip', '203.0.113.7', 1)
+        timeouts = {call.args[0]: call.args[2] for call in add.call_args_list}
+        self.assertEqual(timeouts, {'ratelimit:test:blocked': 120, 'ratelimit:test:recorded': 60})
+
+    def test_cache_down_lets_requests_through(self):
+        with mock.patch.object(caches['default'], 'incr', side_effect=ConnectionError('cache down')), \
+                self.assertLogs('core.ratelimit', 'WARNING'):
+            self.assertEqual(consume('contact', 'ip', '203.0.113.7'), 0)
+
+
+class JobQueueTests(TestCase):
+    """Claiming, running, retrying and reclaiming background jobs."""
+
+    def run_next(self, worker_id='worker-1', job_types=None):
+        job = JobQueue.claim(worker_id, job_types)
+        if job is not None:
+            JobQueue.run(job, worker_id)
+        return job
+
+    def test_claim_takes_the_oldest_due_job(self):
+        older = Job.enqueue(JobType.SEND_EMAIL, run_at=timezone.now() - timedelta(minutes=5))
+        Job.enqueue(JobType.SEND_EMAIL)
+        Job.enqueue(JobType.SEND_EMAIL, run_at=timezone.now() + timedelta(minutes=5))
+
+        job = JobQueue.claim('worker-1', [JobType.SEND_EMAIL])
+
+        self.assertEqual(job.id, older.id)
+        self.assertEqual((job.status, job.locked_by, job.attempts), (JobStatus.RUNNING, 'worker-1', 1))
+        self.assertGreater(job.locked_until, timezone.now())
+
+    def test_completed_job_stores_the_result(self):
+        job = Job.enqueue(JobType.SEND_EMAIL)
+
+        with mock.patch.dict(JOB_HANDLERS, {JobType.SEND_EMAIL: lambda payload: {'sent': True}}):
+            self.run_next()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (JobStatus.DONE, {'sent': True}))
+        self.assertIsNone(job.locked_until)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = Job.enqueue(JobType.SEND_EMAIL)
+
+        with mock.patch.dict(JOB_HANDLERS, {JobType.SEND_EMAIL: mock.Mock(side_effect=RuntimeError('SMTP'))}), \
+                self.assertLogs('core.jobs', 'WARNING'):
+            self.run_next()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), (JobStatus.PENDING, 'SMTP'))
+        # BACKOFF_BASE 30s for the first retry, with +-20% jitter
+        delay = (job.run_at - timezone.now()).total_seconds()
+        self.assertTrue(20 < delay <= 36, delay)
+        self.assertIsNone(JobQueue.claim('worker-1'))
+
+    def test_job_fails_after_its_last_attempt(self):
+        job = Job.enqueue(JobType.SEND_EMAIL, max_attempts=2)
+        handler = mock.Mock(side_effect=RuntimeError('SMTP'))
+
+        with mock.patch.dict(JOB_HANDLERS, {JobType.SEND_EMAIL: handler}), self.assertLogs('core.jobs', 'WARNING'):
+            for _ in range(2):
+                self.run_next()
+                Job.objects.filter(id=job.id, status=JobStatus.PENDING).update(run_at=timezone.now())
+
+            self.assertIsNone(self.run_next())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (JobStatus.FAILED, 2))
+        self.assertEqual(handler.call_count, 2)
+
+    def test_abandoned_job_is_reclaimed_after_its_lease(self):
+        job = Job.enqueue(JobType.SEND_EMAIL)
+        JobQueue.claim('worker-1')
+        self.assertIsNone(JobQueue.claim('worker-2'))
+
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = JobQueue.claim('worker-2')
+
+        self.assertEqual((reclaimed.id, reclaimed.locked_by, reclaimed.attempts), (job.id, 'worker-2', 2))
+
+    def test_abandoned_job_without_attempts_left_expires(self):
+        job = Job.enqueue(JobType.SEND_EMAIL, max_attempts=1)
+        JobQueue.claim('worker-1')
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(JobQueue.expire_exhausted(), 1)
+        self.assertEqual(Job.objects.get(id=job.id).status, JobStatus.FAILED)
+
+    @override_settings(JOB_QUEUE={'CONCURRENCY': {JobType.RENDER_REPORT: 1}})
+    def test_claims_stop_at_the_concurrency_limit(self):
+        Job.enqueue(JobType.RENDER_REPORT)
+        Job.enqueue(JobType.RENDER_REPORT)
+        email = Job.enqueue(JobType.SEND_EMAIL)
+
+        self.assertEqual(JobQueue.claim('worker-1', [JobType.RENDER_REPORT]).job_type, JobType.RENDER_REPORT)
+        self.assertIsNone(JobQueue.claim('worker-2', [JobType.RENDER_REPORT]))
+        self.assertEqual(JobQueue.claim('worker-2').id, email.id)
+
+    @override_settings(DEBUG=True)
+    def test_score_job_chains_the_report_and_the_email(self):
+        from communications.models import OutboundEmail
+        from prospects.models import Prospect
+        from scoring.models import ScoreResult
+        from surveys.models import Question, QuestionOption, Response, Survey, SurveySection, SurveySubmission
+
+        survey = Survey.objects.create(title='Diagnóstico', version='1.0', max_score=10)
+        section = SurveySection.objects.create(survey=survey, title='Gobierno', order=1, max_points=10)
+        question = Question.objects.create(
+            survey=survey, section=section, question_text='¿Tiene un plan de respuesta?',
+            question_type='SINGLE_CHOICE', order=1, max_points=10,
+        )
+        option = QuestionOption.objects.create(question=question, option_text='Sí', order=1, points=10)
+        prospect = Prospect.objects.create(email='ana@example.com', name='Ana', company_name='ACME')
+        submission = SurveySubmission.objects.create(prospect=prospect, survey=survey, completed_at=timezone.now())
+        Response.objects.create(submission=submission, question=question, selected_option=option, points_earned=10)
+
+        self.assertEqual(self.run_next().job_type, JobType.SCORE_SUBMISSION)
+        self.assertEqual(self.run_next().job_type, JobType.RENDER_REPORT)
+        self.assertIsNone(self.run_next())
+
+        score_result = ScoreResult.objects.get(submission=submission)
+        self.assertEqual(score_result.score_percentage, 100)
+        self.assertEqual(OutboundEmail.objects.get().to_email, 'ana@example.com')
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {JobStatus.DONE})
+
+
+@override_settings(JOB_QUEUE={'CONCURRENCY': {JobType.RENDER_REPORT: 2}})
+class ConcurrentClaimTests(TransactionTestCase):
+    """Workers claiming at once never run more jobs of a type than its limit."""
+
+    def setUp(self):
+        # SQLite ignores SELECT ... FOR UPDATE: in development the limit only
+        # holds for claims that do not overlap (see JobQueue.claim)
+        if not connection.features.has_select_for_update:
+            self.skipTest('The per-type limit needs SELECT ... FOR UPDATE (PostgreSQL)')
+
+    def test_parallel_claims_honour_the_limit(self):
+        for _ in range(6):
+            Job.enqueue(JobType.RENDER_REPORT)
+
+        attempts = 6
+        barrier = threading.Barrier(attempts)
+        claimed = []
+
+        def claim(index):
+            try:
+                barrier.wait()
+                claimed.append(JobQueue.claim(f'worker-{index}', [JobType.RENDER_REPORT]))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=claim, args=(index,)) for index in range(attempts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len([job for job in claimed if job is not None]), 2)
+        self.assertEqual(Job.objects.filter(status=JobStatus.RUNNING).count(), 2)
+
+
+class StreamZipTests(SimpleTestCase):
+    """Streamed archives are valid ZIP files with every entry intact."""
+
+    def test_entries_round_trip(self):
+        chunks = (f'línea {i}\n' for i in range(1000))
+        data = b''.join(stream_zip([('a.txt', 'hola'), ('b.bin', b'\x00\x01'), ('c.txt', chunks)]))
+
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), ['a.txt', 'b.bin', 'c.txt'])
+            self.assertEqual(archive.read('a.txt'), b'hola')
+            self.assertEqual(archive.read('b.bin'), b'\x00\x01')
+            self.assertEqual(archive.read('c.txt').decode('utf-8').splitlines()[-1], 'línea 999')
+
+    def test_output_is_streamed(self):
+        entries = [(f'{i}.txt', [b'x' * 65536]) for i in range(3)]
+        self.assertGreater(len(list(stream_zip(entries, compression=zipfile.ZIP_STORED))), 3)
+
+
+class TabularExportTests(SimpleTestCase):
+    """Streamed XLSX and CSV files parse back to the exported values."""
+
+    NS = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+    def read_xlsx(self, header, rows, **kwargs):
+        """Parse the workbook back into (sheet name, rows of (type, text) per cell)."""
+        data = b''.join(stream_xlsx(header, rows, **kwargs))
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIn('[Content_Types].xml', archive.namelist())
+            workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+            sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+
+        cells = [
+            [(cell.get('t'), ''.join(cell.itertext())) for cell in row.findall('m:c', self.NS)]
+            for row in sheet.find('m:sheetData', self.NS)
+        ]
+        return workbook.find('m:sheets/m:sheet', self.NS).get('name'), cells
+
+    def test_values(self):
+        name, cells = self.read_xlsx(
+            ['Empresa', 'Score'],
+            iter([
+                ['ACME <S.A.> & "Cía"', Decimal('72.50')],
+                [True, 3],
+                [datetime(2024, 5, 1, 9, 30), date(2024, 5, 2)],
+                [None, float('nan')],
+            ]),
+            sheet_name='Reporte "mayo"',
+        )
+
+        self.assertEqual(name, 'Reporte "mayo"')
+        self.assertEqual(cells, [
+            [('inlineStr', 'Empresa'), ('inlineStr', 'Score')],
+            [('inlineStr', 'ACME <S.A.> & "Cía"'), (None, '72.50')],
+            [('inlineStr', 'Sí'), (None, '3')],
+            [('inlineStr', '2024-05-01 09:30:00'), ('inlineStr', '2024-05-02')],
+            [(None, ''), ('inlineStr', 'nan')],
+        ])
+
+    def test_control_characters_are_dropped(self):
+        name, cells = self.read_xlsx(
+            ['Notas'], [['línea 1\x0blínea 2\x00\ttab\nfin']], sheet_name='Hoja\x01'
+        )
+
+        self.assertEqual(name, 'Hoja')
+        self.assertEqual(cells[1], [('inlineStr', 'línea 1línea 2\ttab\nfin')])
+
+    def test_csv(self):
+        data = b''.join(stream_csv(['Empresa', 'Score'], iter([['ACME, "Cía"', 72], ['Ñandú\nSur', None]])))
+
+        self.assertEqual(
+            list(csv.reader(io.StringIO(data.decode('utf-8')))),
+            [['Empresa', 'Score'], ['ACME, "Cía"', '72'], ['Ñandú\nSur', '']],
+        )
+
+
+class ProtectedFileResponseTests(SimpleTestCase):
+    """Protected files go through nginx when enabled, otherwise Django serves them with ranges."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        os.makedirs(os.path.join(self.media_root, 'exports'))
+        self.path = os.path.join(self.media_root, 'exports', 'export 1.zip')
+        with open(self.path, 'wb') as export_file:
+            export_file.write(bytes(range(100)))
+
+    def get(self, path=None, x_accel=False, **headers):
+        protected_media = {'X_ACCEL_REDIRECT': x_accel, 'ROOT': self.media_root, 'INTERNAL_URL': '/protected/'}
+        with self.settings(MEDIA_ROOT=self.media_root, PROTECTED_MEDIA=protected_media):
+            return protected_file_response(
+                RequestFactory().get('/', headers=headers), path or self.path, 'Reportes.zip', 'application/zip'
+            )
+
+    def test_x_accel_redirect(self):
+        response = self.get(x_accel=True)
+
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/exports/export%201.zip')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="Reportes.zip"')
+        self.assertEqual(response.content, b'')
+
+    def test_files_outside_the_root_are_streamed(self):
+        outside = tempfile.NamedTemporaryFile(suffix='.zip', delete=False)
+        self.addCleanup(os.remove, outside.name)
+        with outside:
+            outside.write(b'PK')
+
+        response = self.get(outside.name, x_accel=True)
+
+        self.assertNotIn('X-Accel-Redirect', response)
+        self.assertEqual(b''.join(response.streaming_content), b'PK')
+
+    def test_whole_file(self):
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(100)))
+
+    def test_range(self):
+        response = self.get(Range='bytes=10-19')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range='bytes=100-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-5', 100), (95, 99))
+        self.assertEqual(parse_range('bytes=0-500', 100), (0, 99))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range(None, 100))
+        self.assertFalse(parse_range('bytes=-0', 100))
+
+
+class GunicornConfigTests(SimpleTestCase):
+    """gunicorn.conf.py loads and resolves each serving profile from the environment."""
+
+    def load(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            # Overrides set on the machine running the tests do not count
+            for name in [name for name in os.environ if name.startswith('GUNICORN_')]:
+                if name not in environ:
+                    del os.environ[name]
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'))
+
+    def test_profiles(self):
+        public = self.load(SERVER_PROFILE='public')
+        admin = self.load(SERVER_PROFILE='admin')
+
+        self.assertEqual((public['timeout'], public['threads']), (30, 4))
+        self.assertEqual((admin['timeout'], admin['max_requests']), (300, 200))
+        self.assertLess(admin['workers'], public['workers'])
+        self.assertEqual(public['wsgi_app'], 'core.wsgi:application')
+        self.assertEqual(admin['proc_name'], 'scg_presales-admin')
+
+    def test_environment_overrides(self):
+        config = self.load(
+            SERVER_PROFILE='admin', GUNICORN_WORKERS='3', GUNICORN_TIMEOUT='120', GUNICORN_WORKER_CLASS='uvicorn'
+        )
+
+        self.assertEqual((config['workers'], config['timeout'], config['threads']), (3, 120, 1))
+        self.assertEqual(config['wsgi_app'], 'core.asgi:application')
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            self.load(SERVER_PROFILE='worker')
+
+
+class ReleaseTests(SimpleTestCase):
+    """Page cache keys follow the deployed release without configuration."""
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, ignore_errors=True)
+        detect_release.cache_clear()
+        self.addCleanup(detect_release.cache_clear)
+
+    def write(self, path, content):
+        path = os.path.join(self.base_dir, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as release_file:
+            release_file.write(content)
+
+    def release(self, **page_cache):
+        with self.settings(BASE_DIR=self.base_dir, STATIC_ROOT=os.path.join(self.base_dir, 'static'),
+                           PAGE_CACHE=page_cache):
+            detect_release.cache_clear()
+            return current_release()
+
+    def test_git_commit(self):
+        self.write('.git/HEAD', 'ref: refs/heads/main\n')
+        self.write('.git/refs/heads/main', 'a1b2c3d4e5f60718293a4b5c6d7e8f9012345678\n')
+
+        self.assertEqual(self.release(), 'a1b2c3d4e5f6')
+
+    def test_packed_ref(self):
+        self.write('.git/HEAD', 'ref: refs/heads/main\n')
+        self.write('.git/packed-refs', '# pack-refs\n0123456789abcdef0123456789abcdef01234567 refs/heads/main\n')
+
+        self.assertEqual(self.release(), '0123456789ab')
+
+    def test_static_manifest_without_a_checkout(self):
+        self.write('static/staticfiles.json', '{"paths": {"css/style.css": "css/style.1a2b.css"}}')
+        first = self.release()
+        self.write('static/staticfiles.json', '{"paths": {"css/style.css": "css/style.3c4d.css"}}')
+
+        self.assertEqual(len(first), 12)
+        self.assertNotEqual(self.release(), first)
+
+    def test_setting_wins(self):
+        self.write('.git/HEAD', 'a1b2c3d4e5f60718293a4b5c6d7e8f9012345678\n')
+
+        self.assertEqual(self.release(RELEASE='v2.3.0'), 'v2.3.0')
+        self.assertEqual(self.release(), 'a1b2c3d4e5f6')
@@ -4,6 +4,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import HealthCheckView
+
 urlpatterns = [
     # Admin
     path('admin/', admin.site.urls),
@@ -19,6 +21,9 @@ urlpatterns = [
     
     # Reports (NEW)
     path('reports/', include('reports.urls')),
+    
+    # Health check (database round trip and connection usage)
+    path('health/', HealthCheckView.as_view(), name='health'),
 ]
 
 # Serve media files in development
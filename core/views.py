@@ -0,0 +1,24 @@
+"""
+Core views - infrastructure endpoints.
+"""
+from django.http import JsonResponse
+from django.views import View
+
+from .db import database_health
+
+
+class HealthCheckView(View):
+    """
+    Liveness and database health for load balancers and monitoring.
+
+    Returns 503 when the database does not answer. The endpoint is public,
+    so only the status is returned; staff users also get the database
+    latency, connection and pool statistics.
+    """
+
+    def get(self, request):
+        database = database_health()
+        payload = {'status': 'ok' if database['ok'] else 'error'}
+        if request.user.is_authenticated and request.user.is_staff:
+            payload['database'] = database
+        return JsonResponse(payload, status=200 if database['ok'] else 503)
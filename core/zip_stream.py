@@ -0,0 +1,59 @@
+"""
+core/zip_stream.py - Build ZIP archives incrementally without holding them in memory
+"""
+import zipfile
+
+
+class _ChunkWriter:
+    """Write-only file object that hands back what was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries, compression=zipfile.ZIP_DEFLATED):
+    """
+    Yield the bytes of a ZIP archive built from (name, content) pairs.
+
+    `content` is bytes, str or an iterable of bytes/str chunks. Output is
+    yielded as soon as each chunk is compressed, so only the chunk being
+    written is held in memory. Suitable for StreamingHttpResponse or for
+    writing the archive to a file.
+    """
+    writer = _ChunkWriter()
+
+    with zipfile.ZipFile(writer, 'w', compression) as archive:
+        for name, content in entries:
+            if isinstance(content, (bytes, str)):
+                content = [content]
+
+            with archive.open(name, 'w') as entry:
+                for chunk in content:
+                    entry.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                    data = writer.drain()
+                    if data:
+                        yield data
+
+            data = writer.drain()
+            if data:
+                yield data
+
+    # Central directory, written when the archive is closed
+    yield writer.drain()
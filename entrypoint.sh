@@ -3,29 +3,51 @@
 # Set Django settings module for production
 export DJANGO_SETTINGS_MODULE=core.settings.production
 
-echo '======> Running collectstatic...'
-python manage.py collectstatic --no-input
+# Only one service runs collectstatic, makemigrations and migrations (the
+# admin pool sets RUN_MIGRATIONS=false): two containers writing migration
+# files to the shared /app volume and migrating at once would race
+if [ "${RUN_MIGRATIONS:-true}" = "true" ]; then
+    echo '======> Running collectstatic...'
+    python manage.py collectstatic --no-input
 
-echo '\n======> Applying migrations...'
-python manage.py makemigrations
+    echo '\n======> Applying migrations...'
+    python manage.py makemigrations
 
-# Try to run migrations with retry logic
-echo 'Running database migrations...'
-for i in 1 2 3 4 5; do
-    echo "Migration attempt $i..."
-    # First migrate core app (contains User model)
-    if python manage.py migrate core && python manage.py migrate; then
-        echo "Migrations completed successfully"
-        break
-    else
-        echo "Migration failed, retrying in 5 seconds..."
-        sleep 5
-    fi
-    if [ $i -eq 5 ]; then
-        echo "ERROR: Migrations failed after 5 attempts. Check database permissions."
-        echo "Continuing with server startup..."
-    fi
-done
+    # Try to run migrations with retry logic
+    echo 'Running database migrations...'
+    for i in 1 2 3 4 5; do
+        echo "Migration attempt $i..."
+        # First migrate core app (contains User model)
+        if python manage.py migrate core && python manage.py migrate; then
+            echo "Migrations completed successfully"
+            # Table of the database cache (no-op for other cache backends)
+            python manage.py createcachetable
+            break
+        else
+            echo "Migration failed, retrying in 5 seconds..."
+            sleep 5
+        fi
+        if [ $i -eq 5 ]; then
+            echo "ERROR: Migrations failed after 5 attempts. Check database permissions."
+            echo "Continuing with server startup..."
+        fi
+    done
+else
+    # Wait for the migrating service instead of serving an outdated schema
+    echo 'Waiting for database migrations...'
+    for i in $(seq 1 30); do
+        if python manage.py migrate --check > /dev/null 2>&1; then
+            echo "Database schema is up to date"
+            break
+        fi
+        if [ $i -eq 30 ]; then
+            echo "WARNING: Migrations still pending after 150 seconds, starting anyway"
+        else
+            sleep 5
+        fi
+    done
+fi
 
-echo '\n======> Running server...'
-gunicorn core.wsgi:application --bind 0.0.0.0:8000 --workers 1 --timeout 300 --worker-class sync
\ No newline at end of file
+echo "\n======> Running server (profile: ${SERVER_PROFILE:-all})..."
+# Workers, threads, timeouts and recycling come from gunicorn.conf.py (GUNICORN_* variables)
+exec gunicorn -c gunicorn.conf.py
@@ -0,0 +1,89 @@
+"""
+gunicorn.conf.py - Serving profiles for gunicorn (used by entrypoint.sh)
+
+SERVER_PROFILE picks defaults for the traffic an instance serves:
+
+- public: landing page and surveys. Short requests, many threads, short
+  timeout, so a slow client or request never holds the site.
+- admin: admin panel, Django admin and reports. WeasyPrint renders and O365
+  calls are slow and memory hungry: fewer workers, long timeout and
+  frequent recycling (max_requests) to contain memory growth.
+- all: one instance for everything (single container deployments).
+
+nginx routes /admin/, /admin-panel/ and /reports/ to the admin instance and
+everything else to the public one (see nginx/conf.d). Every value can be
+overridden with its GUNICORN_* environment variable.
+
+GUNICORN_WORKER_CLASS: 'gthread' (default), 'sync', or 'uvicorn' to serve
+core/asgi.py with uvicorn.workers.UvicornWorker (requires uvicorn).
+"""
+import multiprocessing
+import os
+
+
+PROFILES = {
+    'public': {
+        'workers': multiprocessing.cpu_count() * 2 + 1,
+        'threads': 4,
+        'timeout': 30,
+        'max_requests': 2000,
+    },
+    'admin': {
+        'workers': max(2, multiprocessing.cpu_count()),
+        'threads': 2,
+        'timeout': 300,
+        'max_requests': 200,
+    },
+    'all': {
+        'workers': multiprocessing.cpu_count() + 1,
+        'threads': 4,
+        'timeout': 300,
+        'max_requests': 500,
+    },
+}
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+
+profile_name = os.environ.get('SERVER_PROFILE', 'all')
+if profile_name not in PROFILES:
+    raise ValueError(f"SERVER_PROFILE must be one of: {', '.join(PROFILES)}")
+profile = PROFILES[profile_name]
+
+
+def env_int(name, default):
+    """Integer from the environment, or the profile default."""
+    return int(os.environ.get(name, default))
+
+
+worker_mode = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_mode not in WORKER_CLASSES:
+    raise ValueError(f"GUNICORN_WORKER_CLASS must be one of: {', '.join(WORKER_CLASSES)}")
+
+# Application: WSGI for sync/gthread, ASGI for uvicorn
+wsgi_app = 'core.asgi:application' if worker_mode == 'uvicorn' else 'core.wsgi:application'
+worker_class = WORKER_CLASSES[worker_mode]
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = env_int('GUNICORN_WORKERS', profile['workers'])
+threads = env_int('GUNICORN_THREADS', profile['threads'] if worker_mode == 'gthread' else 1)
+timeout = env_int('GUNICORN_TIMEOUT', profile['timeout'])
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+
+# Recycle workers to contain WeasyPrint memory growth; jitter avoids
+# restarting every worker at once
+max_requests = env_int('GUNICORN_MAX_REQUESTS', profile['max_requests'])
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+
+# Heartbeat files on tmpfs: a slow Docker overlay disk can stall workers
+worker_tmp_dir = os.environ.get('GUNICORN_WORKER_TMP_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else None)
+
+# Logs go to the container output, like the rest of the entrypoint
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+proc_name = f'scg_presales-{profile_name}'
@@ -1,3 +1,87 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from core.models import ThrottledSource
+from prospects.models import ProspectInquiry
+from surveys.featured import FeaturedSurveyCache
+from surveys.models import Survey
+
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'landing-tests'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LandingPageCacheTests(TestCase):
+    """Landing page and featured survey served from the cache."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        FeaturedSurveyCache.clear_local()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.survey = Survey.objects.create(title='Diagnóstico', version='1.0', is_featured=True)
+
+    def test_cached_page_does_no_queries(self):
+        self.client.get(reverse('landing:index'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('landing:index'))
+
+        self.assertContains(response, f'/survey/{self.survey.code}/')
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_conditional_get(self):
+        etag = self.client.get(reverse('landing:index'))['ETag']
+
+        response = self.client.get(reverse('landing:index'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_visitors_with_a_session_bypass_the_cache(self):
+        self.client.cookies['sessionid'] = 'abc'
+
+        response = self.client.get(reverse('landing:index'))
+
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotIn('ETag', response)
+
+    def test_saving_a_survey_invalidates_the_featured_survey(self):
+        self.client.get(reverse('landing:index'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Survey.objects.create(title='Diagnóstico', version='2.0', is_featured=True)
+
+        response = self.client.get(reverse('landing:index'))
+        self.assertContains(response, f'/survey/{other.code}/')
+
+    def test_csrf_token_endpoint(self):
+        response = self.client.get(reverse('landing:csrf'))
+
+        self.assertTrue(response.json()['token'])
+        self.assertIn('csrftoken', response.cookies)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMITS={'RULES': {'contact': {'ip': '2/h'}}})
+class ContactFormRateLimitTests(TestCase):
+    """Contact form requests over the per-IP budget get 429."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_ip_budget(self):
+        responses = [
+            self.client.post(
+                reverse('landing:contact'),
+                {'nombre': 'Ana', 'empresa': 'ACME', 'email': f'ana{i}@example.com', 'preocupacion': 'Ransomware'},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+            for i in range(3)
+        ]
+
+        self.assertEqual([response.status_code for response in responses], [200, 200, 429])
+        self.assertIn('Retry-After', responses[2])
+        self.assertEqual(ProspectInquiry.objects.count(), 2)
+        self.assertEqual(ThrottledSource.objects.get().scope, 'contact')
@@ -7,4 +7,5 @@ app_name = 'landing'
 urlpatterns = [
     path('', views.LandingPageView.as_view(), name='index'),
     path('contact/', views.ContactFormView.as_view(), name='contact'),
+    path('csrf/', views.CSRFTokenView.as_view(), name='csrf'),
 ]
\ No newline at end of file
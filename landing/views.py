@@ -1,26 +1,33 @@
 # landing/views.py
 from django.shortcuts import render, redirect
+from django.views import View
 from django.views.generic import TemplateView
 from django.http import JsonResponse
 from django.contrib import messages
 from django.db import transaction
 from django.core.exceptions import ValidationError
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
+from django.utils.decorators import method_decorator
+from core.page_cache import CachedPageMixin
+from core.ratelimit import check_limits, client_ip, rate_limited_response
 from prospects.models import Prospect, ProspectInquiry
+from surveys.featured import FeaturedSurveyCache, LANDING_PAGE_NAMESPACE
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class LandingPageView(TemplateView):
-    """Vista principal del landing page"""
+class LandingPageView(CachedPageMixin, TemplateView):
+    """Vista principal del landing page (cacheada para visitantes anónimos)"""
     template_name = 'landing/index.html'
+    page_cache_namespace = LANDING_PAGE_NAMESPACE
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Obtener el survey featured
-        from surveys.models import Survey
-        featured_survey = Survey.get_featured_survey()
+        # Obtener el survey featured (cacheado, ver surveys/featured.py)
+        featured_survey = FeaturedSurveyCache.get()
         
         if featured_survey:
             context['survey_code'] = featured_survey.code
@@ -29,12 +36,31 @@ class LandingPageView(TemplateView):
         return context
 
 
+@method_decorator(never_cache, name='dispatch')
+class CSRFTokenView(View):
+    """
+    Token CSRF para formularios de páginas cacheadas.
+
+    Las páginas servidas desde el page cache no incluyen el token; el
+    JavaScript lo pide aquí antes de enviar el formulario (también fija
+    la cookie csrftoken).
+    """
+    
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({'token': get_token(request)})
+
+
 class ContactFormView(TemplateView):
     """Vista para procesar el formulario de contacto"""
     template_name = 'landing/index.html'
     
     def post(self, request, *args, **kwargs):
         try:
+            # Límite por IP antes de cualquier trabajo (ver core/ratelimit.py)
+            retry_after = check_limits('contact', ip=client_ip(request))
+            if retry_after:
+                return self.rate_limited(request, retry_after, *args, **kwargs)
+            
             # Obtener datos del formulario
             nombre = request.POST.get('nombre', '').strip()
             empresa = request.POST.get('empresa', '').strip()
@@ -59,6 +85,10 @@ class ContactFormView(TemplateView):
                 messages.error(request, error_msg)
                 return self.get(request, *args, **kwargs)
             
+            retry_after = check_limits('contact', email=email)
+            if retry_after:
+                return self.rate_limited(request, retry_after, *args, **kwargs)
+            
             # Crear o actualizar prospect y inquiry en una transacción
             with transaction.atomic():
                 # Crear o obtener prospect
@@ -118,4 +148,14 @@ class ContactFormView(TemplateView):
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({'success': False, 'message': error_msg}, status=500)
             messages.error(request, error_msg)
-            return self.get(request, *args, **kwargs)
\ No newline at end of file
+            return self.get(request, *args, **kwargs)
+    
+    def rate_limited(self, request, retry_after, *args, **kwargs):
+        """Respuesta 429 con Retry-After, en JSON o como página con mensaje"""
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return rate_limited_response(retry_after)
+        messages.error(request, 'Demasiadas solicitudes. Por favor intente nuevamente más tarde.')
+        response = self.get(request, *args, **kwargs)
+        response.status_code = 429
+        response['Retry-After'] = str(retry_after)
+        return response
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProspectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'prospects'
+
+    def ready(self):
+        # Search indexes are PostgreSQL specific, so they are created after
+        # migrate instead of living in the generated migrations
+        from .search import backfill_search_documents, create_search_indexes
+        post_migrate.connect(create_search_indexes, sender=self)
+        post_migrate.connect(backfill_search_documents, sender=self)
@@ -2,9 +2,13 @@
 Prospects models for SCG Presales system.
 """
 from django.db import models
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.core.validators import EmailValidator, RegexValidator
 from django.utils import timezone
 
+from .search import build_search_document, search_filter, search_rank
+
 
 class ProspectStatus(models.TextChoices):
     """Status choices for prospects in the sales pipeline."""
@@ -34,6 +38,76 @@ class CompanySizeChoices(models.TextChoices):
     ENTERPRISE = '500+', 'Más de 500 empleados'
 
 
+class ProspectQuerySet(models.QuerySet):
+    """QuerySet for Prospect with indexed search."""
+    
+    def search(self, query, ranked=True):
+        """
+        Prospects matching a search on name, email or company.
+        
+        Matches word prefixes, substrings and (on PostgreSQL) near misses,
+        using the indexes on `search_document`. With `ranked`, results are
+        ordered by relevance on PostgreSQL.
+        """
+        condition = search_filter(query)
+        if condition is None:
+            return self
+        
+        queryset = self.filter(condition)
+        rank = search_rank(query) if ranked else None
+        if rank is not None:
+            queryset = queryset.annotate(search_rank=rank).order_by('-search_rank', '-created_at')
+        return queryset
+    
+    def with_activity(self):
+        """
+        Annotate the data the admin list shows for each prospect.
+        
+        Every value is a correlated subquery on an indexed foreign key, so a
+        page of prospects is loaded in one query instead of one per row:
+        
+        - latest_score_percentage / latest_risk_level: score of the most
+          recent ACTIVE submission
+        - inquiry_count, submission_count (ACTIVE submissions)
+        - last_activity_at: latest of contact, inquiry or submission
+        """
+        from scoring.models import ScoreResult
+        from surveys.models import SurveySubmission
+        
+        latest_score = ScoreResult.objects.filter(
+            submission__prospect=OuterRef('pk'),
+            submission__status='ACTIVE'
+        ).order_by('-submission__started_at', '-submission__id')
+        
+        active_submissions = SurveySubmission.objects.filter(
+            prospect=OuterRef('pk'),
+            status='ACTIVE'
+        ).order_by().values('prospect')
+        
+        inquiries = ProspectInquiry.objects.filter(
+            prospect=OuterRef('pk')
+        ).order_by().values('prospect')
+        
+        return self.annotate(
+            latest_score_percentage=Subquery(latest_score.values('score_percentage')[:1]),
+            latest_risk_level=Subquery(latest_score.values('risk_level')[:1]),
+            inquiry_count=Coalesce(
+                Subquery(inquiries.annotate(total=Count('id')).values('total'), output_field=IntegerField()),
+                Value(0)
+            ),
+            submission_count=Coalesce(
+                Subquery(active_submissions.annotate(total=Count('id')).values('total'), output_field=IntegerField()),
+                Value(0)
+            ),
+            # Coalesce to created_at: SQLite's MAX() returns NULL if any argument is NULL
+            last_activity_at=Greatest(
+                Coalesce('last_contact_at', 'created_at'),
+                Coalesce(Subquery(inquiries.annotate(last=Max('created_at')).values('last')), 'created_at'),
+                Coalesce(Subquery(active_submissions.annotate(last=Max('started_at')).values('last')), 'created_at'),
+            ),
+        )
+
+
 class Prospect(models.Model):
     """
     Main prospect model - represents a potential customer.
@@ -118,20 +192,47 @@ class Prospect(models.Model):
         help_text="Last time we contacted this prospect"
     )
     
+    # Search (see prospects/search.py)
+    search_document = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        help_text="Normalized name, email and company used by admin search"
+    )
+    
+    objects = ProspectQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Prospect'
         verbose_name_plural = 'Prospects'
+        indexes = [
+            # Keyset pagination of the admin list
+            models.Index(fields=['-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.email}) - {self.status}"
     
+    def save(self, *args, **kwargs):
+        # Mantener el documento de búsqueda en sync con los campos buscables
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.search_document = self.build_search_document()
+        elif {'name', 'email', 'company_name'} & set(update_fields):
+            self.search_document = self.build_search_document()
+            kwargs['update_fields'] = set(update_fields) | {'search_document'}
+        super().save(*args, **kwargs)
+    
+    def build_search_document(self):
+        """Search document built from the searchable fields."""
+        return build_search_document(self.name, self.email, self.company_name)
+    
     def get_latest_score(self):
         """Get the most recent survey score for this prospect."""
-        from surveys.models import SurveySubmission  # Updated import path
         latest_submission = self.survey_submissions.filter(
             status='ACTIVE'
-        ).order_by('-created_at').first()
+        ).order_by('-started_at').first()
         
         if latest_submission and hasattr(latest_submission, 'score_result'):
             return latest_submission.score_result
@@ -0,0 +1,213 @@
+"""
+prospects/search.py - Indexed prospect search
+
+Every prospect keeps a denormalized `search_document`: name, email and
+company, lowercased and without accents. On PostgreSQL the document has
+two GIN indexes, created after migrate (see `create_search_indexes`):
+
+- to_tsvector('simple', search_document) for ranked word-prefix matches
+- search_document gin_trgm_ops for substring (LIKE) and fuzzy word
+  (<%, word_similarity) matches
+
+`search_filter` builds a condition over those indexed expressions, so a
+search is an index scan instead of a sequential `UPPER(...) LIKE` over three
+columns. The trigram operators are only used when the pg_trgm extension is
+installed (creating it needs CREATE privilege on the database); otherwise
+searches use LIKE and the full text index. On SQLite (development) it falls
+back to a substring match on the same document.
+"""
+import logging
+import re
+import unicodedata
+
+from django.db import connection, connections
+from django.db.models import BooleanField, F, FloatField, Func, Q, Value
+
+logger = logging.getLogger(__name__)
+
+
+SEARCH_CONFIG = 'simple'
+
+SEARCH_INDEXES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS prospects_prospect_search_trgm "
+    "ON prospects_prospect USING gin (search_document gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS prospects_prospect_search_tsv "
+    f"ON prospects_prospect USING gin (to_tsvector('{SEARCH_CONFIG}', search_document))",
+]
+
+
+def normalize(text):
+    """Lowercase text and strip accents: 'José Peña' -> 'jose pena'."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.lower().split())
+
+
+def build_search_document(*values):
+    """Search document of a prospect from its searchable fields."""
+    return normalize(' '.join(value for value in values if value))
+
+
+class ToTsVector(Func):
+    """to_tsvector with the search config; matches the expression index."""
+    function = 'to_tsvector'
+    template = f"%(function)s('{SEARCH_CONFIG}', %(expressions)s)"
+
+
+class ToTsQuery(Func):
+    """to_tsquery with the search config."""
+    function = 'to_tsquery'
+    template = f"%(function)s('{SEARCH_CONFIG}', %(expressions)s)"
+
+
+class TsMatch(Func):
+    """vector @@ query"""
+    arg_joiner = ' @@ '
+    template = '(%(expressions)s)'
+    output_field = BooleanField()
+
+
+class TsRank(Func):
+    function = 'ts_rank'
+    output_field = FloatField()
+
+
+class TrigramWordMatch(Func):
+    """
+    query <% document: the query is similar to some words of the document
+    (not to the whole name + email + company), served by the trigram index.
+    """
+    arg_joiner = ' <%% '
+    template = '(%(expressions)s)'
+    output_field = BooleanField()
+
+
+class TrigramWordSimilarity(Func):
+    function = 'word_similarity'
+    output_field = FloatField()
+
+
+class Contains(Func):
+    """document LIKE '%query%' (case already normalized), served by the trigram index."""
+    arg_joiner = ' LIKE '
+    template = '(%(expressions)s)'
+    output_field = BooleanField()
+
+
+def _prefix_tsquery(terms):
+    """'jose pe' -> 'jose:* & pe:*', dropping tsquery operators from user input."""
+    tokens = [re.sub(r"[^\w@.\-]", '', term) for term in terms]
+    return ' & '.join(f"{token}:*" for token in tokens if token)
+
+
+def _is_postgresql(using=None):
+    return (connections[using] if using else connection).vendor == 'postgresql'
+
+
+# Alias -> whether pg_trgm is installed, checked once per process
+_trigram_available = {}
+
+
+def has_trigram(using=None):
+    """True if the pg_trgm extension is installed in the database."""
+    using = using or 'default'
+    if using not in _trigram_available:
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available[using] = cursor.fetchone() is not None
+        if not _trigram_available[using]:
+            logger.warning("pg_trgm no está instalado: la búsqueda de prospects no usa similitud")
+    return _trigram_available[using]
+
+
+def search_filter(query, prefix=''):
+    """
+    Condition matching prospects for a user search.
+
+    Args:
+        query: raw search text
+        prefix: lookup path to the prospect ('submission__prospect__' for scores)
+
+    Returns:
+        Q to pass to filter(), or None if the query is empty
+    """
+    terms = normalize(query).split()
+    if not terms:
+        return None
+
+    document = F(f'{prefix}search_document')
+    text = ' '.join(terms)
+
+    if not _is_postgresql():
+        condition = Q()
+        for term in terms:
+            condition &= Q(**{f'{prefix}search_document__contains': term})
+        return condition
+
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    condition = Q(Contains(document, Value(f'%{escaped}%')))
+    if has_trigram():
+        condition |= Q(TrigramWordMatch(Value(text), document))
+
+    tsquery = _prefix_tsquery(terms)
+    if tsquery:
+        condition |= Q(TsMatch(ToTsVector(document), ToTsQuery(Value(tsquery))))
+    return condition
+
+
+def search_rank(query, prefix=''):
+    """
+    Relevance expression for ordering search results (PostgreSQL only).
+
+    Returns:
+        expression, or None when ranking is not available
+    """
+    terms = normalize(query).split()
+    if not terms or not _is_postgresql():
+        return None
+
+    document = F(f'{prefix}search_document')
+    rank = TrigramWordSimilarity(Value(' '.join(terms)), document) if has_trigram() else None
+
+    tsquery = _prefix_tsquery(terms)
+    if tsquery:
+        ts_rank = TsRank(ToTsVector(document), ToTsQuery(Value(tsquery)))
+        rank = ts_rank if rank is None else rank + ts_rank
+    return rank
+
+
+def create_search_indexes(using='default', **kwargs):
+    """post_migrate handler: create the PostgreSQL search indexes if missing."""
+    if not _is_postgresql(using):
+        return
+
+    _trigram_available.pop(using, None)
+    with connections[using].cursor() as cursor:
+        for statement in SEARCH_INDEXES:
+            try:
+                cursor.execute(statement)
+            except Exception as e:
+                # pg_trgm needs CREATE privilege on the database; searches
+                # fall back to LIKE and full text (see has_trigram), so
+                # keep going with the full text index
+                logger.warning(f"No se pudo crear el índice de búsqueda: {str(e)}")
+
+
+def backfill_search_documents(using='default', batch_size=1000, **kwargs):
+    """post_migrate handler: fill the search document of prospects that lack one."""
+    from .models import Prospect
+
+    last_id = 0
+    while True:
+        prospects = list(
+            Prospect.objects.using(using).filter(search_document='', id__gt=last_id)
+            .only('id', 'name', 'email', 'company_name').order_by('id')[:batch_size]
+        )
+        if not prospects:
+            return
+
+        for prospect in prospects:
+            prospect.search_document = prospect.build_search_document()
+        Prospect.objects.using(using).bulk_update(prospects, ['search_document'])
+        last_id = prospects[-1].id
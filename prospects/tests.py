@@ -1,3 +1,66 @@
+from unittest import skipIf, skipUnless
+
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Prospect
+from .search import backfill_search_documents, has_trigram, search_filter
+
+
+class ProspectSearchTests(TestCase):
+    """Searches match name, email and company regardless of case and accents."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jose = Prospect.objects.create(name='José Peña', email='jpena@acme.com', company_name='Acme Ingeniería')
+        cls.maria = Prospect.objects.create(name='María Gómez', email='maria@globex.cl', company_name='Globex')
+        cls.pedro = Prospect.objects.create(name='Pedro Soto', email='psoto@initech.cl', company_name='')
+
+    def search(self, query):
+        return set(Prospect.objects.search(query).values_list('name', flat=True))
+
+    def test_accents_and_case_are_ignored(self):
+        self.assertEqual(self.search('JOSE PEÑA'), {'José Peña'})
+        self.assertEqual(self.search('ingenieria'), {'José Peña'})
+
+    def test_terms_match_any_field(self):
+        self.assertEqual(self.search('maria globex'), {'María Gómez'})
+        self.assertEqual(self.search('initech.cl'), {'Pedro Soto'})
+
+    def test_empty_query_keeps_every_prospect(self):
+        self.assertIsNone(search_filter('   '))
+        self.assertEqual(len(self.search('')), 3)
+
+    def test_document_follows_edits(self):
+        self.pedro.company_name = 'Umbrella'
+        self.pedro.save(update_fields=['company_name'])
+
+        self.assertEqual(self.search('umbrella'), {'Pedro Soto'})
+
+    def test_backfill_fills_missing_documents(self):
+        Prospect.objects.update(search_document='')
+
+        backfill_search_documents(batch_size=2)
+
+        self.assertEqual(self.search('gomez'), {'María Gómez'})
+        self.assertFalse(Prospect.objects.filter(search_document='').exists())
+
+    @skipIf(connection.vendor == 'postgresql', 'PostgreSQL uses the indexed search instead of the fallback')
+    def test_fallback_is_a_substring_match_per_term(self):
+        self.assertEqual(self.search('pen acm'), {'José Peña'})
+        self.assertEqual(self.search('pena globex'), set())
+        self.assertNotIn('search_rank', Prospect.objects.search('pena').query.annotations)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Ranked search needs PostgreSQL')
+    def test_ranked_search(self):
+        Prospect.objects.create(name='Ana Peñalosa', email='ana@example.com', company_name='Globex')
+
+        queryset = Prospect.objects.search('pena')
+        results = list(queryset.values_list('name', flat=True))
+
+        self.assertIn('search_rank', queryset.query.annotations)
+        self.assertEqual(set(results), {'José Peña', 'Ana Peñalosa'})
+        if has_trigram():
+            # The whole word ranks above a prefix, and near misses still match
+            self.assertEqual(results[0], 'José Peña')
+            self.assertIn('José Peña', self.search('penna'))
@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ReportArtifact
+
+
+@admin.register(ReportArtifact)
+class ReportArtifactAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'score_result', 'size', 'render_ms', 'score_version', 'created_at']
+    search_fields = ['filename', 'content_hash']
+    ordering = ['-created_at']
+    readonly_fields = [field.name for field in ReportArtifact._meta.fields]
+    raw_id_fields = ['score_result']
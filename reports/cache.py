@@ -0,0 +1,216 @@
+"""
+reports/cache.py - Content-addressed on-disk cache for rendered PDF reports
+
+The cache key is a hash of everything that goes into a render: the score
+fields, the prospect data, the template context, the template mtime and the
+version (mtime/size) of every static asset the template references. A repeat
+download of an unchanged report is a file read instead of a WeasyPrint render.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.template.loader import get_template
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_REPORT_CACHE_SETTINGS = {
+    'ENABLED': True,
+    'DIR': None,  # Defaults to MEDIA_ROOT/report_cache
+    'MAX_BYTES': 500 * 1024 * 1024,
+}
+
+# Bump to discard every cached report after a change in the render pipeline
+CACHE_FORMAT_VERSION = 1
+
+
+def get_cache_setting(name):
+    """Read a REPORT_CACHE setting with its default."""
+    return getattr(settings, 'REPORT_CACHE', {}).get(name, DEFAULT_REPORT_CACHE_SETTINGS[name])
+
+
+def file_version(path):
+    """Version marker (mtime, size) of a file, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ReportCache:
+    """
+    Disk cache of rendered reports.
+
+    Files are named `<score_result_id>-<content hash>.pdf` so all the entries
+    of a score result can be dropped when its score is recalculated. Reads
+    touch the file mtime, and eviction removes the least recently used files
+    once the directory grows past MAX_BYTES.
+    """
+
+    @staticmethod
+    def enabled():
+        """Whether the report cache is active."""
+        return get_cache_setting('ENABLED')
+
+    @staticmethod
+    def cache_dir():
+        """Directory where cached reports live."""
+        return str(get_cache_setting('DIR') or os.path.join(settings.MEDIA_ROOT, 'report_cache'))
+
+    @classmethod
+    def build_key(cls, score_result, context, template_names):
+        """
+        Hash every input of a render into a cache key.
+
+        Args:
+            score_result: ScoreResult being rendered
+            context: template context produced by the generator
+            template_names: templates used for the render
+        """
+        submission = score_result.submission
+        prospect = submission.prospect
+
+        # Static assets are referenced as file:// URLs; their version is mtime + size
+        assets = {}
+        content = {}
+        for name, value in context.items():
+            if name in ('score_result', 'prospect'):
+                continue
+            if isinstance(value, str) and value.startswith('file://'):
+                assets[name] = file_version(value[len('file://'):])
+            else:
+                content[name] = value
+
+        payload = {
+            'version': CACHE_FORMAT_VERSION,
+            'score': {
+                'total_points': score_result.total_points,
+                'score_percentage': str(score_result.score_percentage),
+                'risk_level': score_result.risk_level,
+                'primary_package': score_result.primary_package,
+                'secondary_package': score_result.secondary_package,
+                'section_scores': score_result.section_scores,
+            },
+            'prospect': {
+                'name': prospect.name,
+                'company_name': prospect.company_name,
+            },
+            'completed_at': submission.completed_at.isoformat() if submission.completed_at else None,
+            'templates': [
+                file_version(get_template(template_name).origin.name)
+                for template_name in template_names
+            ],
+            'assets': assets,
+            'content': content,
+        }
+
+        serialized = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get(cls, score_result_id, key):
+        """Return the cached PDF bytes, or None on a miss."""
+        path = cls.path(score_result_id, key)
+        try:
+            with open(path, 'rb') as pdf_file:
+                content = pdf_file.read()
+        except FileNotFoundError:
+            return None
+
+        cls.touch(path)
+        return content
+
+    @staticmethod
+    def touch(path):
+        """Mark an entry as recently used for LRU eviction."""
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    @classmethod
+    def set(cls, score_result_id, key, content):
+        """
+        Store rendered PDF bytes and evict old entries if over budget.
+
+        Returns:
+            path of the stored file, or None if it could not be written
+        """
+        directory = cls.cache_dir()
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temp file and rename so readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(content)
+            path = cls.path(score_result_id, key)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el reporte {score_result_id} en cache: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+
+        cls.evict()
+        return path
+
+    @classmethod
+    def invalidate(cls, score_result_ids):
+        """Remove every cached report of the given score results."""
+        directory = cls.cache_dir()
+        if not os.path.isdir(directory):
+            return 0
+
+        prefixes = tuple(f"{score_result_id}-" for score_result_id in score_result_ids)
+        if not prefixes:
+            return 0
+
+        removed = 0
+        for entry in os.scandir(directory):
+            if entry.name.startswith(prefixes) and entry.name.endswith('.pdf'):
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    @classmethod
+    def evict(cls):
+        """Remove least recently used reports until the cache fits MAX_BYTES."""
+        max_bytes = get_cache_setting('MAX_BYTES')
+        entries = []
+        total = 0
+
+        for entry in os.scandir(cls.cache_dir()):
+            if not entry.name.endswith('.pdf'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        if total <= max_bytes:
+            return
+
+        for mtime, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= max_bytes:
+                break
+
+    @classmethod
+    def path(cls, score_result_id, key):
+        """File path of a cache entry."""
+        return os.path.join(cls.cache_dir(), f"{score_result_id}-{key}.pdf")
@@ -0,0 +1,208 @@
+"""
+reports/export.py - Parallel rendering of PDF reports for bulk exports
+
+Renders reports for the inline ZIP download and builds the background
+export archives tracked by ReportExport.
+"""
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.zip_stream import stream_zip
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_REPORT_EXPORT_SETTINGS = {
+    'WORKERS': min(4, os.cpu_count() or 1),
+    'INLINE_MAX': 50,
+    'DIR': None,  # Defaults to MEDIA_ROOT/exports
+    'RETENTION_DAYS': 7,
+}
+
+
+def get_export_setting(name):
+    """Read a REPORT_EXPORT setting with its default."""
+    return getattr(settings, 'REPORT_EXPORT', {}).get(name, DEFAULT_REPORT_EXPORT_SETTINGS[name])
+
+
+def export_dir():
+    """Directory where background export archives are written."""
+    return str(get_export_setting('DIR') or os.path.join(settings.MEDIA_ROOT, 'exports'))
+
+
+def _init_worker():
+    """Set up Django and preload report resources in a freshly spawned render process."""
+    import django
+    django.setup()
+
+    from .resources import ReportResources
+    ReportResources.preload()
+
+
+def render_single_report(score_result_id):
+    """
+    Render one report. Loads its own data, so it also runs in a worker process.
+
+    Returns:
+        tuple: (score_result_id, filename, pdf); pdf is the path of the stored
+        report artifact, or the PDF bytes when there is no artifact. filename
+        and pdf are None when the render failed
+    """
+    from scoring.models import ScoreResult
+    from .pdf_generator import SecurityReportGenerator
+
+    try:
+        score_result = ScoreResult.objects.select_related(
+            'submission__prospect',
+            'submission__survey'
+        ).get(id=score_result_id)
+
+        generator = SecurityReportGenerator(score_result)
+        artifact, pdf_content = generator.get_or_render()
+        filename = generator.get_filename_info()['full_name']
+
+        # Only the path crosses the process boundary; the ZIP reads the file
+        if artifact is not None:
+            return score_result_id, filename, artifact.file_path
+        return score_result_id, filename, pdf_content
+
+    except Exception as e:
+        logger.error(f"Error generating PDF for ScoreResult {score_result_id} in bulk: {str(e)}")
+        return score_result_id, None, None
+
+
+def render_reports(score_result_ids, workers=None):
+    """
+    Render reports across a process pool, yielding results in input order.
+
+    At most two renders per worker are in flight at any time, so memory
+    stays bounded no matter how many reports are requested.
+
+    Yields:
+        tuple: (score_result_id, filename, pdf) as in render_single_report
+    """
+    workers = workers or get_export_setting('WORKERS')
+
+    if workers <= 1:
+        for score_result_id in score_result_ids:
+            yield render_single_report(score_result_id)
+        return
+
+    # spawn: safe from threaded workers and never shares DB connections
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+    pending = deque()
+
+    try:
+        for score_result_id in score_result_ids:
+            pending.append(pool.submit(render_single_report, score_result_id))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _file_chunks(pdf_file, chunk_size=64 * 1024):
+    """Read an open file in chunks, closing it at the end."""
+    with pdf_file:
+        while True:
+            chunk = pdf_file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _unique_name(filename, used_names):
+    """filename, or filename with a _2, _3... suffix if an earlier entry took it."""
+    base, extension = os.path.splitext(filename)
+    name, counter = filename, 1
+    while name in used_names:
+        counter += 1
+        name = f"{base}_{counter}{extension}"
+    used_names.add(name)
+    return name
+
+
+def report_zip_entries(results):
+    """
+    Turn render results into (filename, content) pairs for stream_zip, skipping failures.
+
+    Report filenames only carry the completion timestamp, so reports completed
+    in the same second get a numbered suffix instead of duplicate entries.
+    """
+    used_names = set()
+    for score_result_id, filename, pdf in results:
+        if pdf is None:
+            continue
+        filename = _unique_name(filename, used_names)
+        if isinstance(pdf, bytes):
+            yield filename, pdf
+            continue
+
+        try:
+            pdf_file = open(pdf, 'rb')
+        except OSError as e:
+            logger.error(f"Reporte {score_result_id} no disponible para exportarlo: {str(e)}")
+            continue
+        yield filename, _file_chunks(pdf_file)
+
+
+def build_export(export):
+    """
+    Render every report of a ReportExport into a ZIP file on disk, recording progress.
+
+    Reports that fail to render are counted and skipped, like the inline
+    export does.
+    """
+    from .models import ReportExport, ReportExportStatus
+
+    os.makedirs(export_dir(), exist_ok=True)
+    ReportExport.remove_expired()
+
+    export.file_path = os.path.join(export_dir(), f"export_{export.pk}.zip")
+    export.status = ReportExportStatus.RUNNING
+    export.total = len(export.score_result_ids)
+    export.processed = 0
+    export.failed = 0
+    export.save(update_fields=['file_path', 'status', 'total', 'processed', 'failed'])
+
+    def track_progress(results):
+        for result in results:
+            score_result_id, filename, pdf_content = result
+            export.processed += 1
+            if pdf_content is None:
+                export.failed += 1
+            ReportExport.objects.filter(pk=export.pk).update(
+                processed=export.processed, failed=export.failed
+            )
+            yield result
+
+    try:
+        with open(export.file_path, 'wb') as zip_file:
+            results = track_progress(render_reports(export.score_result_ids))
+            for chunk in stream_zip(report_zip_entries(results)):
+                zip_file.write(chunk)
+    except Exception as e:
+        export.status = ReportExportStatus.FAILED
+        export.error = str(e)
+        export.finished_at = timezone.now()
+        export.save(update_fields=['status', 'error', 'finished_at'])
+        raise
+
+    export.status = ReportExportStatus.DONE
+    export.finished_at = timezone.now()
+    export.save(update_fields=['status', 'finished_at'])
+
+    logger.info(f"Exportación masiva {export.pk} completada: {export.processed - export.failed}/{export.total} reportes")
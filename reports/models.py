@@ -1,3 +1,188 @@
+"""
+Reports models for SCG Presales system.
+"""
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from .cache import ReportCache
+from .export import get_export_setting
+
+
+class ReportExportStatus(models.TextChoices):
+    """Lifecycle of a bulk report export."""
+    PENDING = 'PENDING', 'Pendiente'
+    RUNNING = 'RUNNING', 'En proceso'
+    DONE = 'DONE', 'Completada'
+    FAILED = 'FAILED', 'Fallida'
+
+
+class ReportExport(models.Model):
+    """
+    Bulk export of PDF reports built in the background.
+
+    Batches too large to stream inside a request are written to a ZIP file
+    by a worker (see build_export in reports/export.py); progress is tracked
+    here so the admin can poll it and download the archive when it is ready.
+    """
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_exports'
+    )
+    score_result_ids = models.JSONField(
+        default=list,
+        help_text="ScoreResults included in the export"
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=ReportExportStatus.choices,
+        default=ReportExportStatus.PENDING
+    )
+
+    # Progress
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    file_path = models.CharField(max_length=500, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Report Export'
+        verbose_name_plural = 'Report Exports'
+
+    def __str__(self):
+        return f"Export #{self.pk} ({self.status}, {self.processed}/{self.total})"
+
+    @property
+    def progress_percentage(self):
+        """Percentage of reports processed."""
+        if not self.total:
+            return 0
+        return round((self.processed / self.total) * 100, 1)
+
+    @property
+    def filename(self):
+        """Download name of the archive."""
+        return f"Reportes_Ciberseguridad_{self.created_at.strftime('%Y%m%d_%H%M%S')}.zip"
+
+    @classmethod
+    def remove_expired(cls):
+        """Delete archives older than the retention window."""
+        cutoff = timezone.now() - timedelta(days=get_export_setting('RETENTION_DAYS'))
+        for export in cls.objects.filter(finished_at__lt=cutoff).exclude(file_path=''):
+            if os.path.exists(export.file_path):
+                os.remove(export.file_path)
+            export.file_path = ''
+            export.save(update_fields=['file_path'])
+
+
+class ReportArtifact(models.Model):
+    """
+    A rendered PDF report stored on disk (in the report cache directory).
+
+    The first render of a report, whichever path triggers it (email, preview,
+    download or bulk export), persists the file and this row; every later
+    request for the same score and inputs serves the file as is. Rows are
+    removed with the cached files when the score is recalculated; a row
+    whose file was evicted is dropped on lookup and the report re-rendered.
+    """
+    score_result = models.ForeignKey(
+        'scoring.ScoreResult',
+        on_delete=models.CASCADE,
+        related_name='report_artifacts'
+    )
+    render_key = models.CharField(
+        max_length=64,
+        help_text="Hash of the render inputs (see ReportCache.build_key)"
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        help_text="SHA-256 of the PDF file"
+    )
+    file_path = models.CharField(max_length=500)
+    filename = models.CharField(max_length=255, help_text="Download name")
+    size = models.PositiveIntegerField(help_text="File size in bytes")
+    render_ms = models.PositiveIntegerField(help_text="Render duration in milliseconds")
+    score_version = models.DateTimeField(
+        help_text="recalculated_at of the score the report was rendered from"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Report Artifact'
+        verbose_name_plural = 'Report Artifacts'
+        unique_together = [['score_result', 'render_key']]
+
+    def __str__(self):
+        return f"{self.filename} ({self.size} bytes)"
+
+    @classmethod
+    def lookup(cls, score_result_id, render_key):
+        """Stored artifact for these render inputs, or None."""
+        artifact = cls.objects.filter(score_result_id=score_result_id, render_key=render_key).first()
+        if artifact is None:
+            return None
+
+        if not os.path.exists(artifact.file_path):
+            # Evicted from the report cache
+            artifact.delete()
+            return None
+
+        ReportCache.touch(artifact.file_path)
+        return artifact
+
+    @classmethod
+    def store(cls, score_result, render_key, content, filename, render_ms):
+        """
+        Write a rendered report to disk and record it.
+
+        Returns:
+            ReportArtifact, or None if the file could not be written
+        """
+        file_path = ReportCache.set(score_result.id, render_key, content)
+        if file_path is None:
+            return None
+
+        artifact, created = cls.objects.update_or_create(
+            score_result=score_result,
+            render_key=render_key,
+            defaults={
+                'content_hash': hashlib.sha256(content).hexdigest(),
+                'file_path': file_path,
+                'filename': filename,
+                'size': len(content),
+                'render_ms': render_ms,
+                'score_version': score_result.recalculated_at,
+            }
+        )
+        return artifact
+
+    @classmethod
+    def invalidate(cls, score_result_ids):
+        """Drop the artifacts and cached files of the given score results."""
+        score_result_ids = list(score_result_ids)
+        cls.objects.filter(score_result_id__in=score_result_ids).delete()
+        return ReportCache.invalidate(score_result_ids)
+
+    def open(self):
+        """Open the PDF file for reading (for FileResponse)."""
+        return open(self.file_path, 'rb')
 
-# Create your models here.
+    def read(self):
+        """PDF bytes."""
+        with self.open() as pdf_file:
+            return pdf_file.read()
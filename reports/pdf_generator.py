@@ -3,59 +3,125 @@ reports/pdf_generator.py - WeasyPrint PDF Generator
 Uses WeasyPrint for full CSS support and better HTML rendering
 """
 import os
+import time
 from io import BytesIO
 from django.template.loader import render_to_string
-from django.contrib.staticfiles import finders
 from django.conf import settings
 import weasyprint
 
+from .cache import ReportCache
+from .resources import ReportResources, REPORT_TEMPLATE, STYLESHEET_TEMPLATE
+
 
 class SecurityReportGenerator:
     """Generador de reportes usando WeasyPrint con soporte completo de CSS"""
     
+    template_name = REPORT_TEMPLATE
+    
     def __init__(self, score_result):
         self.score_result = score_result
         self.submission = score_result.submission
         self.prospect = self.submission.prospect
         self.survey = self.submission.survey
         
-    def generate_report(self):
+    def generate_report(self, use_cache=True):
         """
         Genera reporte PDF usando WeasyPrint
         
+        Si el reporte ya fue renderizado con exactamente los mismos datos se
+        devuelve el artefacto guardado en disco (ver ReportArtifact).
+        
         Returns:
             BytesIO buffer con PDF generado
         """
+        if not use_cache:
+            return self._generate_pdf_with_weasyprint(self._prepare_context())
+        
+        artifact, pdf_content = self.get_or_render()
+        if pdf_content is None:
+            pdf_content = artifact.read()
+        return BytesIO(pdf_content)
+    
+    def get_or_render(self):
+        """
+        Artefacto del reporte; se renderiza y se guarda la primera vez
+        
+        Returns:
+            tuple: (ReportArtifact o None, bytes del PDF o None). Los bytes
+            solo vienen cuando se renderizó ahora; el artefacto es None si el
+            cache está deshabilitado o no se pudo escribir el archivo
+        """
+        from .models import ReportArtifact
+        
         # Preparar contexto para template
         context = self._prepare_context()
         
-        # Renderizar template HTML completo
-        html_content = render_to_string('reports/security_assessment.html', context)
+        if not ReportCache.enabled():
+            return None, self._generate_pdf_with_weasyprint(context).getvalue()
+        
+        render_key = ReportCache.build_key(
+            self.score_result, context, [self.template_name, STYLESHEET_TEMPLATE]
+        )
+        artifact = ReportArtifact.lookup(self.score_result.id, render_key)
+        if artifact is not None:
+            return artifact, None
         
         # Generar PDF con WeasyPrint
-        return self._generate_pdf_with_weasyprint(html_content)
+        started = time.monotonic()
+        pdf_content = self._generate_pdf_with_weasyprint(context).getvalue()
+        render_ms = int((time.monotonic() - started) * 1000)
+        
+        artifact = ReportArtifact.store(
+            self.score_result, render_key, pdf_content,
+            filename=self.get_filename_info()['full_name'],
+            render_ms=render_ms
+        )
+        return artifact, pdf_content
     
-    def _generate_pdf_with_weasyprint(self, html_content):
-        """Genera PDF usando WeasyPrint"""
+    def _generate_pdf_with_weasyprint(self, context):
+        """
+        Genera PDF usando WeasyPrint
+        
+        Solo la portada cambia por prospecto (fecha de la evaluación); el resto
+        del reporte depende únicamente del nivel de riesgo. El layout del cuerpo
+        se calcula una vez por nivel y se reutiliza, y por prospecto solo se
+        diagrama la portada antes de unir las páginas en un único PDF.
+        """
         # Create PDF buffer
         pdf_buffer = BytesIO()
         
-        # Configure WeasyPrint with base URL for static files
-        base_url = self._get_base_url()
-        
-        # Enhanced WeasyPrint configuration for production
-        html_doc = weasyprint.HTML(
-            string=html_content,
-            base_url=base_url
+        cover = self._render_document(context, 'cover')
+        body = ReportResources.body_document(
+            self.score_result.risk_level,
+            lambda: self._render_document(context, 'body')
         )
         
-        # Generate PDF without additional CSS - use only template CSS
-        pdf_doc = html_doc.write_pdf()
-        pdf_buffer.write(pdf_doc)
+        # Metadata (title) comes from the cover document
+        cover.copy(cover.pages + body.pages).write_pdf(pdf_buffer)
         pdf_buffer.seek(0)
         
         return pdf_buffer
     
+    def _render_document(self, context, report_part):
+        """Renderiza y diagrama una parte del reporte ('cover' o 'body')"""
+        html_content = render_to_string(
+            self.template_name, {**context, 'report_part': report_part}
+        )
+        
+        # Static assets are served from memory by the shared resource layer
+        html_doc = weasyprint.HTML(
+            string=html_content,
+            base_url=self._get_base_url(),
+            url_fetcher=ReportResources.url_fetcher
+        )
+        
+        # Stylesheet, fonts and decoded images are reused across renders
+        return html_doc.render(
+            stylesheets=[ReportResources.stylesheet()],
+            font_config=ReportResources.font_config(),
+            cache=ReportResources.image_cache()
+        )
+    
     def _get_base_url(self):
         """Get base URL for static files"""
         if settings.DEBUG:
@@ -88,28 +154,6 @@ class SecurityReportGenerator:
         fecha_actual = self._format_date()
         risk_level_display = self._get_risk_level_display()
         
-        # Get absolute file paths for images
-        cover_image_url = self._get_absolute_static_url('img/reports/cover.png')
-        logo_image_url = self._get_absolute_static_url('img/reports/ImagotipoNegativo.png')
-        sidebar_image_1 = self._get_absolute_static_url('img/reports/sidebart_1.png')
-        sidebar_image_5 = self._get_absolute_static_url('img/reports/sidebart_5.png')
-        sidebar_image_8 = self._get_absolute_static_url('img/reports/sidebart_8.png')
-        sidebar_image_10 = self._get_absolute_static_url('img/reports/sidebart_10.png')
-        sidebar_image_11 = self._get_absolute_static_url('img/reports/sidebart_11.png')
-        sidebar_image_12 = self._get_absolute_static_url('img/reports/sidebart_12.png')
-        section_globe_image_url = self._get_absolute_static_url('img/reports/section_globe.png')
-        section_risk_image_url = self._get_absolute_static_url('img/reports/section_risk.png')
-        section_solution_image_url = self._get_absolute_static_url('img/reports/section_solution.png')
-        final_cover_image_url = self._get_absolute_static_url('img/reports/final_cover.png')
-        
-        # Get absolute file paths for fonts
-        geomanist_regular = self._get_absolute_static_url('fonts/Geomanist-Regular.otf')
-        geomanist_bold = self._get_absolute_static_url('fonts/Geomanist-Bold.otf')
-        geomanist_light = self._get_absolute_static_url('fonts/Geomanist-Light.otf')
-        geomanist_medium = self._get_absolute_static_url('fonts/Geomanist-Medium.otf')
-        
-
-        
         return {
             # Datos del score
             'score_result': self.score_result,
@@ -119,25 +163,8 @@ class SecurityReportGenerator:
             'risk_level_display': risk_level_display,
             'risk_level_color': self._get_risk_level_color(),
             
-            # Absolute image URLs for WeasyPrint
-            'cover_image_url': cover_image_url,
-            'logo_image_url': logo_image_url,
-            'sidebar_image_1': sidebar_image_1,
-            'sidebar_image_5': sidebar_image_5,
-            'sidebar_image_8': sidebar_image_8,
-            'sidebar_image_10': sidebar_image_10,
-            'sidebar_image_11': sidebar_image_11,
-            'sidebar_image_12': sidebar_image_12,
-            'section_globe_image_url': section_globe_image_url,
-            'section_risk_image_url': section_risk_image_url,
-            'section_solution_image_url': section_solution_image_url,
-            'final_cover_image_url': final_cover_image_url,
-            
-            # Font URLs
-            'geomanist_regular': geomanist_regular,
-            'geomanist_bold': geomanist_bold,
-            'geomanist_light': geomanist_light,
-            'geomanist_medium': geomanist_medium,
+            # Absolute image and font URLs for WeasyPrint, resolved once per process
+            **ReportResources.static_urls(),
             
             # Contenido dinámico
             'risk_content': content_data.get_risk_level_content(self.score_result.risk_level),
@@ -148,24 +175,6 @@ class SecurityReportGenerator:
             'references': content_data.get_references(),
         }
     
-    def _get_absolute_static_url(self, path):
-        """Get absolute file URL for a static file"""
-        # Find the file using Django's static file finder
-        file_path = finders.find(path)
-        if file_path:
-            # Convert to absolute file URL
-            return f"file://{os.path.abspath(file_path)}"
-        
-        # Fallback: try to construct path manually
-        static_dirs = getattr(settings, 'STATICFILES_DIRS', [])
-        for static_dir in static_dirs:
-            full_path = os.path.join(static_dir, path)
-            if os.path.exists(full_path):
-                return f"file://{os.path.abspath(full_path)}"
-        
-        # Final fallback
-        return None
-    
     def get_filename_info(self):
         """Info para nombre de archivo"""
         prospect_name = self.prospect.name.replace(' ', '_')
@@ -0,0 +1,211 @@
+"""
+reports/resources.py - Process-wide cache of the static resources used by PDF reports
+
+Report images and fonts are resolved and read once per process and served to
+WeasyPrint from memory through a custom url_fetcher. The report stylesheet is
+parsed once against a shared FontConfiguration, and decoded images live in a
+shared WeasyPrint image cache, so a render only lays out the HTML. The laid
+out body of the report (everything but the cover) is kept per risk level and
+per thread, since its pages are merged into every cover.
+
+Renders never wait on each other: the lock only guards swapping the cached
+values, and files are checked for changes at most every CHECK_INTERVAL seconds.
+"""
+import mimetypes
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loader import get_template, render_to_string
+import weasyprint
+from weasyprint.text.fonts import FontConfiguration
+
+from .cache import file_version
+
+
+REPORT_TEMPLATE = 'reports/security_assessment.html'
+STYLESHEET_TEMPLATE = 'reports/security_assessment.css'
+
+# Template context name -> static path
+REPORT_IMAGES = {
+    'cover_image_url': 'img/reports/cover.png',
+    'logo_image_url': 'img/reports/ImagotipoNegativo.png',
+    'sidebar_image_1': 'img/reports/sidebart_1.png',
+    'sidebar_image_5': 'img/reports/sidebart_5.png',
+    'sidebar_image_8': 'img/reports/sidebart_8.png',
+    'sidebar_image_10': 'img/reports/sidebart_10.png',
+    'sidebar_image_11': 'img/reports/sidebart_11.png',
+    'sidebar_image_12': 'img/reports/sidebart_12.png',
+    'section_globe_image_url': 'img/reports/section_globe.png',
+    'section_risk_image_url': 'img/reports/section_risk.png',
+    'section_solution_image_url': 'img/reports/section_solution.png',
+    'final_cover_image_url': 'img/reports/final_cover.png',
+}
+
+REPORT_FONTS = {
+    'geomanist_regular': 'fonts/Geomanist-Regular.otf',
+    'geomanist_bold': 'fonts/Geomanist-Bold.otf',
+    'geomanist_light': 'fonts/Geomanist-Light.otf',
+    'geomanist_medium': 'fonts/Geomanist-Medium.otf',
+}
+
+
+def resolve_static_url(path):
+    """Get absolute file URL for a static file"""
+    # Find the file using Django's static file finder
+    file_path = finders.find(path)
+    if file_path:
+        return f"file://{os.path.abspath(file_path)}"
+
+    # Fallback: try to construct path manually
+    for static_dir in getattr(settings, 'STATICFILES_DIRS', []):
+        full_path = os.path.join(static_dir, path)
+        if os.path.exists(full_path):
+            return f"file://{os.path.abspath(full_path)}"
+
+    return None
+
+
+class ReportResources:
+    """
+    Shared render resources for SecurityReportGenerator.
+
+    Everything is keyed on the version (mtime/size) of the asset files and
+    the report templates: editing any of them drops the in-memory copies
+    on the first render after the next check instead of serving stale bytes.
+    """
+
+    # Seconds between checks of the asset and template files
+    CHECK_INTERVAL = 5
+
+    _lock = threading.Lock()
+    _static_urls = None
+    _version = None
+    _checked_at = None
+    _assets = {}
+    _font_config = None
+    _stylesheet = None
+    _image_cache = {}
+    _body_documents = threading.local()
+
+    @classmethod
+    def static_urls(cls):
+        """Template context name -> file:// URL of every report image and font."""
+        if cls._static_urls is None:
+            cls._static_urls = {
+                name: resolve_static_url(path)
+                for name, path in {**REPORT_IMAGES, **REPORT_FONTS}.items()
+            }
+        return cls._static_urls
+
+    @classmethod
+    def preload(cls):
+        """Resolve, read and parse every resource. Called when a render process starts."""
+        cls._refresh(force=True)
+        for url in cls.static_urls().values():
+            if url:
+                cls._load_asset(url)
+        cls.stylesheet()
+
+    @classmethod
+    def url_fetcher(cls, url, *args, **kwargs):
+        """WeasyPrint url_fetcher that serves report assets from memory."""
+        if url in cls._assets or url in cls.static_urls().values():
+            return dict(cls._load_asset(url))
+        return weasyprint.default_url_fetcher(url, *args, **kwargs)
+
+    @classmethod
+    def font_config(cls):
+        """FontConfiguration shared by every render; fonts are registered once."""
+        cls._refresh()
+        return cls._font_config
+
+    @classmethod
+    def image_cache(cls):
+        """WeasyPrint image cache shared by every render; images are decoded once."""
+        cls._refresh()
+        return cls._image_cache
+
+    @classmethod
+    def stylesheet(cls):
+        """Report stylesheet, rendered and parsed once."""
+        cls._refresh()
+        stylesheet = cls._stylesheet
+        if stylesheet is None:
+            font_config = cls._font_config
+            css = render_to_string(STYLESHEET_TEMPLATE, cls.static_urls())
+            stylesheet = weasyprint.CSS(
+                string=css,
+                url_fetcher=cls.url_fetcher,
+                font_config=font_config,
+            )
+            # Not kept if the resources were dropped during the parse
+            if cls._font_config is font_config:
+                cls._stylesheet = stylesheet
+        return stylesheet
+
+    @classmethod
+    def body_document(cls, risk_level, render):
+        """
+        Laid out static pages of the report for a risk level.
+
+        WeasyPrint documents are not safe to share between threads, so each
+        thread lays out and keeps its own copy.
+
+        Args:
+            risk_level: risk level the pages depend on
+            render: callable returning the weasyprint Document on a miss
+        """
+        cls._refresh()
+        local = cls._body_documents
+        documents = getattr(local, 'documents', None)
+        if documents is None:
+            documents = local.documents = {}
+
+        document = documents.get(risk_level)
+        if document is None:
+            document = documents[risk_level] = render()
+        return document
+
+    @classmethod
+    def _load_asset(cls, url):
+        """Read an asset into memory in the shape WeasyPrint fetchers return."""
+        assets = cls._assets
+        asset = assets.get(url)
+        if asset is None:
+            path = url[len('file://'):]
+            with open(path, 'rb') as asset_file:
+                asset = {
+                    'string': asset_file.read(),
+                    'mime_type': mimetypes.guess_type(path)[0],
+                    'redirected_url': url,
+                }
+            assets[url] = asset
+        return asset
+
+    @classmethod
+    def _refresh(cls, force=False):
+        """Drop every cached resource if an asset or a template changed on disk."""
+        now = time.monotonic()
+        checked_at = cls._checked_at
+        if not force and cls._version is not None and now - checked_at < cls.CHECK_INTERVAL:
+            return
+        cls._checked_at = now
+
+        paths = [url[len('file://'):] for url in cls.static_urls().values() if url]
+        paths.extend(get_template(name).origin.name for name in (REPORT_TEMPLATE, STYLESHEET_TEMPLATE))
+        version = tuple(file_version(path) for path in paths)
+
+        if version == cls._version:
+            return
+
+        with cls._lock:
+            if version != cls._version:
+                cls._assets = {}
+                cls._image_cache = {}
+                cls._stylesheet = None
+                cls._body_documents = threading.local()
+                cls._font_config = FontConfiguration()
+                cls._version = version
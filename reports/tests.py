@@ -1,3 +1,317 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+import weasyprint
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import User
+from prospects.models import Prospect
+from scoring.models import ScoreResult
+from surveys.models import Survey, SurveySection, Question, QuestionOption, SurveySubmission, Response
+
+from .cache import ReportCache
+from .export import build_export, export_dir, report_zip_entries
+from .models import ReportArtifact, ReportExport, ReportExportStatus
+from .pdf_generator import SecurityReportGenerator
+from .resources import ReportResources
+
+
+class ReportTestCase(TestCase):
+    """Score results to render, with the report cache and exports in a temporary directory."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            email='admin@example.com', password='test-password', first_name='Admin', last_name='SCG'
+        )
+        cls.survey = Survey.objects.create(title='Diagnóstico', version='1.0', max_score=10)
+        section = SurveySection.objects.create(survey=cls.survey, title='Gobierno', order=1, max_points=10)
+        cls.question = Question.objects.create(
+            survey=cls.survey, section=section, question_text='¿Tiene un plan de respuesta?',
+            question_type='SINGLE_CHOICE', order=1, max_points=10,
+        )
+        cls.option = QuestionOption.objects.create(question=cls.question, option_text='Sí', order=1, points=10)
+
+    def setUp(self):
+        self.media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_dir, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_dir,
+            REPORT_CACHE={'DIR': f'{self.media_dir}/report_cache'},
+            REPORT_EXPORT={'DIR': f'{self.media_dir}/exports'},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_score_result(self, name='Ana Mora', company='ACME'):
+        prospect = Prospect.objects.create(
+            email=f'{name.split()[0].lower()}@example.com', name=name, company_name=company
+        )
+        submission = SurveySubmission.objects.create(
+            prospect=prospect, survey=self.survey, completed_at=timezone.now()
+        )
+        Response.objects.create(
+            submission=submission, question=self.question, selected_option=self.option, points_earned=10
+        )
+        return ScoreResult.calculate_for_submission(submission)
+
+
+class BulkReportsGenerateViewTests(ReportTestCase):
+    """Small bulk exports are rendered in the request and streamed as a ZIP."""
+
+    def get_zip(self, score_results):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('reports:bulk_generate_reports'),
+            {'score_ids': ','.join(str(score_result.id) for score_result in score_results)},
+        )
+        return response, zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_zip_holds_every_report(self):
+        score_results = [self.create_score_result('Ana Mora'), self.create_score_result('Luis Vega')]
+
+        response, archive = self.get_zip(score_results)
+
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertEqual(len(set(archive.namelist())), 2)
+        self.assertTrue(all(archive.read(name).startswith(b'%PDF') for name in archive.namelist()))
+
+    def test_failed_render_is_skipped(self):
+        score_results = [self.create_score_result('Ana Mora'), self.create_score_result('Luis Vega')]
+        render = SecurityReportGenerator._generate_pdf_with_weasyprint
+
+        def fail_for_luis(generator, context):
+            if generator.prospect.name == 'Luis Vega':
+                raise RuntimeError('WeasyPrint')
+            return render(generator, context)
+
+        with mock.patch.object(SecurityReportGenerator, '_generate_pdf_with_weasyprint', fail_for_luis), \
+                self.assertLogs('reports.export', 'ERROR'):
+            response, archive = self.get_zip(score_results)
+
+        self.assertEqual(len(archive.namelist()), 1)
+
+    def test_large_batch_is_queued_with_a_progress_page(self):
+        score_results = [self.create_score_result('Ana Mora'), self.create_score_result('Luis Vega')]
+        self.client.force_login(self.user)
+
+        with self.settings(REPORT_EXPORT={'INLINE_MAX': 1, 'DIR': f'{self.media_dir}/exports'}):
+            response = self.client.get(
+                reverse('reports:bulk_generate_reports'),
+                {'score_ids': ','.join(str(score_result.id) for score_result in score_results)},
+                follow=True,
+            )
+
+        export = ReportExport.objects.get()
+        self.assertEqual(export.score_result_ids, [score_result.id for score_result in score_results])
+        self.assertRedirects(response, reverse('reports:bulk_export_detail', args=[export.id]))
+        self.assertContains(response, reverse('reports:bulk_export_status', args=[export.id]))
+
+
+class BuildExportTests(ReportTestCase):
+    """Background exports write every report to a ZIP file and count failures."""
+
+    def test_build(self):
+        score_results = [self.create_score_result('Ana Mora'), self.create_score_result('Luis Vega')]
+        export = ReportExport.objects.create(
+            requested_by=self.user, score_result_ids=[score_result.id for score_result in score_results] + [0]
+        )
+
+        # Rendered in this process: workers could not see the test database
+        with self.settings(REPORT_EXPORT={'WORKERS': 1, 'DIR': f'{self.media_dir}/exports'}), \
+                self.assertLogs('reports.export', 'ERROR'):
+            build_export(export)
+
+        export.refresh_from_db()
+        self.assertEqual(export.status, ReportExportStatus.DONE)
+        self.assertEqual((export.total, export.processed, export.failed), (3, 3, 1))
+        self.assertTrue(export.file_path.startswith(export_dir()))
+        with zipfile.ZipFile(export.file_path) as archive:
+            self.assertEqual(len(set(archive.namelist())), 2)
+
+    def test_entry_names_are_unique(self):
+        entries = report_zip_entries([
+            (1, 'SCG_Reporte.pdf', b'%PDF-1'),
+            (2, 'SCG_Reporte.pdf', b'%PDF-2'),
+            (3, 'SCG_Reporte.pdf', None),
+            (4, 'SCG_Reporte.pdf', b'%PDF-4'),
+        ])
+
+        self.assertEqual(
+            list(entries),
+            [('SCG_Reporte.pdf', b'%PDF-1'), ('SCG_Reporte_2.pdf', b'%PDF-2'), ('SCG_Reporte_3.pdf', b'%PDF-4')],
+        )
+
+
+class ReportArtifactTests(ReportTestCase):
+    """Stored reports are served until their score changes or goes away."""
+
+    def setUp(self):
+        super().setUp()
+        self.score_result = self.create_score_result()
+        self.artifact, pdf_content = SecurityReportGenerator(self.score_result).get_or_render()
+        self.assertTrue(pdf_content.startswith(b'%PDF'))
+
+    def lookup(self):
+        return ReportArtifact.lookup(self.score_result.id, self.artifact.render_key)
+
+    def test_repeat_render_serves_the_artifact(self):
+        artifact, pdf_content = SecurityReportGenerator(self.score_result).get_or_render()
+
+        self.assertEqual(artifact, self.artifact)
+        self.assertIsNone(pdf_content)
+        self.assertEqual(self.lookup(), self.artifact)
+
+    def test_score_change_drops_the_artifact(self):
+        self.score_result.score_percentage = 35
+        self.score_result.save()
+
+        self.assertIsNone(self.lookup())
+        self.assertFalse(os.path.exists(self.artifact.file_path))
+
+    def test_score_deletion_drops_the_file(self):
+        self.score_result.delete()
+
+        self.assertFalse(ReportArtifact.objects.exists())
+        self.assertFalse(os.path.exists(self.artifact.file_path))
+
+    def test_evicted_file_is_rendered_again(self):
+        os.remove(self.artifact.file_path)
+
+        self.assertIsNone(self.lookup())
+        self.assertFalse(ReportArtifact.objects.exists())
+
+
+class BulkExportAccessTests(ReportTestCase):
+    """Background exports are only visible to whoever requested them."""
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(
+            email='ventas@example.com', password='test-password', first_name='Ventas', last_name='SCG', is_staff=True
+        )
+        self.export = ReportExport.objects.create(
+            requested_by=self.owner, status=ReportExportStatus.DONE, total=1, processed=1,
+            file_path=f'{self.media_dir}/export.zip',
+        )
+        with open(self.export.file_path, 'wb') as export_file:
+            export_file.write(b'PK')
+
+    def get(self, user, name):
+        self.client.force_login(user)
+        return self.client.get(reverse(name, args=[self.export.id]))
+
+    def test_other_users_get_404(self):
+        other = User.objects.create_user(
+            email='otro@example.com', password='test-password', first_name='Otro', last_name='SCG', is_staff=True
+        )
+
+        self.assertEqual(self.get(other, 'reports:bulk_export_status').status_code, 404)
+        self.assertEqual(self.get(other, 'reports:bulk_export_download').status_code, 404)
+
+    def test_owner_and_superusers_can_download(self):
+        self.assertEqual(self.get(self.owner, 'reports:bulk_export_download').status_code, 200)
+        self.assertEqual(self.get(self.user, 'reports:bulk_export_status').json()['status'], 'DONE')
+
+
+
+class ReportDirectoryTests(TestCase):
+    """Report files default to the MEDIA_ROOT in effect, not the one of base.py."""
+
+    @override_settings(MEDIA_ROOT='/srv/media', REPORT_CACHE={}, REPORT_EXPORT={})
+    def test_directories_follow_media_root(self):
+        self.assertEqual(ReportCache.cache_dir(), '/srv/media/report_cache')
+        self.assertEqual(export_dir(), '/srv/media/exports')
+
+
+class ReportResourcesTests(SimpleTestCase):
+    """Shared render resources are refreshed from disk without serializing renders."""
+
+    def setUp(self):
+        ReportResources._refresh(force=True)
+        self.addCleanup(ReportResources._refresh, force=True)
+
+    def test_files_are_checked_once_per_interval(self):
+        with mock.patch('reports.resources.file_version', return_value=(1, 1)) as file_version:
+            ReportResources._refresh(force=True)
+            checks = file_version.call_count
+            body = ReportResources.body_document('HIGH', object)
+            ReportResources.font_config()
+            ReportResources.stylesheet()
+
+            self.assertEqual(file_version.call_count, checks)
+            self.assertIs(ReportResources.body_document('HIGH', object), body)
+
+            file_version.return_value = (2, 1)
+            ReportResources._checked_at -= ReportResources.CHECK_INTERVAL
+            ReportResources.font_config()
+
+            self.assertEqual(file_version.call_count, 2 * checks)
+            self.assertIsNot(ReportResources.body_document('HIGH', object), body)
+
+    def test_renders_do_not_wait_for_a_body_layout(self):
+        def render():
+            # Another render fetching assets while this one lays out the body
+            other = threading.Thread(target=lambda: [
+                ReportResources.url_fetcher(url) for url in ReportResources.static_urls().values() if url
+            ] + [ReportResources.stylesheet()])
+            other.start()
+            other.join(timeout=10)
+            self.assertFalse(other.is_alive())
+            return object()
+
+        ReportResources.body_document('CRITICAL', render)
+
+
+class ReportLayoutTests(ReportTestCase):
+    """Each report gets its own cover in front of the body laid out for its risk level."""
+
+    def setUp(self):
+        super().setUp()
+        ReportResources._refresh(force=True)
+
+    def render_pages(self, score_result):
+        """Cover and body pages merged into the PDF of a score result."""
+        copy = weasyprint.Document.copy
+        merged = []
+
+        def record_copy(document, pages='all'):
+            merged.append((document.pages, pages))
+            return copy(document, pages)
+
+        with mock.patch.object(weasyprint.Document, 'copy', autospec=True, side_effect=record_copy):
+            pdf = SecurityReportGenerator(score_result)._generate_pdf_with_weasyprint(
+                SecurityReportGenerator(score_result)._prepare_context()
+            ).getvalue()
+
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        [(cover, pages)] = merged
+        return cover, pages[len(cover):]
+
+    def test_prospects_share_the_body_but_not_the_cover(self):
+        ana_cover, ana_body = self.render_pages(self.create_score_result('Ana Mora', 'ACME'))
+        luis_cover, luis_body = self.render_pages(self.create_score_result('Luis Vega', 'Globex'))
+
+        self.assertTrue(ana_body)
+        self.assertEqual([id(page) for page in ana_body], [id(page) for page in luis_body])
+        self.assertFalse({id(page) for page in ana_cover} & {id(page) for page in luis_cover})
+
+    def test_each_thread_lays_out_its_own_body(self):
+        score_result = self.create_score_result()
+        _, body = self.render_pages(score_result)
+        other = {}
+
+        thread = threading.Thread(target=lambda: other.update(pages=self.render_pages(score_result)))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(len(other['pages'][1]), len(body))
+        self.assertFalse({id(page) for page in other['pages'][1]} & {id(page) for page in body})
@@ -23,4 +23,19 @@ urlpatterns = [
         views.BulkReportsGenerateView.as_view(), 
         name='bulk_generate_reports'
     ),
+    path(
+        'pdf/bulk-exports/<int:export_id>/', 
+        views.BulkExportDetailView.as_view(), 
+        name='bulk_export_detail'
+    ),
+    path(
+        'pdf/bulk-exports/<int:export_id>/status/', 
+        views.BulkExportStatusView.as_view(), 
+        name='bulk_export_status'
+    ),
+    path(
+        'pdf/bulk-exports/<int:export_id>/download/', 
+        views.BulkExportDownloadView.as_view(), 
+        name='bulk_export_download'
+    ),
 ]
\ No newline at end of file
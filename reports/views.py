@@ -1,21 +1,50 @@
 """
 reports/views.py - Views for generating security assessment reports
 """
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.views import View
 from django.utils import timezone
-import zipfile
-from io import BytesIO
+import os
 
+from core.models import Job, JobType
+from core.protected_media import protected_file_response
+from core.zip_stream import stream_zip
 from scoring.models import ScoreResult
+from .export import get_export_setting, render_single_report, report_zip_entries
+from .models import ReportExport, ReportExportStatus
 from .pdf_generator import SecurityReportGenerator
 
 import logging
 logger = logging.getLogger(__name__)
 
 
+def report_response(request, generator, filename, as_attachment):
+    """
+    PDF response for a report.
+    
+    The stored artifact is handed to nginx (X-Accel-Redirect) or streamed
+    from disk; the PDF is only served from memory when the artifact store
+    is disabled or not writable.
+    """
+    artifact, pdf_content = generator.get_or_render()
+    if artifact is None:
+        response = HttpResponse(pdf_content, content_type='application/pdf')
+        disposition = 'attachment' if as_attachment else 'inline'
+        response['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+        response['Content-Length'] = len(pdf_content)
+        return response
+    
+    response = protected_file_response(
+        request, artifact.file_path, filename, 'application/pdf', as_attachment=as_attachment
+    )
+    response['ETag'] = f'"{artifact.content_hash}"'
+    return response
+
+
 class SecurityReportPDFView(LoginRequiredMixin, View):
     """
     Generate and download security assessment PDF report.
@@ -40,19 +69,10 @@ class SecurityReportPDFView(LoginRequiredMixin, View):
                     status=400
                 )
             
-            # Generate PDF
+            # Generate PDF (or reuse the stored artifact)
             generator = SecurityReportGenerator(score_result)
-            pdf_buffer = generator.generate_report()
-            
-            # Configure download
             filename_info = generator.get_filename_info()
-            
-            response = HttpResponse(
-                pdf_buffer.getvalue(),
-                content_type='application/pdf'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{filename_info["full_name"]}"'
-            response['Content-Length'] = len(pdf_buffer.getvalue())
+            response = report_response(request, generator, filename_info['full_name'], as_attachment=True)
             
             # Log
             logger.info(f"PDF generated for ScoreResult {score_result_id} by {request.user.email}")
@@ -86,13 +106,9 @@ class SecurityReportPreviewView(LoginRequiredMixin, View):
                     status=400
                 )
             
-            # Generate PDF
+            # Preview (inline), from the stored artifact when there is one
             generator = SecurityReportGenerator(score_result)
-            pdf_buffer = generator.generate_report()
-            
-            # Preview (inline)
-            response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
-            response['Content-Disposition'] = 'inline; filename="preview.pdf"'
+            response = report_response(request, generator, 'preview.pdf', as_attachment=False)
             
             logger.info(f"PDF preview generated for ScoreResult {score_result_id}")
             return response
@@ -105,10 +121,14 @@ class SecurityReportPreviewView(LoginRequiredMixin, View):
 class BulkReportsGenerateView(LoginRequiredMixin, View):
     """
     Generate bulk PDF reports for multiple score results.
+    
+    Batches up to REPORT_EXPORT['INLINE_MAX'] are rendered in the request,
+    one after another, and the ZIP is streamed from the stored reports;
+    larger ones are queued as a background export.
     """
     
     def get(self, request):
-        """Generate and return ZIP file with multiple PDF reports."""
+        """Stream a ZIP file with multiple PDF reports, or queue a background export."""
         try:
             # Get parameters
             score_ids = request.GET.get('score_ids', '')
@@ -116,10 +136,7 @@ class BulkReportsGenerateView(LoginRequiredMixin, View):
             risk_level = request.GET.get('risk_level')
             
             # Build base queryset
-            queryset = ScoreResult.objects.select_related(
-                'submission__prospect',
-                'submission__survey'
-            ).filter(
+            queryset = ScoreResult.objects.filter(
                 submission__completed_at__isnull=False
             )
             
@@ -138,48 +155,109 @@ class BulkReportsGenerateView(LoginRequiredMixin, View):
             if risk_level:
                 queryset = queryset.filter(risk_level=risk_level)
             
-            # Safety limit
-            if queryset.count() > 50:
-                return HttpResponse(
-                    "Demasiados reportes solicitados. Máximo 50 reportes por lote.", 
-                    status=400
-                )
+            score_result_ids = list(queryset.order_by('id').values_list('id', flat=True))
             
-            if not queryset.exists():
+            if not score_result_ids:
                 return HttpResponse("No se encontraron score results válidos", status=404)
             
-            # Create ZIP with PDFs
-            zip_buffer = BytesIO()
-            
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                for score_result in queryset:
-                    try:
-                        # Generate individual PDF
-                        generator = SecurityReportGenerator(score_result)
-                        pdf_buffer = generator.generate_report()
-                        
-                        # File name
-                        filename_info = generator.get_filename_info()
-                        filename = filename_info['full_name']
-                        
-                        # Add to ZIP
-                        zip_file.writestr(filename, pdf_buffer.getvalue())
-                        
-                    except Exception as e:
-                        logger.error(f"Error generating PDF for ScoreResult {score_result.id} in bulk: {str(e)}")
-                        continue
-            
-            # Configure response
-            zip_buffer.seek(0)
-            response = HttpResponse(zip_buffer.getvalue(), content_type='application/zip')
+            # Large batches are built by a background worker
+            if len(score_result_ids) > get_export_setting('INLINE_MAX'):
+                with transaction.atomic():
+                    export = ReportExport.objects.create(
+                        requested_by=request.user,
+                        score_result_ids=score_result_ids,
+                        total=len(score_result_ids)
+                    )
+                    Job.enqueue(JobType.EXPORT_REPORTS, {'export_id': export.id}, max_attempts=2)
+                
+                logger.info(f"Bulk PDF export {export.id} queued: {len(score_result_ids)} reports by user {request.user.email}")
+                
+                # The progress page polls the export and offers the download
+                return redirect('reports:bulk_export_detail', export_id=export.id)
+            
+            # Render before streaming, in this process: a render process pool
+            # per request would start an interpreter per report inside gunicorn,
+            # and errors raised while streaming end in a truncated ZIP
+            results = [render_single_report(score_result_id) for score_result_id in score_result_ids]
+            if all(pdf is None for score_result_id, filename, pdf in results):
+                return HttpResponse("Error generando los reportes masivos.", status=500)
+            
+            response = StreamingHttpResponse(
+                stream_zip(report_zip_entries(results)), content_type='application/zip'
+            )
             
             timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
             response['Content-Disposition'] = f'attachment; filename="Reportes_Ciberseguridad_{timestamp}.zip"'
             
-            logger.info(f"Bulk PDF generation completed: {queryset.count()} reports by user {request.user.email}")
+            logger.info(f"Bulk PDF generation started: {len(score_result_ids)} reports by user {request.user.email}")
             
             return response
             
         except Exception as e:
             logger.error(f"Error in bulk PDF generation: {str(e)}")
-            return HttpResponse("Error generando los reportes masivos.", status=500)
\ No newline at end of file
+            return HttpResponse("Error generando los reportes masivos.", status=500)
+
+
+def user_exports(user):
+    """Exports a user can see: their own, or every export for superusers."""
+    if user.is_superuser:
+        return ReportExport.objects.all()
+    return ReportExport.objects.filter(requested_by=user)
+
+
+class BulkExportDetailView(LoginRequiredMixin, View):
+    """
+    Progress page of a background bulk export.
+    """
+    
+    def get(self, request, export_id):
+        """Render the page that polls the export status."""
+        export = get_object_or_404(user_exports(request.user), id=export_id)
+        return render(request, 'admin_panel/reports/bulk_export.html', {'export': export})
+
+
+class BulkExportStatusView(LoginRequiredMixin, View):
+    """
+    Progress of a background bulk export.
+    """
+    
+    def get(self, request, export_id):
+        """Return export progress as JSON."""
+        export = get_object_or_404(user_exports(request.user), id=export_id)
+        
+        data = {
+            'success': True,
+            'export_id': export.id,
+            'status': export.status,
+            'total': export.total,
+            'processed': export.processed,
+            'failed': export.failed,
+            'progress': export.progress_percentage,
+            'download_url': None,
+        }
+        
+        if export.status == ReportExportStatus.DONE and export.file_path:
+            data['download_url'] = reverse('reports:bulk_export_download', args=[export.id])
+        elif export.status == ReportExportStatus.FAILED:
+            data['error'] = export.error
+        
+        return JsonResponse(data)
+
+
+class BulkExportDownloadView(LoginRequiredMixin, View):
+    """
+    Download the ZIP of a finished background export.
+    """
+    
+    def get(self, request, export_id):
+        """Return the export archive."""
+        export = get_object_or_404(user_exports(request.user), id=export_id, status=ReportExportStatus.DONE)
+        
+        if not export.file_path or not os.path.exists(export.file_path):
+            raise Http404("La exportación ya no está disponible")
+        
+        logger.info(f"Bulk PDF export {export.id} downloaded by {request.user.email}")
+        
+        return protected_file_response(
+            request, export.file_path, export.filename, 'application/zip'
+        )
@@ -6,6 +6,7 @@ from django.utils.html import format_html
 from django.db.models import Count, Avg
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from surveys.models import Survey, SurveySubmission
 from .models import SurveyRiskConfiguration, RiskLevelPackageRecommendation, ScoreResult
 
 
@@ -228,11 +229,14 @@ class ScoreResultAdmin(admin.ModelAdmin):
     actions = ['recalculate_scores']
     
     def recalculate_scores(self, request, queryset):
-        """Action to recalculate selected score results."""
+        """Action to recalculate selected score results in bulk, per survey."""
         updated_count = 0
-        for score_result in queryset:
-            ScoreResult.calculate_for_submission(score_result.submission)
-            updated_count += 1
+        surveys = Survey.objects.filter(submissions__score_result__in=queryset).distinct()
+        for survey in surveys:
+            updated_count += ScoreResult.bulk_calculate_for_submissions(
+                survey,
+                SurveySubmission.objects.filter(score_result__in=queryset)
+            )
         
         self.message_user(
             request, 
@@ -5,4 +5,8 @@ class ScoringConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scoring'
 
+    def ready(self):
+        # Connect scoring signals in every process, run_workers included
+        from . import signals
+
 default_app_config = 'scoring.apps.ScoringConfig'
\ No newline at end of file
@@ -0,0 +1,39 @@
+"""
+Django management command that rebuilds the score analytics rollups
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from scoring.models import ScoreRollup, ScoreDistribution
+from surveys.models import Survey
+
+
+class Command(BaseCommand):
+    """Management command to rebuild ScoreRollup and ScoreDistribution rows from ScoreResult"""
+
+    help = 'Rebuild the score rollups and per survey score distributions from the score results'
+
+    def add_arguments(self, parser):
+        """Add command arguments"""
+        parser.add_argument(
+            '--survey',
+            type=str,
+            help='Survey code to rebuild (default: all surveys)',
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command execution"""
+        survey = None
+        if options['survey']:
+            survey = Survey.objects.filter(code=options['survey']).first()
+            if survey is None:
+                raise CommandError(f'Survey not found: {options["survey"]}')
+
+        rows = ScoreRollup.rebuild(survey=survey)
+
+        survey_ids = [survey.id] if survey else Survey.objects.values_list('id', flat=True)
+        for survey_id in survey_ids:
+            ScoreDistribution.rebuild(survey_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rows} score rollup row(s) and {len(survey_ids)} score distribution(s)'
+        ))
@@ -1,8 +1,13 @@
 """
 Scoring models for SCG Presales system.
 """
-from django.db import models
+from bisect import bisect_left
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Sum, Min, Max
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 
 
 class RiskLevel(models.TextChoices):
@@ -135,6 +140,11 @@ class RiskLevelPackageRecommendation(models.Model):
         return f"{self.survey.title} - {self.risk_level}: {self.primary_package}"
 
 
+# Hasta este tamaño de lote el recálculo ajusta ScoreDistribution con
+# apply(); lotes mayores la reconstruyen desde ScoreResult
+DISTRIBUTION_INCREMENTAL_LIMIT = 100
+
+
 class ScoreResult(models.Model):
     """
     Resultado del scoring para un SurveySubmission.
@@ -195,6 +205,10 @@ class ScoreResult(models.Model):
         ordering = ['-calculated_at']
         verbose_name = 'Score Result'
         verbose_name_plural = 'Score Results'
+        indexes = [
+            # Keyset pagination of the admin list and exports
+            models.Index(fields=['-calculated_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.submission.prospect.name} - {self.score_percentage}% ({self.risk_level})"
@@ -213,15 +227,7 @@ class ScoreResult(models.Model):
         survey = submission.survey
         
         # 1. Obtener o crear configuración de riesgo con defaults
-        risk_config, created = SurveyRiskConfiguration.objects.get_or_create(
-            survey=survey,
-            defaults={
-                'critical_max': 20,
-                'high_max': 40, 
-                'moderate_max': 60,
-                'good_max': 80
-            }
-        )
+        risk_config = cls._get_risk_config(survey)
         
         # 2. Calcular puntos totales
         responses = submission.responses.all()
@@ -263,6 +269,212 @@ class ScoreResult(models.Model):
         
         return score_result
     
+    @classmethod
+    def bulk_calculate_for_submissions(cls, survey, submissions):
+        """
+        Recalcula en lote los scores de varias submissions de un mismo survey.
+        
+        1. Trae (submission, sección, puntos) en una sola consulta agregada
+        2. Calcula totales, porcentajes y risk levels en memoria contra una
+           única configuración de riesgo y un único lookup de paquetes
+        3. Escribe los resultados con bulk_update/bulk_create
+        
+        Produce los mismos valores que calculate_for_submission.
+        
+        Args:
+            survey: Survey al que pertenecen las submissions
+            submissions: QuerySet de SurveySubmission a recalcular
+        
+        Returns:
+            int: número de ScoreResult escritos
+        """
+        from surveys.models import Response
+        
+        submissions = submissions.filter(survey=survey)
+        statuses = dict(submissions.values_list('id', 'status'))
+        submission_ids = list(statuses)
+        if not submission_ids:
+            return 0
+        
+        risk_config = cls._get_risk_config(survey)
+        packages = {
+            rec.risk_level: rec
+            for rec in RiskLevelPackageRecommendation.objects.filter(survey=survey)
+        }
+        sections = {section.order: section for section in survey.sections.all()}
+        
+        # Puntos por submission y sección en una sola consulta
+        points_by_submission = {submission_id: {} for submission_id in submission_ids}
+        section_rows = Response.objects.filter(
+            submission__in=submissions
+        ).values(
+            'submission_id', 'question__section__order'
+        ).annotate(
+            points=Sum('points_earned')
+        ).order_by()
+        
+        for row in section_rows:
+            points_by_submission[row['submission_id']][row['question__section__order']] = row['points'] or 0
+        
+        existing = {
+            score_result.submission_id: score_result
+            for score_result in cls.objects.filter(submission_id__in=submissions.values('id'))
+        }
+        
+        # Filas de rollup donde estaban los scores antes del recálculo
+        rollup_keys = [
+            ScoreRollup.key(survey.id, score_result.risk_level, score_result.calculated_at)
+            for score_result in existing.values()
+        ]
+        
+        # Porcentajes que salen y entran en la distribución (solo ACTIVE)
+        removed_percentages = [
+            score_result.score_percentage
+            for score_result in existing.values()
+            if statuses.get(score_result.submission_id) == 'ACTIVE'
+        ]
+        
+        now = timezone.now()
+        to_update = []
+        to_create = []
+        
+        for submission_id, section_points in points_by_submission.items():
+            total_points = sum(section_points.values())
+            
+            if survey.max_score > 0:
+                score_percentage = (total_points / survey.max_score) * 100
+            else:
+                score_percentage = 0
+            
+            risk_level = risk_config.get_risk_level_for_percentage(score_percentage)
+            package_rec = packages.get(risk_level)
+            
+            section_scores = {}
+            for section_order, points in sorted(section_points.items()):
+                section = sections[section_order]
+                section_scores[f"section_{section_order}"] = {
+                    'title': section.title,
+                    'points': points,
+                    'max_points': section.max_points,
+                    'percentage': round((points / section.max_points) * 100, 2) if section.max_points > 0 else 0
+                }
+            
+            score_result = existing.get(submission_id) or cls(submission_id=submission_id)
+            score_result.total_points = total_points
+            score_result.score_percentage = round(score_percentage, 2)
+            score_result.risk_level = risk_level
+            score_result.primary_package = package_rec.primary_package if package_rec else 'PROTECCION_ESENCIAL'
+            score_result.secondary_package = package_rec.secondary_package if package_rec else None
+            score_result.section_scores = section_scores
+            score_result.recalculated_at = now
+            
+            if score_result.pk:
+                to_update.append(score_result)
+            else:
+                to_create.append(score_result)
+        
+        with transaction.atomic():
+            cls.objects.bulk_update(
+                to_update,
+                [
+                    'total_points', 'score_percentage', 'risk_level', 'primary_package',
+                    'secondary_package', 'section_scores', 'recalculated_at'
+                ],
+                batch_size=500
+            )
+            cls.objects.bulk_create(to_create, batch_size=500)
+            
+            rollup_keys.extend(
+                ScoreRollup.key(survey.id, score_result.risk_level, score_result.calculated_at)
+                for score_result in to_update + to_create
+            )
+            ScoreRollup.refresh(rollup_keys)
+            
+            # Lotes chicos (rescoring tras editar respuestas): ajuste
+            # incremental; recálculos de todo el survey: reconstrucción
+            if len(submission_ids) <= DISTRIBUTION_INCREMENTAL_LIMIT:
+                ScoreDistribution.apply(
+                    survey.id,
+                    added=[
+                        Decimal(str(score_result.score_percentage))
+                        for score_result in to_update + to_create
+                        if statuses[score_result.submission_id] == 'ACTIVE'
+                    ],
+                    removed=removed_percentages,
+                )
+            else:
+                ScoreDistribution.rebuild(survey.id)
+        
+        # bulk_update does not send post_save, drop stored reports explicitly
+        from reports.models import ReportArtifact
+        ReportArtifact.invalidate([score_result.id for score_result in to_update])
+        
+        return len(to_update) + len(to_create)
+    
+    @classmethod
+    def rescore_submissions(cls, submission_ids):
+        """
+        Recalcula los scores de submissions completadas y activas, agrupadas
+        por survey a través del cálculo en lote.
+        
+        Las submissions que ya no existen, no están completadas o están
+        deshabilitadas se ignoran.
+        
+        Returns:
+            int: número de ScoreResult escritos
+        """
+        from surveys.models import Survey, SurveySubmission
+        
+        submissions = SurveySubmission.objects.filter(
+            id__in=submission_ids,
+            status='ACTIVE',
+            completed_at__isnull=False
+        )
+        
+        updated = 0
+        for survey in Survey.objects.filter(submissions__in=submissions).distinct():
+            updated += cls.bulk_calculate_for_submissions(survey, submissions)
+        return updated
+    
+    def get_survey_standing(self):
+        """
+        Posición de este score entre los del mismo survey.
+        
+        Se lee de ScoreDistribution (una fila), así que sirve tanto para el
+        panel como para la generación de reportes.
+        
+        Returns:
+            dict con rank, percentile, avg_score, min_score, max_score y
+            total_count; None si el survey aún no tiene scores activos
+        """
+        submission = self.submission
+        distribution = ScoreDistribution.for_survey(submission.survey_id)
+        if not distribution.count:
+            return None
+        
+        return {
+            'rank': distribution.rank(self.score_percentage),
+            'percentile': distribution.percentile(
+                self.score_percentage,
+                included=submission.status == 'ACTIVE'
+            ),
+            **distribution.stats(),
+        }
+    
+    @staticmethod
+    def _get_risk_config(survey):
+        """Obtiene o crea la configuración de riesgo del survey con defaults."""
+        risk_config, created = SurveyRiskConfiguration.objects.get_or_create(
+            survey=survey,
+            defaults={
+                'critical_max': 20,
+                'high_max': 40, 
+                'moderate_max': 60,
+                'good_max': 80
+            }
+        )
+        return risk_config
+    
     @staticmethod
     def _calculate_section_scores(submission):
         """
@@ -308,4 +520,336 @@ class ScoreResult(models.Model):
     def get_section_score(self, section_order):
         """Obtiene el score de una sección específica por orden."""
         section_key = f"section_{section_order}"
-        return self.section_scores.get(section_key, {})
\ No newline at end of file
+        return self.section_scores.get(section_key, {})
+
+
+class ScoreRollup(models.Model):
+    """
+    Resumen materializado de ScoreResult por survey, nivel de riesgo y día.
+    
+    Se recalcula dentro de la misma transacción que escribe el ScoreResult o
+    cambia el status de la submission, y solo cuenta submissions ACTIVE. Los
+    dashboards leen unas pocas filas de esta tabla en vez de agregar toda la
+    tabla de scores en cada request.
+    """
+    HISTOGRAM_BUCKETS = 10  # Buckets de 10 puntos porcentuales
+    
+    survey = models.ForeignKey(
+        'surveys.Survey',
+        on_delete=models.CASCADE,
+        related_name='score_rollups'
+    )
+    risk_level = models.CharField(
+        max_length=20,
+        choices=RiskLevel.choices
+    )
+    day = models.DateField(
+        help_text="Fecha local de cálculo del score"
+    )
+    
+    count = models.PositiveIntegerField(default=0)
+    sum_percentage = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    min_percentage = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    max_percentage = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    histogram = models.JSONField(
+        default=list,
+        help_text="Cantidad de scores por bucket de 10% (0-10, 10-20, ..., 90-100)"
+    )
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Score Rollup'
+        verbose_name_plural = 'Score Rollups'
+        unique_together = ['survey', 'risk_level', 'day']
+        indexes = [
+            models.Index(fields=['survey', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.survey_id} {self.risk_level} {self.day}: {self.count}"
+    
+    @staticmethod
+    def key(survey_id, risk_level, calculated_at):
+        """Clave (survey_id, risk_level, day) de la fila que contiene un score."""
+        return (survey_id, risk_level, timezone.localdate(calculated_at))
+    
+    @classmethod
+    def histogram_bucket(cls, percentage):
+        """Índice del bucket del histograma para un porcentaje."""
+        return min(int(Decimal(percentage) // 10), cls.HISTOGRAM_BUCKETS - 1)
+    
+    @classmethod
+    def refresh(cls, keys):
+        """
+        Recalcula las filas indicadas desde ScoreResult.
+        
+        Cada fila se bloquea (select_for_update) antes de agregar, así dos
+        transacciones que tocan el mismo día no pueden pisarse los conteos.
+        Las claves se procesan ordenadas para evitar deadlocks.
+        """
+        with transaction.atomic():
+            for survey_id, risk_level, day in sorted(set(keys)):
+                cls.objects.get_or_create(survey_id=survey_id, risk_level=risk_level, day=day)
+                rollup = cls.objects.select_for_update().get(
+                    survey_id=survey_id, risk_level=risk_level, day=day
+                )
+                
+                percentages = list(ScoreResult.objects.filter(
+                    submission__survey_id=survey_id,
+                    submission__status='ACTIVE',
+                    risk_level=risk_level,
+                    calculated_at__date=day
+                ).values_list('score_percentage', flat=True))
+                
+                if not percentages:
+                    rollup.delete()
+                    continue
+                
+                histogram = [0] * cls.HISTOGRAM_BUCKETS
+                for percentage in percentages:
+                    histogram[cls.histogram_bucket(percentage)] += 1
+                
+                rollup.count = len(percentages)
+                rollup.sum_percentage = sum(percentages, Decimal('0'))
+                rollup.min_percentage = min(percentages)
+                rollup.max_percentage = max(percentages)
+                rollup.histogram = histogram
+                rollup.save()
+    
+    @classmethod
+    def refresh_for_submissions(cls, submissions):
+        """Recalcula las filas afectadas por un cambio en estas submissions."""
+        keys = [
+            cls.key(survey_id, risk_level, calculated_at)
+            for survey_id, risk_level, calculated_at in ScoreResult.objects.filter(
+                submission__in=submissions
+            ).values_list('submission__survey_id', 'risk_level', 'calculated_at')
+        ]
+        cls.refresh(keys)
+    
+    @classmethod
+    def rebuild(cls, survey=None):
+        """Reconstruye todas las filas (o las de un survey) desde cero."""
+        scores = ScoreResult.objects.all()
+        rollups = cls.objects.all()
+        if survey is not None:
+            scores = scores.filter(submission__survey=survey)
+            rollups = rollups.filter(survey=survey)
+        
+        keys = [
+            cls.key(survey_id, risk_level, calculated_at)
+            for survey_id, risk_level, calculated_at in scores.values_list(
+                'submission__survey_id', 'risk_level', 'calculated_at'
+            )
+        ]
+        
+        with transaction.atomic():
+            rollups.delete()
+            cls.refresh(keys)
+        
+        return len(set(keys))
+    
+    @classmethod
+    def summarize(cls, survey_id=None, risk_level=None, date_from=None, date_to=None):
+        """
+        Estadísticas de scores de submissions activas leídas desde los rollups.
+        
+        Returns:
+            dict con total, avg_score, min_score, max_score y risk_distribution
+            (lista por nivel de riesgo con count, avg_score, min_score, max_score)
+        """
+        rollups = cls.objects.all()
+        if survey_id:
+            rollups = rollups.filter(survey_id=survey_id)
+        if risk_level:
+            rollups = rollups.filter(risk_level=risk_level)
+        if date_from:
+            rollups = rollups.filter(day__gte=date_from)
+        if date_to:
+            rollups = rollups.filter(day__lte=date_to)
+        
+        distribution = []
+        for row in rollups.values('risk_level').annotate(
+            total=Sum('count'),
+            total_percentage=Sum('sum_percentage'),
+            min_score=Min('min_percentage'),
+            max_score=Max('max_percentage')
+        ).order_by('risk_level'):
+            distribution.append({
+                'risk_level': row['risk_level'],
+                'count': row['total'],
+                'avg_score': row['total_percentage'] / row['total'],
+                'min_score': row['min_score'],
+                'max_score': row['max_score'],
+            })
+        
+        total = sum(item['count'] for item in distribution)
+        total_percentage = sum((item['avg_score'] * item['count'] for item in distribution), Decimal('0'))
+        
+        return {
+            'total': total,
+            'avg_score': total_percentage / total if total else 0,
+            'min_score': min((item['min_score'] for item in distribution), default=None),
+            'max_score': max((item['max_score'] for item in distribution), default=None),
+            'risk_distribution': distribution,
+        }
+
+
+class ScoreDistribution(models.Model):
+    """
+    Distribución de scores de un survey (solo submissions activas).
+    
+    Histograma disperso indexado por score en centésimas (score * 100), así
+    que es exacto para los valores de score_percentage y nunca tiene más de
+    10001 entradas sin importar cuántas submissions existan. Rank, percentil,
+    mínimo, máximo y promedio se leen de esta única fila.
+    """
+    survey = models.OneToOneField(
+        'surveys.Survey',
+        on_delete=models.CASCADE,
+        related_name='score_distribution'
+    )
+    count = models.PositiveIntegerField(default=0)
+    sum_percentage = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    histogram = models.JSONField(
+        default=dict,
+        help_text="Cantidad de scores por valor, en centésimas de porcentaje"
+    )
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Score Distribution'
+        verbose_name_plural = 'Score Distributions'
+    
+    def __str__(self):
+        return f"{self.survey_id}: {self.count} scores"
+    
+    @staticmethod
+    def _bucket(percentage):
+        """Clave del histograma para un score_percentage."""
+        return int(round(Decimal(percentage) * 100))
+    
+    @property
+    def _index(self):
+        """Claves ordenadas y conteos acumulados del histograma."""
+        if getattr(self, '_index_cache', None) is None:
+            keys = sorted(int(key) for key in self.histogram)
+            cumulative = []
+            running = 0
+            for key in keys:
+                running += self.histogram[str(key)]
+                cumulative.append(running)
+            self._index_cache = (keys, cumulative)
+        return self._index_cache
+    
+    @property
+    def min_score(self):
+        keys = self._index[0]
+        return Decimal(keys[0]) / 100 if keys else None
+    
+    @property
+    def max_score(self):
+        keys = self._index[0]
+        return Decimal(keys[-1]) / 100 if keys else None
+    
+    @property
+    def avg_score(self):
+        return self.sum_percentage / self.count if self.count else None
+    
+    def rank(self, percentage):
+        """Cantidad de scores estrictamente menores que percentage (O(log n))."""
+        keys, cumulative = self._index
+        position = bisect_left(keys, self._bucket(percentage))
+        return cumulative[position - 1] if position else 0
+    
+    def percentile(self, percentage, included=True):
+        """
+        Posición relativa de un score entre los del survey (0-100).
+        
+        Args:
+            percentage: score a ubicar
+            included: si el score ya forma parte de la distribución
+        
+        Returns:
+            int o None si no hay otros scores con qué comparar
+        """
+        others = self.count - 1 if included else self.count
+        if others <= 0:
+            return None
+        return round((self.rank(percentage) / others) * 100)
+    
+    def stats(self):
+        """Estadísticas del survey en el formato de los templates del panel."""
+        return {
+            'avg_score': self.avg_score,
+            'min_score': self.min_score,
+            'max_score': self.max_score,
+            'total_count': self.count,
+        }
+    
+    @classmethod
+    def for_survey(cls, survey_id):
+        """Distribución del survey; una vacía (sin guardar) si aún no tiene scores."""
+        return cls.objects.filter(survey_id=survey_id).first() or cls(survey_id=survey_id)
+    
+    @classmethod
+    def apply(cls, survey_id, added=(), removed=()):
+        """
+        Suma y resta scores de la distribución del survey.
+        
+        La fila se bloquea (select_for_update) durante el cambio, así dos
+        transacciones concurrentes no pierden actualizaciones.
+        """
+        with transaction.atomic():
+            cls.objects.get_or_create(survey_id=survey_id)
+            distribution = cls.objects.select_for_update().get(survey_id=survey_id)
+            
+            for percentage, delta in [(p, 1) for p in added] + [(p, -1) for p in removed]:
+                key = str(cls._bucket(percentage))
+                remaining = distribution.histogram.get(key, 0) + delta
+                if remaining > 0:
+                    distribution.histogram[key] = remaining
+                else:
+                    distribution.histogram.pop(key, None)
+                distribution.count += delta
+                distribution.sum_percentage += delta * Decimal(percentage)
+            
+            distribution.save()
+    
+    @classmethod
+    def rebuild(cls, survey_id):
+        """Recalcula la distribución de un survey desde ScoreResult."""
+        histogram = {}
+        total = Decimal('0')
+        percentages = ScoreResult.objects.filter(
+            submission__survey_id=survey_id,
+            submission__status='ACTIVE'
+        ).values_list('score_percentage', flat=True)
+        
+        for percentage in percentages:
+            key = str(cls._bucket(percentage))
+            histogram[key] = histogram.get(key, 0) + 1
+            total += percentage
+        
+        cls.objects.update_or_create(
+            survey_id=survey_id,
+            defaults={
+                'count': sum(histogram.values()),
+                'sum_percentage': total,
+                'histogram': histogram,
+            }
+        )
+    
+    @classmethod
+    def rebuild_for_submissions(cls, submissions):
+        """Recalcula las distribuciones de los surveys de estas submissions."""
+        from surveys.models import Survey
+        
+        survey_ids = Survey.objects.filter(
+            submissions__in=submissions
+        ).values_list('id', flat=True).distinct()
+        
+        for survey_id in survey_ids:
+            cls.rebuild(survey_id)
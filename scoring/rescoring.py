@@ -0,0 +1,77 @@
+"""
+scoring/rescoring.py - Coalesce score recalculation to once per submission per transaction
+
+Response signals mark their submission as dirty instead of rescoring it on
+the spot. The first mark in a transaction registers an on_commit callback;
+every later mark in the same transaction joins that batch. When the
+transaction commits, each dirty submission is rescored exactly once through
+the bulk scoring engine. Editing 30 responses or cascading a delete costs a
+single recalculation.
+
+Outside a transaction (autocommit) on_commit runs immediately, so a mark
+rescores right away, as before.
+"""
+import logging
+import threading
+import weakref
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+logger = logging.getLogger(__name__)
+
+
+_local = threading.local()
+
+
+def _batches():
+    """Dirty batches of the current thread, by database alias."""
+    if not hasattr(_local, 'batches'):
+        _local.batches = {}
+    return _local.batches
+
+
+def mark_submission_dirty(submission_id, using=DEFAULT_DB_ALIAS):
+    """
+    Schedule a submission to be rescored when the current transaction commits.
+
+    The batch only keeps a weak reference to its callback: Django holds the
+    callback until the transaction commits and discards it on rollback, so
+    a batch whose callback is gone was rolled back and is dropped, and
+    rolled back changes never trigger a rescore.
+    """
+    batches = _batches()
+    batch = batches.get(using)
+
+    if batch is not None and batch['callback']() is not None:
+        batch['submission_ids'].add(submission_id)
+        return
+
+    batch = {'submission_ids': {submission_id}}
+
+    def callback():
+        _flush(batch, using)
+
+    batch['callback'] = weakref.ref(callback)
+    batches[using] = batch
+    transaction.on_commit(callback, using=using)
+
+
+def _flush(batch, using):
+    """Rescore a committed batch of dirty submissions."""
+    from .models import ScoreResult
+
+    if _batches().get(using) is batch:
+        del _batches()[using]
+
+    submission_ids = sorted(batch['submission_ids'])
+    try:
+        updated = ScoreResult.rescore_submissions(submission_ids)
+        logger.info(
+            f"Scores recalculados por cambios en responses: {updated} "
+            f"de {len(submission_ids)} submissions"
+        )
+    except Exception as e:
+        logger.error(
+            f"Error recalculando scores de submissions {submission_ids}: {str(e)}",
+            exc_info=True
+        )
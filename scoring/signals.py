@@ -4,13 +4,14 @@ Django signals for automatic scoring calculation.
 This module handles automatic score calculation when survey submissions are completed.
 """
 import logging
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
-from django.db import transaction
 
 from surveys.models import SurveySubmission, Response
-from .models import ScoreResult
-from core.email_service import SurveyEmailService
+from .models import ScoreResult, ScoreRollup, ScoreDistribution
+from .rescoring import mark_submission_dirty
+from core.models import Job, JobType
+from reports.models import ReportArtifact
 
 logger = logging.getLogger(__name__)
 
@@ -18,57 +19,31 @@ logger = logging.getLogger(__name__)
 @receiver(post_save, sender=SurveySubmission)
 def calculate_score_on_submission_completion(sender, instance, created, **kwargs):
     """
-    Calculate score automatically when a SurveySubmission is completed.
+    Queue score calculation when a SurveySubmission is completed.
     
     This signal triggers when:
-    - A SurveySubmission is marked as completed (completed_at is set)
+    - A SurveySubmission is created completed, or its completed_at is set
+      for the first time
     - The submission status is ACTIVE
+    
+    Later saves (admin edits, status changes) do not queue another run; a
+    reactivated submission is rescored by handle_submission_status_change.
+    
+    The score, PDF report and completion email are produced by
+    `manage.py run_workers`. The job is created in the caller's transaction,
+    so workers only see it once the submission and its responses commit.
+    A newly created submission also gets the report emailed to the prospect.
     """
-    # Only calculate if submission is completed and active
-    if instance.is_completed and instance.status == 'ACTIVE':
-        logger.info(f"Calculando score para submission completada: {instance.id}")
+    just_completed = created or not getattr(instance, '_was_completed', True)
+    
+    # Only calculate if submission was just completed and is active
+    if just_completed and instance.is_completed() and instance.status == 'ACTIVE':
+        logger.info(f"Encolando cálculo de score para submission completada: {instance.id}")
         
-        try:
-            with transaction.atomic():
-                # Calculate or recalculate the score
-                score_result = ScoreResult.calculate_for_submission(instance)
-                
-                logger.info(
-                    f"Score calculado exitosamente: {score_result.score_percentage}% "
-                    f"({score_result.risk_level}) para {instance.prospect.name}"
-                )
-                
-                # Update prospect's last_contact_at if this is a new completion
-                if not hasattr(instance, '_score_already_calculated'):
-                    instance.prospect.last_contact_at = instance.completed_at
-                    instance.prospect.save(update_fields=['last_contact_at'])
-                    
-                    logger.info(f"Actualizado last_contact_at para {instance.prospect.name}")
-                    
-                    # Send email AFTER transaction commits to ensure all data is saved
-                    def send_completion_email():
-                        try:
-                            # Get fresh ScoreResult from database after transaction commit
-                            fresh_score_result = ScoreResult.objects.get(id=score_result.id)
-                            email_sent = SurveyEmailService.send_survey_completion_email(fresh_score_result)
-                            if email_sent:
-                                logger.info(f"Email de completion enviado a {instance.prospect.email}")
-                            else:
-                                logger.warning(f"No se pudo enviar email a {instance.prospect.email}")
-                        except Exception as e:
-                            logger.error(f"Error enviando email de completion: {str(e)}")
-                    
-                    # Schedule email to be sent after transaction commits
-                    transaction.on_commit(send_completion_email)
-                
-        except Exception as e:
-            logger.error(f"Error calculando score para submission {instance.id}: {str(e)}")
-            # Don't raise the exception to avoid breaking the submission save
-            # but log it for debugging
-    
-    elif created:
-        # Nueva submission creada pero no completada
-        pass
+        Job.enqueue(JobType.SCORE_SUBMISSION, {
+            'submission_id': instance.id,
+            'notify': created,
+        })
 
 
 @receiver(post_save, sender=Response)
@@ -77,29 +52,10 @@ def recalculate_score_on_response_change(sender, instance, created, **kwargs):
     Recalculate score when responses are added or modified.
     
     This ensures the score is always up-to-date when individual responses change.
-    Only triggers if the submission is already completed.
+    The submission is rescored once when the transaction commits, however many
+    of its responses changed, and only if it is completed and active.
     """
-    submission = instance.submission
-    
-    # Only recalculate if submission is completed and active
-    if submission.is_completed and submission.status == 'ACTIVE':
-        logger.info(f"Recalculando score por cambio en response: {instance.id}")
-        
-        try:
-            with transaction.atomic():
-                # Recalculate the score
-                score_result = ScoreResult.calculate_for_submission(submission)
-                
-                logger.info(
-                    f"Score recalculado: {score_result.score_percentage}% "
-                    f"({score_result.risk_level}) para {submission.prospect.name}"
-                )
-                
-        except Exception as e:
-            logger.error(
-                f"Error recalculando score para submission {submission.id} "
-                f"tras cambio en response {instance.id}: {str(e)}"
-            )
+    mark_submission_dirty(instance.submission_id)
 
 
 @receiver(post_delete, sender=Response)
@@ -108,31 +64,10 @@ def recalculate_score_on_response_deletion(sender, instance, **kwargs):
     Recalculate score when responses are deleted.
     
     This ensures the score reflects the current state after response deletion.
+    A cascade delete of a whole submission is ignored at rescoring time,
+    because the submission no longer exists.
     """
-    try:
-        # Check if submission still exists (might be cascade deleted)
-        submission = instance.submission
-        
-        # Only recalculate if submission is completed and active
-        if submission.is_completed and submission.status == 'ACTIVE':
-            logger.info(f"Recalculando score por eliminación de response: {instance.id}")
-            
-            with transaction.atomic():
-                # Recalculate the score
-                score_result = ScoreResult.calculate_for_submission(submission)
-                
-                logger.info(
-                    f"Score recalculado tras eliminación: {score_result.score_percentage}% "
-                    f"({score_result.risk_level}) para {submission.prospect.name}"
-                )
-                
-    except SurveySubmission.DoesNotExist:
-        # Submission was deleted, nothing to recalculate
-        pass
-    except Exception as e:
-        logger.error(
-            f"Error recalculando score tras eliminación de response {instance.id}: {str(e)}"
-        )
+    mark_submission_dirty(instance.submission_id)
 
 
 @receiver(post_save, sender=SurveySubmission)
@@ -149,40 +84,97 @@ def handle_submission_status_change(sender, instance, created, **kwargs):
         
         # Status changed from ACTIVE to something else
         if original_status == 'ACTIVE' and current_status != 'ACTIVE':
+            # Score is kept for history; it leaves the statistics with the submission
             logger.info(f"Submission {instance.id} cambió de ACTIVE a {current_status}")
-            
-            # Mark existing score as inactive (don't delete, keep for history)
-            try:
-                score_result = ScoreResult.objects.get(submission=instance)
-                # Could add an 'is_active' field to ScoreResult in the future
-                logger.info(f"Score mantenido para historial: {score_result.score_percentage}%")
-            except ScoreResult.DoesNotExist:
-                pass
         
         # Status changed back to ACTIVE
         elif original_status != 'ACTIVE' and current_status == 'ACTIVE':
             logger.info(f"Submission {instance.id} reactivada a ACTIVE desde {original_status}")
             
             # Recalculate if completed
-            if instance.is_completed:
-                try:
-                    with transaction.atomic():
-                        score_result = ScoreResult.calculate_for_submission(instance)
-                        logger.info(f"Score recalculado al reactivar: {score_result.score_percentage}%")
-                except Exception as e:
-                    logger.error(f"Error recalculando score al reactivar: {str(e)}")
+            if instance.is_completed():
+                mark_submission_dirty(instance.id)
+
+
+# Drop stored PDF reports when the score behind them changes
+@receiver(post_save, sender=ScoreResult)
+def invalidate_report_cache_on_score_change(sender, instance, created, **kwargs):
+    """Remove stored reports of a recalculated score result."""
+    if not created:
+        ReportArtifact.invalidate([instance.id])
+
+
+@receiver(post_delete, sender=ScoreResult)
+def invalidate_report_cache_on_score_deletion(sender, instance, **kwargs):
+    """Remove stored report files of a deleted score result."""
+    ReportArtifact.invalidate([instance.id])
+
+
+# Keep the analytics rollups and score distributions in step with the scores
+@receiver(post_init, sender=ScoreResult)
+def store_original_score(sender, instance, **kwargs):
+    """Remember where the score was counted when it was loaded."""
+    instance._original_score = (instance.risk_level, instance.calculated_at, instance.score_percentage)
+
+
+@receiver(post_save, sender=ScoreResult)
+def refresh_analytics_on_score_change(sender, instance, created, **kwargs):
+    """Recount the rollup rows the score left and joined and move it in the distribution."""
+    submission = instance.submission
+    keys = [ScoreRollup.key(submission.survey_id, instance.risk_level, instance.calculated_at)]
+    removed = []
+    
+    risk_level, calculated_at, score_percentage = getattr(instance, '_original_score', (None, None, None))
+    if not created and risk_level and calculated_at:
+        keys.append(ScoreRollup.key(submission.survey_id, risk_level, calculated_at))
+        removed.append(score_percentage)
+    
+    ScoreRollup.refresh(keys)
+    if submission.status == 'ACTIVE':
+        ScoreDistribution.apply(submission.survey_id, added=[instance.score_percentage], removed=removed)
+    
+    instance._original_score = (instance.risk_level, instance.calculated_at, instance.score_percentage)
+
+
+@receiver(post_delete, sender=ScoreResult)
+def refresh_analytics_on_score_deletion(sender, instance, **kwargs):
+    """Recount the rollup row of a deleted score and drop it from the distribution."""
+    try:
+        submission = instance.submission
+    except SurveySubmission.DoesNotExist:
+        return
+    
+    ScoreRollup.refresh([ScoreRollup.key(submission.survey_id, instance.risk_level, instance.calculated_at)])
+    if submission.status == 'ACTIVE':
+        ScoreDistribution.apply(submission.survey_id, removed=[instance.score_percentage])
 
 
-# Store original status to detect changes
 @receiver(post_save, sender=SurveySubmission)
+def refresh_analytics_on_submission_status_change(sender, instance, created, **kwargs):
+    """Analytics only count ACTIVE submissions; recount when the status changed."""
+    if created or getattr(instance, '_original_status', None) == instance.status:
+        return
+    ScoreRollup.refresh_for_submissions([instance])
+    if ScoreResult.objects.filter(submission=instance).exists():
+        ScoreDistribution.rebuild(instance.survey_id)
+
+
+# Store original status to detect changes. Connected after every other
+# SurveySubmission post_save receiver so they still see the previous status.
+@receiver(post_init, sender=SurveySubmission)
 def store_original_status(sender, instance, **kwargs):
+    """Store the status the submission was loaded with."""
+    # __dict__ lookup: a deferred status must not trigger a query
+    instance._original_status = instance.__dict__.get('status')
+    # A deferred completed_at counts as completed: never queue a scoring run by mistake
+    instance._was_completed = instance.__dict__.get('completed_at', True) is not None
+
+
+@receiver(post_save, sender=SurveySubmission)
+def update_original_status(sender, instance, **kwargs):
     """Store original status to detect changes in next save."""
-    if instance.pk:
-        try:
-            original = SurveySubmission.objects.get(pk=instance.pk)
-            instance._original_status = original.status
-        except SurveySubmission.DoesNotExist:
-            instance._original_status = None
+    instance._original_status = instance.status
+    instance._was_completed = instance.__dict__.get('completed_at', True) is not None
 
 
 # Batch operations signal for performance
@@ -195,7 +187,8 @@ def recalculate_scores_for_survey(survey, force=False):
         force: Whether to recalculate even if score already exists
     
     This is not a signal but a utility function that can be called from
-    management commands or admin actions.
+    management commands or admin actions. It uses the bulk scoring engine,
+    so the cost is a fixed number of queries regardless of submission count.
     """
     logger.info(f"Iniciando recálculo masivo para survey: {survey.title}")
     
@@ -204,30 +197,22 @@ def recalculate_scores_for_survey(survey, force=False):
         completed_at__isnull=False
     )
     
+    # Only recalculate if forced or no score exists
+    if not force:
+        submissions = submissions.filter(score_result__isnull=True)
+    
     success_count = 0
     error_count = 0
     
-    for submission in submissions:
-        try:
-            # Only recalculate if forced or no score exists
-            if force or not hasattr(submission, 'score_result'):
-                with transaction.atomic():
-                    score_result = ScoreResult.calculate_for_submission(submission)
-                    success_count += 1
-                    
-            else:
-                # Saltado (ya existe)
-                pass
-                
-        except Exception as e:
-            error_count += 1
-            logger.error(
-                f"Error recalculando {submission.id} ({submission.prospect.name}): {str(e)}"
-            )
+    try:
+        success_count = ScoreResult.bulk_calculate_for_submissions(survey, submissions)
+    except Exception as e:
+        error_count = submissions.count()
+        logger.error(f"Error en recálculo masivo para {survey.title}: {str(e)}", exc_info=True)
     
     logger.info(
         f"Recálculo masivo completado para {survey.title}: "
         f"{success_count} exitosos, {error_count} errores"
     )
     
-    return success_count, error_count
\ No newline at end of file
+    return success_count, error_count
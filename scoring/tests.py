@@ -1,3 +1,372 @@
+from unittest import mock
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Job, JobType
+from prospects.models import Prospect
+from surveys.models import Survey, SurveySection, Question, QuestionOption, SurveySubmission, Response
+
+from .models import ScoreDistribution, ScoreResult, ScoreRollup
+from .rescoring import mark_submission_dirty
+
+
+class RescoreDistributionTests(TestCase):
+    """Rescoring a few submissions moves their scores in the distribution."""
+
+    def setUp(self):
+        self.survey = Survey.objects.create(title='Diagnóstico', version='1.0', max_score=10)
+        section = SurveySection.objects.create(survey=self.survey, title='Gobierno', order=1, max_points=10)
+        self.question = Question.objects.create(
+            survey=self.survey, section=section, question_text='¿Tiene un plan de respuesta?',
+            question_type='SINGLE_CHOICE', order=1, max_points=10,
+        )
+        self.options = [
+            QuestionOption.objects.create(question=self.question, option_text=str(points), order=points, points=points)
+            for points in (2, 5, 10)
+        ]
+
+        self.submissions = []
+        for i, option in enumerate(self.options):
+            prospect = Prospect.objects.create(email=f'p{i}@example.com', name='Ana', company_name='ACME')
+            submission = SurveySubmission.objects.create(
+                prospect=prospect, survey=self.survey, completed_at=timezone.now()
+            )
+            Response.objects.create(
+                submission=submission, question=self.question,
+                selected_option=option, points_earned=option.points,
+            )
+            ScoreResult.calculate_for_submission(submission)
+            self.submissions.append(submission)
+
+    def distribution(self):
+        distribution = ScoreDistribution.objects.get(survey=self.survey)
+        return distribution.count, distribution.sum_percentage, distribution.histogram
+
+    def test_rescore_matches_a_rebuild(self):
+        Response.objects.filter(submission=self.submissions[0]).update(
+            selected_option=self.options[2], points_earned=10
+        )
+
+        ScoreResult.rescore_submissions([self.submissions[0].id])
+        incremental = self.distribution()
+        ScoreDistribution.rebuild(self.survey.id)
+
+        self.assertEqual(incremental, self.distribution())
+        self.assertEqual(incremental[2], {'5000': 1, '10000': 2})
+
+    def test_batches_over_the_incremental_limit_rebuild(self):
+        submission_ids = [submission.id for submission in self.submissions]
+
+        for limit, rebuilds in ((len(submission_ids), False), (len(submission_ids) - 1, True)):
+            for submission, option in zip(self.submissions, self.options):
+                Response.objects.filter(submission=submission).update(
+                    selected_option=option, points_earned=option.points
+                )
+            ScoreResult.rescore_submissions(submission_ids)
+            self.assertEqual(self.distribution()[2], {'2000': 1, '5000': 1, '10000': 1})
+
+            Response.objects.filter(submission__in=self.submissions).update(
+                selected_option=self.options[1], points_earned=5
+            )
+            with mock.patch('scoring.models.DISTRIBUTION_INCREMENTAL_LIMIT', limit), \
+                    mock.patch.object(ScoreDistribution, 'rebuild', wraps=ScoreDistribution.rebuild) as rebuild:
+                ScoreResult.rescore_submissions(submission_ids)
+
+            self.assertEqual(rebuild.called, rebuilds)
+            self.assertEqual(self.distribution(), (3, 150, {'5000': 3}))
+
+    def test_disabled_submissions_stay_out(self):
+        SurveySubmission.objects.filter(id=self.submissions[1].id).update(status='DISABLED')
+        ScoreDistribution.rebuild(self.survey.id)
+
+        ScoreResult.rescore_submissions([submission.id for submission in self.submissions])
+
+        self.assertEqual(self.distribution()[0], 2)
+
+
+class ScoreJobEnqueueTests(TestCase):
+    """A submission queues one scoring job, when it is completed."""
+
+    def setUp(self):
+        self.survey = Survey.objects.create(title='Diagnóstico', version='1.0', max_score=10)
+        self.prospect = Prospect.objects.create(email='ana@example.com', name='Ana', company_name='ACME')
+
+    def score_jobs(self):
+        return Job.objects.filter(job_type=JobType.SCORE_SUBMISSION)
+
+    def test_later_saves_do_not_queue_another_run(self):
+        submission = SurveySubmission.objects.create(
+            prospect=self.prospect, survey=self.survey, completed_at=timezone.now()
+        )
+        submission.save()
+        submission.status = 'DISABLED'
+        submission.save()
+        submission.status = 'ACTIVE'
+        submission.save()
+
+        self.assertEqual(self.score_jobs().count(), 1)
+        self.assertTrue(self.score_jobs().get().payload['notify'])
+
+    def test_completing_an_existing_submission_queues_a_run(self):
+        submission = SurveySubmission.objects.create(prospect=self.prospect, survey=self.survey)
+        self.assertFalse(self.score_jobs().exists())
+
+        submission = SurveySubmission.objects.get(id=submission.id)
+        submission.completed_at = timezone.now()
+        submission.save()
+
+        self.assertEqual(self.score_jobs().count(), 1)
+        self.assertFalse(self.score_jobs().get().payload['notify'])
+
+
+class MarkSubmissionDirtyTests(TestCase):
+    """Response changes rescore each submission once, when the transaction commits."""
+
+    def test_marks_are_coalesced_into_one_rescore(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for submission_id in (3, 2, 3):
+                mark_submission_dirty(submission_id)
+
+        with mock.patch.object(ScoreResult, 'rescore_submissions', return_value=2) as rescore:
+            for callback in callbacks:
+                callback()
+
+        rescore.assert_called_once_with([2, 3])
+
+    def test_rolled_back_marks_are_dropped(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    mark_submission_dirty(1)
+                    raise RuntimeError('rollback')
+            except RuntimeError:
+                pass
+            mark_submission_dirty(2)
+
+        with mock.patch.object(ScoreResult, 'rescore_submissions', return_value=1) as rescore:
+            for callback in callbacks:
+                callback()
+
+        rescore.assert_called_once_with([2])
+
+
+class BulkScoringTests(TestCase):
+    """The bulk engine gives the same results as scoring one submission at a time."""
+
+    def setUp(self):
+        self.survey = Survey.objects.create(title='Diagnóstico', version='1.0', max_score=30)
+        self.questions = []
+        for order, max_points in ((1, 10), (2, 20)):
+            section = SurveySection.objects.create(
+                survey=self.survey, title=f'Sección {order}', order=order, max_points=max_points
+            )
+            question = Question.objects.create(
+                survey=self.survey, section=section, question_text=f'Pregunta {order}',
+                question_type='SINGLE_CHOICE', order=order, max_points=max_points,
+            )
+            options = [
+                QuestionOption.objects.create(question=question, option_text=str(points), order=i, points=points)
+                for i, points in enumerate((0, max_points // 2, max_points))
+            ]
+            self.questions.append((question, options))
+
+    def create_submission(self, choices):
+        """Completed submission answering question i with option choices[i] (None skips it)."""
+        prospect = Prospect.objects.create(
+            email=f'p{Prospect.objects.count()}@example.com', name='Ana', company_name='ACME'
+        )
+        submission = SurveySubmission.objects.create(
+            prospect=prospect, survey=self.survey, completed_at=timezone.now()
+        )
+        for (question, options), choice in zip(self.questions, choices):
+            if choice is not None:
+                Response.objects.create(
+                    submission=submission, question=question,
+                    selected_option=options[choice], points_earned=options[choice].points,
+                )
+        return submission
+
+    def result_values(self):
+        return {
+            score_result.submission_id: (
+                score_result.total_points, score_result.score_percentage, score_result.risk_level,
+                score_result.primary_package, score_result.secondary_package, score_result.section_scores,
+            )
+            for score_result in ScoreResult.objects.all()
+        }
+
+    def test_bulk_results_match_single_submission_scoring(self):
+        submissions = [
+            self.create_submission(choices)
+            for choices in ((2, 2), (1, 0), (0, 1), (2, None), (None, None))
+        ]
+        for submission in submissions:
+            ScoreResult.calculate_for_submission(submission)
+        expected = self.result_values()
+
+        ScoreResult.objects.update(total_points=0, score_percentage=0, risk_level='CRITICAL', section_scores={})
+        written = ScoreResult.bulk_calculate_for_submissions(
+            self.survey, SurveySubmission.objects.filter(id__in=[submission.id for submission in submissions])
+        )
+
+        self.assertEqual(written, len(submissions))
+        self.assertEqual(self.result_values(), expected)
+
+        ScoreResult.rescore_submissions([submission.id for submission in submissions])
+        self.assertEqual(self.result_values(), expected)
+
+    def test_responses_are_read_in_one_aggregate_query(self):
+        def rescore(count):
+            submissions = [self.create_submission((1, 2)) for _ in range(count)]
+            ids = [submission.id for submission in submissions]
+            with CaptureQueriesContext(connection) as queries:
+                ScoreResult.bulk_calculate_for_submissions(self.survey, SurveySubmission.objects.filter(id__in=ids))
+            response_queries = [query for query in queries if 'FROM "surveys_response"' in query['sql']]
+            return len(queries), len(response_queries)
+
+        # The first run creates the risk configuration and analytics rows
+        rescore(1)
+        few = rescore(2)
+        many = rescore(8)
+
+        self.assertEqual(few, many)
+        self.assertEqual(many[1], 1)
+
+
+class ScoreRollupTests(TestCase):
+    """Rollup statistics equal a direct aggregate over the scores of active submissions."""
+
+    def setUp(self):
+        self.survey = Survey.objects.create(title='Diagnóstico', version='1.0', max_score=100)
+        self.score_results = [self.create_score_result(percentage, risk_level) for percentage, risk_level in (
+            (15, 'CRITICAL'), (35, 'HIGH'), (38, 'HIGH'), (72, 'GOOD'),
+        )]
+
+    def create_score_result(self, percentage, risk_level):
+        prospect = Prospect.objects.create(
+            email=f'p{Prospect.objects.count()}@example.com', name='Ana', company_name='ACME'
+        )
+        submission = SurveySubmission.objects.create(prospect=prospect, survey=self.survey)
+        return ScoreResult.objects.create(
+            submission=submission, total_points=percentage, score_percentage=percentage,
+            risk_level=risk_level, primary_package='PROTECCION_ESENCIAL',
+        )
+
+    def assertRollupsMatchScores(self):
+        active = ScoreResult.objects.filter(submission__status='ACTIVE')
+        summary = ScoreRollup.summarize(survey_id=self.survey.id)
+
+        self.assertEqual(summary['total'], active.count())
+        self.assertAlmostEqual(
+            float(summary['avg_score']), float(active.aggregate(avg=Avg('score_percentage'))['avg'] or 0), places=2
+        )
+        self.assertEqual(
+            {item['risk_level']: item['count'] for item in summary['risk_distribution']},
+            dict(active.values_list('risk_level').annotate(count=Count('id')).order_by()),
+        )
+
+    def test_created_scores(self):
+        self.assertRollupsMatchScores()
+
+    def test_edited_score_moves_between_risk_levels(self):
+        score_result = self.score_results[1]
+        score_result.score_percentage = 85
+        score_result.risk_level = 'EXCELLENT'
+        score_result.save()
+
+        self.assertRollupsMatchScores()
+
+    def test_deleted_score(self):
+        self.score_results[2].delete()
+
+        self.assertRollupsMatchScores()
+
+    def test_disabled_submission_leaves_the_statistics(self):
+        submission = self.score_results[0].submission
+        submission.status = 'DISABLED'
+        submission.save()
+
+        self.assertRollupsMatchScores()
+        self.assertEqual(ScoreRollup.summarize()['total'], 3)
+
+
+class ScoreDistributionTests(TestCase):
+    """Rank and percentile read from the histogram equal a brute-force count over active scores."""
+
+    def setUp(self):
+        self.survey = Survey.objects.create(title='Diagnóstico', version='1.0', max_score=100)
+        self.score_results = [
+            self.create_score_result(percentage) for percentage in (20, 45.5, 45.5, 45.5, 60, 88.25, 88.25)
+        ]
+
+    def create_score_result(self, percentage):
+        prospect = Prospect.objects.create(
+            email=f'p{Prospect.objects.count()}@example.com', name='Ana', company_name='ACME'
+        )
+        submission = SurveySubmission.objects.create(prospect=prospect, survey=self.survey)
+        return ScoreResult.objects.create(
+            submission=submission, total_points=percentage, score_percentage=percentage,
+            risk_level='MODERATE', primary_package='PROTECCION_ESENCIAL',
+        )
+
+    def brute_force_standing(self, score_result):
+        active = [
+            result.score_percentage for result in
+            ScoreResult.objects.filter(submission__survey=self.survey, submission__status='ACTIVE')
+        ]
+        rank = sum(1 for percentage in active if percentage < score_result.score_percentage)
+        others = len(active) - 1 if score_result.submission.status == 'ACTIVE' else len(active)
+        return {
+            'rank': rank,
+            'percentile': round(rank / others * 100) if others > 0 else None,
+            'total_count': len(active),
+            'min_score': min(active),
+            'max_score': max(active),
+        }
+
+    def assertStandingsMatch(self):
+        for score_result in ScoreResult.objects.filter(submission__survey=self.survey).select_related('submission'):
+            standing = score_result.get_survey_standing()
+            expected = self.brute_force_standing(score_result)
+            self.assertEqual(
+                {key: standing[key] for key in expected}, expected,
+                msg=f'score {score_result.score_percentage}'
+            )
+
+    def test_ties_share_rank_and_percentile(self):
+        self.assertStandingsMatch()
+
+        tied = [self.score_results[i].get_survey_standing() for i in (1, 2, 3)]
+        self.assertEqual({standing['rank'] for standing in tied}, {1})
+        self.assertEqual({standing['percentile'] for standing in tied}, {17})
+
+    def test_edited_score(self):
+        score_result = self.score_results[0]
+        score_result.score_percentage = 88.25
+        score_result.save()
+
+        self.assertStandingsMatch()
+
+    def test_deleted_score_and_submission(self):
+        self.score_results[2].delete()
+        self.score_results[5].submission.delete()
+
+        self.assertStandingsMatch()
+        self.assertEqual(ScoreDistribution.objects.get(survey=self.survey).count, 5)
+
+    def test_disabled_submission_is_ranked_against_active_scores(self):
+        submission = self.score_results[4].submission
+        submission.status = 'DISABLED'
+        submission.save()
+
+        self.assertStandingsMatch()
+        self.assertEqual(self.score_results[4].get_survey_standing()['percentile'], 67)
+
+        submission.status = 'ACTIVE'
+        submission.save()
 
-# Create your tests here.
+        self.assertStandingsMatch()
@@ -0,0 +1,48 @@
+/**
+ * Progress of a background bulk PDF export: polls the status endpoint
+ * until the ZIP is ready and then shows the download link
+ */
+
+(function() {
+    const POLL_INTERVAL = 2000;
+
+    const container = document.getElementById('bulkExport');
+    if (!container) return;
+
+    const statusUrl = container.getAttribute('data-status-url');
+    const progressBar = document.getElementById('bulkExportProgress');
+    const message = document.getElementById('bulkExportMessage');
+    const downloadLink = document.getElementById('bulkExportDownload');
+
+    function showProgress(data) {
+        progressBar.style.width = data.progress + '%';
+        progressBar.setAttribute('aria-valuenow', data.progress);
+        progressBar.textContent = data.processed + '/' + data.total;
+    }
+
+    async function poll() {
+        try {
+            const response = await fetch(statusUrl, {headers: {'X-Requested-With': 'XMLHttpRequest'}});
+            const data = await response.json();
+            showProgress(data);
+
+            if (data.status === 'DONE') {
+                const generated = data.total - data.failed;
+                message.textContent = `Exportación lista: ${generated} de ${data.total} reportes generados.`;
+                downloadLink.href = data.download_url;
+                downloadLink.classList.remove('d-none');
+                return;
+            }
+            if (data.status === 'FAILED') {
+                message.textContent = 'La exportación falló. Por favor intente nuevamente.';
+                progressBar.classList.add('bg-danger');
+                return;
+            }
+        } catch (error) {
+            console.error('Error consultando la exportación:', error);
+        }
+        setTimeout(poll, POLL_INTERVAL);
+    }
+
+    poll();
+})();
@@ -269,12 +269,18 @@ class RiskConfigManager {
 window.scgScoring = new ScgScoring();
 
 // Global functions for templates
-window.exportScores = function() {
+window.exportScores = function(format = 'csv') {
     const form = document.getElementById('filterForm');
     if (!form) return;
     
     const formData = new FormData(form);
     const params = new URLSearchParams(formData);
+    params.set('format', format);
+    
+    const sectionsCheckbox = document.getElementById('exportSections');
+    if (sectionsCheckbox && sectionsCheckbox.checked) {
+        params.set('sections', '1');
+    }
     
     const exportUrlElement = document.querySelector('[data-export-url]');
     const exportUrl = exportUrlElement ? exportUrlElement.getAttribute('data-export-url') : '/admin-panel/scores/export/';
@@ -282,6 +288,20 @@ window.exportScores = function() {
     window.location.href = exportUrl + '?' + params.toString();
 };
 
+window.exportReports = function() {
+    const form = document.getElementById('filterForm');
+    if (!form) return;
+    
+    // The bulk export filters by survey and risk level
+    const formData = new FormData(form);
+    const params = new URLSearchParams();
+    if (formData.get('survey')) params.set('survey_id', formData.get('survey'));
+    if (formData.get('risk_level')) params.set('risk_level', formData.get('risk_level'));
+    
+    const reportsUrl = document.querySelector('[data-reports-url]').getAttribute('data-reports-url');
+    window.location.href = reportsUrl + '?' + params.toString();
+};
+
 window.recalculateScore = function(surveyId, prospectName) {
     if (confirm(`¿Recalcular el score para ${prospectName}?`)) {
         window.scgScoring.recalculateScores(surveyId, false);
@@ -30,6 +30,24 @@ function getCSRFToken() {
     return cookieValue;
 }
 
+// Get a CSRF token, asking Django for one when the page came from the page cache
+// (cached pages do not embed the token)
+function ensureCSRFToken() {
+    const token = getCSRFToken();
+    if (token) {
+        return Promise.resolve(token);
+    }
+    
+    const csrfUrl = document.querySelector('meta[name="csrf-url"]');
+    if (!csrfUrl) {
+        return Promise.resolve(null);
+    }
+    
+    return fetch(csrfUrl.getAttribute('content'), {credentials: 'same-origin'})
+        .then(response => response.json())
+        .then(data => data.token);
+}
+
 // Scroll to any section smoothly
 function scrollToSection(sectionId) {
     document.getElementById(sectionId).scrollIntoView({
@@ -65,14 +83,15 @@ function handleFormSubmission(event) {
     submitBtn.style.transform = 'scale(0.98)';
     
     // Send AJAX request to Django
-    fetch(form.action, {
+    ensureCSRFToken()
+    .then(csrfToken => fetch(form.action, {
         method: 'POST',
         body: formData,
         headers: {
-            'X-CSRFToken': getCSRFToken(),
+            'X-CSRFToken': csrfToken,
             'X-Requested-With': 'XMLHttpRequest',
         },
-    })
+    }))
     .then(response => {
         if (!response.ok) {
             return response.json().then(data => Promise.reject(data));
@@ -8,8 +8,8 @@ class SCGSurvey {
         this.totalGroups = document.querySelectorAll('.question-group').length;
         this.totalQuestions = parseInt(document.querySelector('.total-questions').textContent.split(' ')[0]);
         this.responses = {};
+        this.submission = null;
         this.surveyCode = this.getSurveyCode();
-        this.csrfToken = this.getCSRFToken();
         this.exclusiveOptions = this.getExclusiveOptions();
         
         this.init();
@@ -25,9 +25,34 @@ class SCGSurvey {
         return pathParts[pathParts.indexOf('survey') + 1];
     }
 
-    getCSRFToken() {
-        const csrfMeta = document.querySelector('meta[name="csrf-token"]');
-        return csrfMeta ? csrfMeta.getAttribute('content') : '';
+    async getCSRFToken() {
+        // La página se sirve cacheada y no incluye el token: usar la cookie
+        // csrftoken o pedir un token a Django
+        const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        if (match) {
+            return decodeURIComponent(match[1]);
+        }
+        
+        const csrfUrl = document.querySelector('meta[name="csrf-url"]');
+        if (!csrfUrl) {
+            return '';
+        }
+        const response = await fetch(csrfUrl.getAttribute('content'), {credentials: 'same-origin'});
+        const data = await response.json();
+        return data.token;
+    }
+
+    getSubmissionKey(body) {
+        // Una clave por contenido enviado: los reintentos del mismo envío
+        // (doble click, red móvil) reutilizan la clave y el servidor
+        // devuelve la respuesta original en lugar de crear otro envío
+        if (!this.submission || this.submission.body !== body) {
+            const bytes = new Uint8Array(16);
+            crypto.getRandomValues(bytes);
+            const key = Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+            this.submission = {key: key, body: body};
+        }
+        return this.submission.key;
     }
 
     getExclusiveOptions() {
@@ -388,15 +413,18 @@ class SCGSurvey {
         submitBtn.appendChild(document.createTextNode('Enviando...'));
         submitBtn.disabled = true;
 
+        const body = JSON.stringify(submitData);
+
         try {
             const response = await fetch(`/survey/${this.surveyCode}/submit/`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
-                    'X-CSRFToken': this.csrfToken,
+                    'X-CSRFToken': await this.getCSRFToken(),
                     'X-Requested-With': 'XMLHttpRequest',
+                    'Idempotency-Key': this.getSubmissionKey(body),
                 },
-                body: JSON.stringify(submitData)
+                body: body
             });
 
             const result = await response.json();
@@ -4,8 +4,10 @@ Admin configuration for Surveys app.
 from django.contrib import admin
 from .models import (
     Survey, SurveySection, Question, QuestionOption,
-    SurveySubmission, Response
+    SurveySubmission, Response, SubmissionIdempotencyKey
 )
+from scoring.models import ScoreRollup, ScoreDistribution
+from .featured import FeaturedSurveyCache
 
 # surveys/admin.py - Actualizar SurveyAdmin
 
@@ -69,6 +71,7 @@ class SurveyAdmin(admin.ModelAdmin):
         
         survey = queryset.first()
         # El método save() del modelo se encarga de desmarcar los demás
+        # y de invalidar el featured cacheado del landing
         survey.is_featured = True
         survey.save()
         
@@ -78,6 +81,8 @@ class SurveyAdmin(admin.ModelAdmin):
     def unmark_as_featured(self, request, queryset):
         """Remove featured status from selected surveys."""
         count = queryset.update(is_featured=False)
+        # update() no pasa por save(): invalidar el featured cacheado del landing
+        FeaturedSurveyCache.invalidate()
         self.message_user(request, f'{count} surveys ya no están marcados como featured.')
     unmark_as_featured.short_description = 'Remove featured status'
     
@@ -183,11 +188,17 @@ class SurveySubmissionAdmin(admin.ModelAdmin):
     
     def disable_submissions(self, request, queryset):
         count = queryset.update(status='DISABLED')
+        # update() does not send post_save, refresh the score analytics explicitly
+        ScoreRollup.refresh_for_submissions(queryset)
+        ScoreDistribution.rebuild_for_submissions(queryset)
         self.message_user(request, f'{count} submissions disabled.')
     disable_submissions.short_description = 'Disable selected submissions'
     
     def enable_submissions(self, request, queryset):
         count = queryset.update(status='ACTIVE')
+        # update() does not send post_save, refresh the score analytics explicitly
+        ScoreRollup.refresh_for_submissions(queryset)
+        ScoreDistribution.rebuild_for_submissions(queryset)
         self.message_user(request, f'{count} submissions enabled.')
     enable_submissions.short_description = 'Enable selected submissions'
 
@@ -220,12 +231,24 @@ class ResponseAdmin(admin.ModelAdmin):
         return False
 
 
+class SubmissionIdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'survey', 'submission', 'response_status', 'created_at']
+    list_filter = ['survey', 'response_status']
+    search_fields = ['key', 'submission__prospect__email']
+    ordering = ['-created_at']
+    readonly_fields = ['key', 'survey', 'request_hash', 'submission', 'response_status', 'response_body', 'created_at']
+    
+    def has_add_permission(self, request):
+        return False
+
+
 # Register all models
 admin.site.register(Survey, SurveyAdmin)
 admin.site.register(SurveySection, SurveySectionAdmin)
 admin.site.register(Question, QuestionAdmin)
 admin.site.register(SurveySubmission, SurveySubmissionAdmin)
 admin.site.register(Response, ResponseAdmin)
+admin.site.register(SubmissionIdempotencyKey, SubmissionIdempotencyKeyAdmin)
 
 # Customize admin site headers
 admin.site.site_header = 'SCG Presales Administration'
@@ -0,0 +1,257 @@
+"""
+Compiled survey definitions.
+
+A survey definition (sections, active questions, active options, points and
+exclusivity flags) only changes when an admin edits the survey, but it is
+read on every survey page view and every submission. It is compiled once
+into immutable objects keyed by survey code and `updated_at`, kept in a
+small per-process LRU and shared between processes through the Django cache.
+
+Edits to a survey, section, question or option bump the survey `updated_at`
+and drop the cached version (see surveys/signals.py).
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+
+
+DEFINITION_CACHE_TIMEOUT = 60 * 60 * 24
+# Short TTL so processes without a shared cache backend still converge
+VERSION_CACHE_TIMEOUT = 60
+LOCAL_CACHE_SIZE = 32
+
+
+@dataclass(frozen=True)
+class SectionDefinition:
+    """Compiled survey section."""
+    id: int
+    title: str
+    order: int
+    max_points: int
+
+
+@dataclass(frozen=True)
+class OptionDefinition:
+    """Compiled active answer option."""
+    id: int
+    option_text: str
+    order: int
+    points: int
+    is_exclusive: bool
+
+
+@dataclass(frozen=True)
+class QuestionDefinition:
+    """Compiled active question with its active options."""
+    id: int
+    question_text: str
+    question_type: str
+    order: int
+    is_required: bool
+    max_points: int
+    help_text: str
+    section: SectionDefinition
+    options: tuple
+
+    def get_option(self, option_id):
+        """Active option by id, or None."""
+        for option in self.options:
+            if option.id == option_id:
+                return option
+        return None
+
+
+@dataclass(frozen=True)
+class SurveyDefinition:
+    """Compiled survey, immutable and safe to share between requests."""
+    id: int
+    code: str
+    title: str
+    description: str
+    version: str
+    is_active: bool
+    max_score: int
+    updated_at: object
+    sections: tuple
+    questions: tuple
+    question_groups: tuple
+    _questions_by_id: dict = field(default_factory=dict, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(
+            self, '_questions_by_id', {question.id: question for question in self.questions}
+        )
+
+    @property
+    def total_questions(self):
+        return len(self.questions)
+
+    def get_question(self, question_id):
+        """Active question by id, or None."""
+        return self._questions_by_id.get(question_id)
+
+
+def group_questions(questions):
+    """
+    Organizar preguntas en grupos para el SPA (dinámico).
+
+    - 5 o menos preguntas: un solo grupo
+    - 6-10 preguntas: 2 grupos
+    - Más de 10: 3 grupos, distribuidos lo más equitativamente posible
+    """
+    questions = list(questions)
+    total_questions = len(questions)
+
+    if total_questions <= 5:
+        return (tuple(questions),)
+
+    if total_questions <= 10:
+        mid = total_questions // 2
+        return (tuple(questions[:mid]), tuple(questions[mid:]))
+
+    group_size = total_questions // 3
+    remainder = total_questions % 3
+
+    sizes = [group_size] * 3
+    for i in range(remainder):
+        sizes[i] += 1
+
+    start = 0
+    groups = []
+    for size in sizes:
+        groups.append(tuple(questions[start:start + size]))
+        start += size
+    return tuple(groups)
+
+
+def compile_survey(survey):
+    """Build the immutable definition of a survey (3 queries)."""
+    sections = {
+        section.id: SectionDefinition(
+            id=section.id,
+            title=section.title,
+            order=section.order,
+            max_points=section.max_points,
+        )
+        for section in survey.sections.all()
+    }
+
+    questions = tuple(
+        QuestionDefinition(
+            id=question.id,
+            question_text=question.question_text,
+            question_type=question.question_type,
+            order=question.order,
+            is_required=question.is_required,
+            max_points=question.max_points,
+            help_text=question.help_text or '',
+            section=sections[question.section_id],
+            options=tuple(
+                OptionDefinition(
+                    id=option.id,
+                    option_text=option.option_text,
+                    order=option.order,
+                    points=option.points,
+                    is_exclusive=option.is_exclusive,
+                )
+                for option in question.options.all()
+                if option.is_active
+            ),
+        )
+        for question in survey.get_active_questions().prefetch_related('options')
+    )
+
+    return SurveyDefinition(
+        id=survey.id,
+        code=survey.code,
+        title=survey.title,
+        description=survey.description or '',
+        version=survey.version,
+        is_active=survey.is_active,
+        max_score=survey.max_score,
+        updated_at=survey.updated_at,
+        sections=tuple(sorted(sections.values(), key=lambda section: section.order)),
+        questions=questions,
+        question_groups=group_questions(questions),
+    )
+
+
+class SurveyDefinitionCache:
+    """Per-process LRU of compiled definitions, backed by the Django cache."""
+
+    _local = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _version_key(code):
+        return f'survey_definition:version:{code}'
+
+    @staticmethod
+    def _definition_key(code, version):
+        return f'survey_definition:{code}:{version}'
+
+    @classmethod
+    def get(cls, code):
+        """
+        Compiled definition of the survey with this code.
+
+        Returns:
+            SurveyDefinition or None if the survey does not exist
+        """
+        version = cls._get_version(code)
+        if version is None:
+            return None
+
+        local_key = (code, version)
+        with cls._lock:
+            definition = cls._local.get(local_key)
+            if definition is not None:
+                cls._local.move_to_end(local_key)
+                return definition
+
+        definition = cache.get(cls._definition_key(code, version))
+        if definition is None:
+            from .models import Survey
+
+            survey = Survey.objects.filter(code=code).first()
+            if survey is None:
+                return None
+            definition = compile_survey(survey)
+            cache.set(cls._definition_key(code, version), definition, DEFINITION_CACHE_TIMEOUT)
+
+        with cls._lock:
+            cls._local[local_key] = definition
+            cls._local.move_to_end(local_key)
+            while len(cls._local) > LOCAL_CACHE_SIZE:
+                cls._local.popitem(last=False)
+
+        return definition
+
+    @classmethod
+    def invalidate(cls, code):
+        """Forget the cached version of a survey; the next read recompiles it."""
+        cache.delete(cls._version_key(code))
+        with cls._lock:
+            for local_key in [key for key in cls._local if key[0] == code]:
+                del cls._local[local_key]
+
+    @classmethod
+    def get_version(cls, code):
+        """Version token of a survey definition (changes on every edit), or None."""
+        return cls._get_version(code)
+
+    @classmethod
+    def _get_version(cls, code):
+        """Current version token (survey updated_at) for a code, or None."""
+        version = cache.get(cls._version_key(code))
+        if version is None:
+            from .models import Survey
+
+            updated_at = Survey.objects.filter(code=code).values_list('updated_at', flat=True).first()
+            if updated_at is None:
+                return None
+            version = updated_at.isoformat()
+            cache.set(cls._version_key(code), version, VERSION_CACHE_TIMEOUT)
+        return version
@@ -0,0 +1,88 @@
+"""
+Featured survey lookup for the landing page.
+
+Resolving the featured survey takes up to two queries (the featured survey,
+then the most recent active one) and runs on every landing page view. The
+result is kept in the shared cache and memoized per process for a few
+seconds. Survey.save() and the featured admin actions invalidate it, along
+with the cached landing page.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from core.cache import get_or_compute, invalidate_namespace
+
+
+FEATURED_CACHE_NAMESPACE = 'featured_survey'
+FEATURED_CACHE_TIMEOUT = 60 * 60
+# Short TTL: other processes see an invalidation within this many seconds
+LOCAL_CACHE_TIMEOUT = 10
+
+LANDING_PAGE_NAMESPACE = 'landing_page'
+
+
+@dataclass(frozen=True)
+class FeaturedSurvey:
+    """What the landing page shows of the featured survey."""
+    id: int
+    code: str
+    title: str
+
+
+def resolve_featured_survey():
+    """Featured survey from the database, or None if no survey is active."""
+    from .models import Survey
+
+    survey = Survey.get_featured_survey()
+    if survey is None:
+        return None
+    return FeaturedSurvey(id=survey.id, code=survey.code, title=survey.title)
+
+
+class FeaturedSurveyCache:
+    """Per-process memo of the featured survey, backed by the shared cache."""
+
+    _local = None  # (FeaturedSurvey or None, expires_at)
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        """
+        Featured survey for the landing page.
+
+        Returns:
+            FeaturedSurvey or None if no survey is active
+        """
+        with cls._lock:
+            if cls._local is not None and cls._local[1] > time.monotonic():
+                return cls._local[0]
+
+        featured = get_or_compute(
+            FEATURED_CACHE_NAMESPACE, ('landing',), resolve_featured_survey, FEATURED_CACHE_TIMEOUT
+        )
+
+        with cls._lock:
+            cls._local = (featured, time.monotonic() + LOCAL_CACHE_TIMEOUT)
+        return featured
+
+    @classmethod
+    def clear_local(cls):
+        """Forget this process' memo."""
+        with cls._lock:
+            cls._local = None
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Drop the cached featured survey and landing page once the current
+        transaction commits, so no process caches the old state again.
+        """
+        def invalidate_now():
+            cls.clear_local()
+            invalidate_namespace(FEATURED_CACHE_NAMESPACE)
+            invalidate_namespace(LANDING_PAGE_NAMESPACE)
+
+        transaction.on_commit(invalidate_now)
@@ -0,0 +1,120 @@
+"""
+Idempotent survey submissions.
+
+survey.js generates a key once per page load and sends it as the
+`Idempotency-Key` header with every attempt of the same submission. The
+view claims the key inside the transaction that creates the submission:
+
+- First request: the key row is inserted and, once the submission is
+  processed, completed with the JSON response, all in one commit.
+- Concurrent duplicate: its insert waits on the unique index until the
+  first transaction commits, then fails and the stored response is
+  replayed. If the first transaction rolls back, the duplicate proceeds
+  as the first request.
+- Later retries within the window replay the stored response; after the
+  window the key is forgotten and can be used again. Retries of a
+  completed submission are replayed before the rate limits are checked,
+  so they do not spend the budget of the client.
+
+A key sent with a different payload is rejected, so a client bug cannot
+silently swallow a real submission.
+"""
+import hashlib
+import json
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import SubmissionIdempotencyKey
+
+
+DEFAULT_SUBMISSION_IDEMPOTENCY_SETTINGS = {
+    'WINDOW': 24 * 60 * 60,  # Seconds a key replays its response
+}
+
+KEY_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+class IdempotencyKeyError(ValueError):
+    """The key is malformed or was already used with a different payload."""
+
+
+def get_idempotency_setting(name):
+    """Read a SUBMISSION_IDEMPOTENCY setting with its default."""
+    return getattr(settings, 'SUBMISSION_IDEMPOTENCY', {}).get(
+        name, DEFAULT_SUBMISSION_IDEMPOTENCY_SETTINGS[name]
+    )
+
+
+def get_idempotency_key(request):
+    """
+    Idempotency key of the request, or None if the client sent none.
+
+    Raises:
+        IdempotencyKeyError: if the key is malformed
+    """
+    key = request.headers.get('Idempotency-Key', '').strip()
+    if not key:
+        return None
+    if not KEY_RE.match(key):
+        raise IdempotencyKeyError('Clave de envío inválida')
+    return key
+
+
+def request_fingerprint(code, data):
+    """SHA-256 of the survey code and the canonical JSON payload."""
+    payload = json.dumps({'code': code, 'data': data}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def completed_key(key, request_hash):
+    """
+    Completed key of an earlier request with the same payload, or None.
+
+    Looked up before the rate limits, so it only replays finished
+    submissions; anything else goes through claim_key().
+    """
+    window_start = timezone.now() - timedelta(seconds=get_idempotency_setting('WINDOW'))
+    record = SubmissionIdempotencyKey.objects.filter(
+        key=key, created_at__gte=window_start, response_status__isnull=False
+    ).first()
+    if record is None or record.request_hash != request_hash:
+        return None
+    return record
+
+
+def claim_key(key, survey_id, request_hash):
+    """
+    Claim a key for this request; must run inside the submission transaction.
+
+    Returns:
+        (SubmissionIdempotencyKey, claimed): claimed is False when another
+        request already used the key, whose stored response must be replayed
+
+    Raises:
+        IdempotencyKeyError: if the key was used with a different payload
+    """
+    window_start = timezone.now() - timedelta(seconds=get_idempotency_setting('WINDOW'))
+    SubmissionIdempotencyKey.objects.filter(key=key, created_at__lt=window_start).delete()
+
+    try:
+        with transaction.atomic():
+            record = SubmissionIdempotencyKey.objects.create(
+                key=key, survey_id=survey_id, request_hash=request_hash
+            )
+        return record, True
+    except IntegrityError:
+        record = SubmissionIdempotencyKey.objects.get(key=key)
+
+    if record.request_hash != request_hash:
+        raise IdempotencyKeyError('La clave de envío ya se usó con otros datos')
+    return record, False
+
+
+def purge_expired():
+    """Delete keys older than the replay window."""
+    window_start = timezone.now() - timedelta(seconds=get_idempotency_setting('WINDOW'))
+    return SubmissionIdempotencyKey.objects.filter(created_at__lt=window_start).delete()[0]
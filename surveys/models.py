@@ -89,6 +89,10 @@ class Survey(models.Model):
             Survey.objects.filter(is_featured=True).exclude(pk=self.pk).update(is_featured=False)
             
         super().save(*args, **kwargs)
+        
+        # El landing page muestra el survey featured (o el activo más reciente)
+        from .featured import FeaturedSurveyCache
+        FeaturedSurveyCache.invalidate()
     
     @classmethod
     def generate_code(cls):
@@ -434,4 +438,62 @@ class Response(models.Model):
             
             self.points_earned = total_points
             self.save(update_fields=['points_earned'])
-            return total_points
\ No newline at end of file
+            return total_points
+
+class SubmissionIdempotencyKey(models.Model):
+    """
+    Client-generated key of a survey submission and the response it got.
+
+    The key is claimed in the same transaction that creates the submission,
+    so a duplicate request (double click, mobile retry, proxy replay) waits
+    on the unique index until the first one commits and then replays the
+    stored response instead of creating a second submission, scoring run,
+    PDF and email. See surveys/idempotency.py.
+    """
+    key = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="Idempotency key sent by the client"
+    )
+    
+    survey = models.ForeignKey(
+        Survey,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys'
+    )
+    
+    request_hash = models.CharField(
+        max_length=64,
+        help_text="SHA-256 of the submitted payload; a key cannot be reused for other data"
+    )
+    
+    submission = models.ForeignKey(
+        SurveySubmission,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='idempotency_keys'
+    )
+    
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = 'Submission Idempotency Key'
+        verbose_name_plural = 'Submission Idempotency Keys'
+    
+    def __str__(self):
+        return f"{self.key} ({self.response_status or 'pending'})"
+    
+    @property
+    def is_complete(self):
+        return self.response_status is not None
+    
+    def complete(self, submission, status, body):
+        """Store the response replayed to later requests with this key."""
+        self.submission = submission
+        self.response_status = status
+        self.response_body = body
+        self.save(update_fields=['submission', 'response_status', 'response_body'])
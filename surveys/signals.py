@@ -0,0 +1,53 @@
+"""
+Django signals for the surveys app.
+
+Keeps compiled survey definitions (surveys/definitions.py) in sync with
+admin edits to surveys, sections, questions and options, and drops the
+cached featured survey (surveys/featured.py) when a survey is deleted.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .definitions import SurveyDefinitionCache
+from .featured import FeaturedSurveyCache
+from .models import Survey, SurveySection, Question, QuestionOption
+
+
+def touch_survey(survey_id):
+    """Bump the survey updated_at (the definition version) and drop its cached definition."""
+    Survey.objects.filter(pk=survey_id).update(updated_at=timezone.now())
+    code = Survey.objects.filter(pk=survey_id).values_list('code', flat=True).first()
+    if code:
+        SurveyDefinitionCache.invalidate(code)
+
+
+@receiver(post_save, sender=Survey)
+@receiver(post_delete, sender=Survey)
+def invalidate_survey_definition(sender, instance, **kwargs):
+    """Survey fields changed; updated_at was already bumped by save()."""
+    SurveyDefinitionCache.invalidate(instance.code)
+
+
+@receiver(post_delete, sender=Survey)
+def invalidate_featured_survey(sender, instance, **kwargs):
+    """A deleted survey may be the one shown on the landing page."""
+    FeaturedSurveyCache.invalidate()
+
+
+@receiver(post_save, sender=SurveySection)
+@receiver(post_delete, sender=SurveySection)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_survey_definition_on_change(sender, instance, **kwargs):
+    """A section or question of the survey changed."""
+    touch_survey(instance.survey_id)
+
+
+@receiver(post_save, sender=QuestionOption)
+@receiver(post_delete, sender=QuestionOption)
+def invalidate_survey_definition_on_option_change(sender, instance, **kwargs):
+    """An option of one of the survey questions changed."""
+    survey_id = Question.objects.filter(pk=instance.question_id).values_list('survey_id', flat=True).first()
+    if survey_id:
+        touch_survey(survey_id)
@@ -1,3 +1,305 @@
-from django.test import TestCase
+import json
+import threading
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.models import ThrottledSource
+from core.ratelimit import reset_limit
+
+from .definitions import SurveyDefinitionCache
+from .models import Survey, SurveySection, Question, QuestionOption, SurveySubmission, SubmissionIdempotencyKey
+
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'survey-tests'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SurveyPageCacheTests(TestCase):
+    """Public survey pages served from the page cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.survey = Survey.objects.create(title='Diagnóstico', version='1.0')
+        section = SurveySection.objects.create(survey=cls.survey, title='Gobierno', order=1, max_points=10)
+        cls.question = Question.objects.create(
+            survey=cls.survey, section=section, question_text='¿Tiene un plan de respuesta?',
+            question_type='SINGLE_CHOICE', order=1, max_points=10,
+        )
+        QuestionOption.objects.create(question=cls.question, option_text='Sí', order=1, points=10)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('surveys:survey_detail', kwargs={'code': self.survey.code})
+
+    def test_cached_page_does_no_queries(self):
+        self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+
+        self.assertContains(response, '¿Tiene un plan de respuesta?')
+        self.assertNotContains(response, 'csrf-token')
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(etag.startswith('W/'))
+
+    def test_editing_the_survey_serves_a_new_page(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.question.question_text = '¿Tiene un plan de continuidad?'
+        self.question.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '¿Tiene un plan de continuidad?')
+
+    def test_unknown_survey_is_not_found(self):
+        response = self.client.get(reverse('surveys:survey_detail', kwargs={'code': '19990101000000'}))
+
+        self.assertEqual(response.status_code, 404)
+
+
+def create_survey():
+    """Active survey with one single choice question; returns (survey, question, option)."""
+    survey = Survey.objects.create(title='Diagnóstico', version='1.0')
+    section = SurveySection.objects.create(survey=survey, title='Gobierno', order=1, max_points=10)
+    question = Question.objects.create(
+        survey=survey, section=section, question_text='¿Tiene un plan de respuesta?',
+        question_type='SINGLE_CHOICE', order=1, max_points=10,
+    )
+    option = QuestionOption.objects.create(question=question, option_text='Sí', order=1, points=10)
+    return survey, question, option
+
+
+def submission_payload(question, option, email='ciso@example.com'):
+    return json.dumps({
+        'responses': {str(question.id): {'option_id': option.id}},
+        'prospect': {'nombre': 'Ana Mora', 'empresa': 'ACME', 'email': email},
+    })
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IdempotentSubmissionTests(TestCase):
+    """Replays of a submission with the same Idempotency-Key."""
+
+    def setUp(self):
+        cache.clear()
+        self.survey, self.question, self.option = create_survey()
+        self.url = reverse('surveys:survey_submit', kwargs={'code': self.survey.code})
+
+    def submit(self, key, payload=None):
+        return self.client.post(
+            self.url, payload or submission_payload(self.question, self.option),
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.submit('a' * 32)
+        second = self.submit('a' * 32)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(SurveySubmission.objects.count(), 1)
+
+    def test_key_reused_with_other_data_is_rejected(self):
+        self.submit('b' * 32)
+
+        response = self.submit('b' * 32, submission_payload(self.question, self.option, 'otro@example.com'))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(SurveySubmission.objects.count(), 1)
+
+    def test_failed_submission_releases_the_key(self):
+        payload = json.dumps({'responses': {}, 'prospect': {}})
+        self.assertEqual(self.submit('c' * 32, payload).status_code, 400)
+
+        self.assertFalse(SubmissionIdempotencyKey.objects.exists())
+
+    def test_submissions_without_key_are_not_deduplicated(self):
+        payload = submission_payload(self.question, self.option)
+        self.client.post(self.url, payload, content_type='application/json')
+        self.client.post(self.url, payload, content_type='application/json')
+
+        self.assertEqual(SurveySubmission.objects.count(), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMITS={'ENABLED': False})
+class ConcurrentSubmissionTests(TransactionTestCase):
+    """Parallel identical submits create a single submission."""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('The in-memory SQLite test database fails concurrent writers instead of making them wait')
+
+    def test_parallel_identical_submits(self):
+        cache.clear()
+        survey, question, option = create_survey()
+        url = reverse('surveys:survey_submit', kwargs={'code': survey.code})
+        payload = submission_payload(question, option)
+
+        attempts = 6
+        barrier = threading.Barrier(attempts)
+        responses = []
+
+        def submit():
+            try:
+                barrier.wait()
+                response = Client().post(
+                    url, payload, content_type='application/json', HTTP_IDEMPOTENCY_KEY='d' * 32
+                )
+                responses.append((response.status_code, response.json()))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit) for _ in range(attempts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(SurveySubmission.objects.count(), 1)
+        self.assertEqual(SubmissionIdempotencyKey.objects.get().submission, SurveySubmission.objects.get())
+        self.assertEqual(len(responses), attempts)
+        self.assertEqual({status for status, body in responses}, {200})
+        self.assertEqual(len({json.dumps(body, sort_keys=True) for status, body in responses}), 1)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    RATE_LIMITS={'PROXY_COUNT': 1, 'RULES': {'survey_submit': {'ip': '3/h', 'email': '2/h'}}},
+)
+class SubmissionRateLimitTests(TestCase):
+    """Rate limits on the public submit endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.survey, self.question, self.option = create_survey()
+        self.url = reverse('surveys:survey_submit', kwargs={'code': self.survey.code})
+
+    def submit(self, email, forwarded_for='203.0.113.7'):
+        return self.client.post(
+            self.url, submission_payload(self.question, self.option, email),
+            content_type='application/json', HTTP_X_FORWARDED_FOR=forwarded_for,
+        )
+
+    def test_email_budget(self):
+        self.submit('ciso@example.com')
+        self.submit('ciso@example.com')
+
+        response = self.submit('ciso@example.com')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(SurveySubmission.objects.count(), 2)
+        source = ThrottledSource.objects.get()
+        self.assertEqual((source.dimension, source.value), ('email', 'ciso@example.com'))
+
+    def test_ip_budget_ignores_spoofed_forwarded_for(self):
+        for i in range(3):
+            self.submit(f'user{i}@example.com', forwarded_for=f'10.0.0.{i}, 203.0.113.7')
+
+        response = self.submit('user9@example.com', forwarded_for='10.0.0.9, 203.0.113.7')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(ThrottledSource.objects.get().value, '203.0.113.7')
+        self.assertEqual(SurveySubmission.objects.get(prospect__email='user0@example.com').ip_address, '203.0.113.7')
+
+    def test_reset_limit_unblocks_the_source(self):
+        self.submit('ciso@example.com')
+        self.submit('ciso@example.com')
+        reset_limit('survey_submit', 'email', 'ciso@example.com')
+
+        self.assertEqual(self.submit('ciso@example.com').status_code, 200)
+
+    def test_retries_of_a_completed_submission_do_not_spend_the_budget(self):
+        for _ in range(4):
+            response = self.client.post(
+                self.url, submission_payload(self.question, self.option),
+                content_type='application/json', HTTP_X_FORWARDED_FOR='203.0.113.7',
+                HTTP_IDEMPOTENCY_KEY='e' * 32,
+            )
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(SurveySubmission.objects.count(), 1)
+        self.assertEqual(self.submit('ciso@example.com').status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMITS={'ENABLED': False})
+class SubmissionProcessingTests(TestCase):
+    """Responses are validated against the cached survey and saved in bulk."""
+
+    def setUp(self):
+        cache.clear()
+
+    def create_survey(self, question_count):
+        survey = Survey.objects.create(title='Diagnóstico', version=f'{question_count}.0')
+        section = SurveySection.objects.create(survey=survey, title='Gobierno', order=1, max_points=10)
+        responses = {}
+        for order in range(1, question_count + 1):
+            single = Question.objects.create(
+                survey=survey, section=section, question_text=f'Pregunta {order}',
+                question_type='SINGLE_CHOICE', order=order, max_points=10,
+            )
+            option = QuestionOption.objects.create(question=single, option_text='Sí', order=1, points=10)
+            responses[str(single.id)] = {'option_id': option.id}
+
+            multiple = Question.objects.create(
+                survey=survey, section=section, question_text=f'Controles {order}',
+                question_type='MULTIPLE_CHOICE', order=100 + order, max_points=10,
+            )
+            options = [
+                QuestionOption.objects.create(question=multiple, option_text=text, order=i, points=5)
+                for i, text in enumerate(['MFA', 'EDR'])
+            ]
+            responses[str(multiple.id)] = {'option_ids': [option.id for option in options]}
+        # Warm the compiled definition, as on a survey page view
+        SurveyDefinitionCache.get(survey.code)
+        return survey, responses
+
+    def submit(self, survey, responses, email='ciso@example.com'):
+        payload = {
+            'responses': responses,
+            'prospect': {'nombre': 'Ana Mora', 'empresa': 'ACME', 'email': email},
+        }
+        url = reverse('surveys:survey_submit', kwargs={'code': survey.code})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_questions(self):
+        small = self.submit(*self.create_survey(1), email='uno@example.com')
+        large = self.submit(*self.create_survey(10), email='diez@example.com')
+
+        self.assertEqual(small, large)
+        self.assertEqual(SurveySubmission.objects.get(prospect__email='diez@example.com').responses.count(), 20)
+
+    def test_invalid_payloads_are_rejected(self):
+        survey, responses = self.create_survey(1)
+        url = reverse('surveys:survey_submit', kwargs={'code': survey.code})
+        prospect = {'nombre': 'Ana Mora', 'empresa': 'ACME', 'email': 'ciso@example.com'}
+        payloads = {
+            'malformed JSON': '{"responses": ',
+            'no responses': json.dumps({'responses': {}, 'prospect': prospect}),
+            'no prospect': json.dumps({'responses': responses}),
+            'missing company': json.dumps({'responses': responses, 'prospect': {**prospect, 'empresa': ''}}),
+            'invalid email': json.dumps({'responses': responses, 'prospect': {**prospect, 'email': 'ana'}}),
+        }
+
+        for shape, payload in payloads.items():
+            with self.subTest(shape):
+                response = self.client.post(url, payload, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+        self.assertFalse(SurveySubmission.objects.exists())
@@ -1,71 +1,53 @@
 # surveys/views.py
 from django.shortcuts import render, get_object_or_404
 from django.views.generic import TemplateView, View
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.contrib import messages
 from django.db import transaction
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from core.page_cache import CachedPageMixin
+from core.ratelimit import check_limits, client_ip, rate_limited_response
 from prospects.models import Prospect
-from .models import Survey, SurveySubmission, Response, Question, QuestionOption
-from scoring.models import ScoreResult  # NUEVO IMPORT
+from .definitions import SurveyDefinitionCache
+from .idempotency import (
+    IdempotencyKeyError, claim_key, completed_key, get_idempotency_key, request_fingerprint,
+)
+from .models import SurveySubmission, Response
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
 
-class SurveyView(TemplateView):
-    """Vista principal para mostrar el survey"""
+class SurveyView(CachedPageMixin, TemplateView):
+    """
+    Vista principal para mostrar el survey.
+
+    El HTML es el mismo para todos los visitantes: se sirve desde el page
+    cache con clave por código y versión de la definición, así una edición
+    del survey genera una página nueva sin invalidar nada.
+    """
     template_name = 'surveys/survey.html'
+    page_cache_namespace = 'survey_page'
+    page_cache_varies_by_visitor = False
+    
+    def get_page_cache_parts(self):
+        code = self.kwargs.get('code')
+        return (code, SurveyDefinitionCache.get_version(code))
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Obtener el survey por código
-        code = kwargs.get('code')
-        survey = get_object_or_404(Survey, code=code, is_active=True)
-        
-        # Obtener todas las preguntas activas del survey
-        questions = survey.get_active_questions()
-        
-        # Organizar preguntas en grupos para el SPA (dinámico)
-        questions_list = list(questions)
-        total_questions = len(questions_list)
-        
-        # Calcular grupos dinámicamente
-        if total_questions <= 5:
-            # Si hay 5 o menos preguntas, todo en un grupo
-            question_groups = [questions_list]
-        elif total_questions <= 10:
-            # Si hay 6-10 preguntas, dividir en 2 grupos
-            mid = total_questions // 2
-            question_groups = [
-                questions_list[:mid],
-                questions_list[mid:]
-            ]
-        else:
-            # Si hay más de 10 preguntas, dividir en 3 grupos
-            # Distribuir lo más equitativamente posible
-            group_size = total_questions // 3
-            remainder = total_questions % 3
-            
-            # Calcular tamaños de grupos
-            sizes = [group_size] * 3
-            for i in range(remainder):
-                sizes[i] += 1
-            
-            # Crear grupos
-            start = 0
-            question_groups = []
-            for size in sizes:
-                question_groups.append(questions_list[start:start + size])
-                start += size
+        # Definición compilada del survey (preguntas activas, opciones y grupos)
+        survey = SurveyDefinitionCache.get(kwargs.get('code'))
+        if survey is None or not survey.is_active:
+            raise Http404("Survey no encontrado")
         
         context.update({
             'survey': survey,
-            'question_groups': question_groups,
-            'total_questions': len(questions_list),
+            'question_groups': survey.question_groups,
+            'total_questions': survey.total_questions,
         })
         
         return context
@@ -76,11 +58,33 @@ class SurveySubmitView(View):
     
     def post(self, request, code):
         try:
-            # Obtener el survey
-            survey = get_object_or_404(Survey, code=code, is_active=True)
+            # Clave de idempotencia generada por el cliente (ver surveys/idempotency.py)
+            idempotency_key = get_idempotency_key(request)
             
             # Parsear datos JSON del request
             data = json.loads(request.body)
+            
+            # Un reintento de un envío ya procesado devuelve su respuesta
+            # guardada sin gastar el límite de solicitudes
+            if idempotency_key:
+                key_record = completed_key(idempotency_key, request_fingerprint(code, data))
+                if key_record:
+                    return self.replay(key_record)
+            
+            # Límite por IP antes de cualquier trabajo (ver core/ratelimit.py)
+            ip_address = self.get_client_ip(request)
+            retry_after = check_limits('survey_submit', ip=ip_address)
+            if retry_after:
+                return rate_limited_response(retry_after)
+            
+            # Obtener la definición compilada del survey
+            survey = SurveyDefinitionCache.get(code)
+            if survey is None or not survey.is_active:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Survey no encontrado'
+                }, status=404)
+            
             logger.info(f"Survey submission received for {code}: {data}")
             
             # Validar que tenemos respuestas y datos del prospect
@@ -111,8 +115,22 @@ class SurveySubmitView(View):
                     'message': 'Por favor ingrese un email válido'
                 }, status=400)
             
+            # Límite por email: evita enviar reportes a direcciones ajenas en masa
+            retry_after = check_limits('survey_submit', email=email)
+            if retry_after:
+                return rate_limited_response(retry_after)
+            
             # Procesar todo en una transacción
             with transaction.atomic():
+                # Reclamar la clave: un reintento con la misma clave espera a
+                # que el primero confirme y devuelve su respuesta guardada
+                if idempotency_key:
+                    key_record, claimed = claim_key(
+                        idempotency_key, survey.id, request_fingerprint(code, data)
+                    )
+                    if not claimed:
+                        return self.replay(key_record)
+                
                 # Crear o actualizar prospect
                 prospect, created = Prospect.objects.get_or_create(
                     email=email,
@@ -138,62 +156,37 @@ class SurveySubmitView(View):
                 # Crear survey submission
                 submission = SurveySubmission.objects.create(
                     prospect=prospect,
-                    survey=survey,
+                    survey_id=survey.id,
                     completed_at=timezone.now(),
-                    ip_address=self.get_client_ip(request)
+                    ip_address=ip_address
                 )
                 
                 # Procesar respuestas
-                self.process_responses(submission, responses_data)
+                self.process_responses(submission, survey, responses_data)
                 
-                # 🎯 NUEVO: Calcular scoring automáticamente
-                try:
-                    score_result = ScoreResult.calculate_for_submission(submission)
-                    logger.info(f"Score calculated - Total: {score_result.total_points}, Percentage: {score_result.score_percentage}%, Risk: {score_result.risk_level}")
-                    
-                    # Incluir información del scoring en la respuesta
-                    scoring_info = {
-                        'total_points': score_result.total_points,
-                        'score_percentage': float(score_result.score_percentage),
-                        'risk_level': score_result.risk_level,
-                        'risk_level_display': score_result.get_risk_level_display(),
-                        'primary_package': score_result.primary_package,
-                        'secondary_package': score_result.secondary_package,
-                        'description': score_result.get_risk_level_display_with_description()
-                    }
-                    
-                except Exception as scoring_error:
-                    logger.error(f"Error calculating score: {str(scoring_error)}", exc_info=True)
-                    # No fallar la submission por error de scoring
-                    scoring_info = None
+                # El scoring, el PDF y el email se procesan en background
+                # (ver scoring.signals y manage.py run_workers)
                 
                 logger.info(f"Survey submission completed - ID: {submission.id}")
-            
-            # Respuesta exitosa con información de scoring
-            response_data = {
-                'success': True,
-                'message': '¡Gracias por completar nuestro diagnóstico de ciberseguridad! Nuestro equipo analizará sus respuestas y se pondrá en contacto en las próximas 24 horas para agendar una consulta personalizada donde revisaremos los resultados juntos.'
-            }
-            
-            # Agregar información de scoring si está disponible
-            if scoring_info:
-                response_data['scoring'] = scoring_info
                 
-                # Personalizar mensaje según risk level
-                risk_messages = {
-                    'CRITICAL': '¡Gracias por completar nuestro diagnóstico! Los resultados muestran áreas que requieren atención inmediata. Nuestro equipo se pondrá en contacto hoy mismo para agendar una consulta urgente.',
-                    'HIGH': '¡Gracias por completar nuestro diagnóstico! Identificamos riesgos significativos que debemos abordar pronto. Nos comunicaremos en las próximas 24 horas.',
-                    'MODERATE': '¡Gracias por completar nuestro diagnóstico! Su empresa tiene una base sólida con algunas áreas de mejora. Nos pondremos en contacto para revisar las oportunidades de optimización.',
-                    'GOOD': '¡Gracias por completar nuestro diagnóstico! Su empresa mantiene buenas prácticas de seguridad. Nos comunicaremos para mostrarle cómo optimizar aún más su postura.',
-                    'EXCELLENT': '¡Felicitaciones! Su empresa mantiene excelentes prácticas de seguridad. Nos pondremos en contacto para discutir estrategias de mantenimiento y optimización continua.'
+                # Respuesta exitosa
+                response_data = {
+                    'success': True,
+                    'message': '¡Gracias por completar nuestro diagnóstico de ciberseguridad! Nuestro equipo analizará sus respuestas y se pondrá en contacto en las próximas 24 horas para agendar una consulta personalizada donde revisaremos los resultados juntos.'
                 }
                 
-                custom_message = risk_messages.get(scoring_info['risk_level'])
-                if custom_message:
-                    response_data['message'] = custom_message
+                if idempotency_key:
+                    key_record.complete(submission, 200, response_data)
             
             return JsonResponse(response_data)
             
+        except IdempotencyKeyError as e:
+            logger.warning(f"Idempotency key rejected for {code}: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=422)
+            
         except json.JSONDecodeError:
             logger.error("Error parsing JSON data")
             return JsonResponse({
@@ -215,68 +208,89 @@ class SurveySubmitView(View):
                 'message': 'Error procesando su solicitud. Por favor intente nuevamente.'
             }, status=500)
     
-    def process_responses(self, submission, responses_data):
-            """Procesar y guardar las respuestas del survey"""
-            for question_id, response_data in responses_data.items():
-                try:
-                    question = Question.objects.get(
-                        id=question_id,
-                        survey=submission.survey,
-                        is_active=True
-                    )
-                    
-                    # Crear la respuesta
-                    response = Response.objects.create(
-                        submission=submission,
-                        question=question
-                    )
-                    
-                    # Procesar según el tipo de pregunta
-                    if question.question_type == 'SINGLE_CHOICE':
-                        option_id = response_data.get('option_id')
-                        if option_id:
-                            option = QuestionOption.objects.get(
-                                id=option_id,
-                                question=question,
-                                is_active=True
-                            )
-                            response.selected_option = option
+    def replay(self, key_record):
+        """Respuesta guardada de un envío ya procesado con la misma clave."""
+        if not key_record.is_complete:
+            response = JsonResponse({
+                'success': False,
+                'message': 'Su envío se está procesando. Por favor espere unos segundos.'
+            }, status=409)
+            response['Retry-After'] = '2'
+            return response
+        
+        logger.info(f"Survey submission replayed - Key: {key_record.key}, ID: {key_record.submission_id}")
+        response = JsonResponse(key_record.response_body, status=key_record.response_status)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+    
+    def process_responses(self, submission, survey, responses_data):
+        """
+        Procesar y guardar las respuestas del survey en lote.
+        
+        Valida el payload completo contra la definición compilada del survey
+        (sin queries) y persiste las respuestas con bulk_create, de modo que
+        el costo en queries no depende del número de preguntas.
+        """
+        responses = []
+        selected_options = []
+        
+        for question_id, response_data in responses_data.items():
+            try:
+                question = survey.get_question(int(question_id))
+            except (TypeError, ValueError):
+                question = None
+            if question is None:
+                logger.warning(f"Question {question_id} not found or inactive")
+                continue
+            
+            response = Response(submission=submission, question_id=question.id)
+            options = []
+            
+            try:
+                # Procesar según el tipo de pregunta
+                if question.question_type == 'SINGLE_CHOICE':
+                    option_id = response_data.get('option_id')
+                    if option_id:
+                        option = question.get_option(int(option_id))
+                        if option is None:
+                            logger.warning(f"Option not found for question {question_id}")
+                        else:
+                            response.selected_option_id = option.id
                             response.points_earned = option.points
-                            response.save()
-                    
-                    elif question.question_type == 'MULTIPLE_CHOICE':
-                        option_ids = response_data.get('option_ids', [])
-                        if option_ids:
-                            options = QuestionOption.objects.filter(
-                                id__in=option_ids,
-                                question=question,
-                                is_active=True
-                            )
-                            response.save()  # Guardar primero para poder usar M2M
-                            response.selected_options.set(options)
-                            
-                            # NUEVA LÓGICA FLEXIBLE: Calcular puntos para multiple choice
-                            response.points_earned = self._calculate_multiple_choice_points(options)
-                            response.save()
-                    
-                    elif question.question_type in ['TEXT', 'EMAIL']:
-                        text_value = response_data.get('text', '').strip()
-                        response.text_response = text_value
-                        response.save()
-                    
-                    logger.info(f"Response saved for question {question.id}: {response_data}")
-                    
-                except Question.DoesNotExist:
-                    logger.warning(f"Question {question_id} not found or inactive")
-                    continue
-                except QuestionOption.DoesNotExist:
-                    logger.warning(f"Option not found for question {question_id}")
-                    continue
-                except Exception as e:
-                    logger.error(f"Error processing response for question {question_id}: {str(e)}")
-                    continue
+                
+                elif question.question_type == 'MULTIPLE_CHOICE':
+                    option_ids = response_data.get('option_ids', [])
+                    if option_ids:
+                        requested_ids = {int(option_id) for option_id in option_ids}
+                        options = [
+                            option for option in question.options
+                            if option.id in requested_ids
+                        ]
+                        response.points_earned = self._calculate_multiple_choice_points(question, options)
+                
+                elif question.question_type in ['TEXT', 'EMAIL']:
+                    response.text_response = response_data.get('text', '').strip()
+            
+            except Exception as e:
+                logger.error(f"Error processing response for question {question_id}: {str(e)}")
+                options = []
+            
+            responses.append(response)
+            selected_options.append(options)
+        
+        # Persistir todas las respuestas y sus opciones múltiples en lote
+        Response.objects.bulk_create(responses)
+        
+        SelectedOption = Response.selected_options.through
+        SelectedOption.objects.bulk_create([
+            SelectedOption(response_id=response.id, questionoption_id=option.id)
+            for response, options in zip(responses, selected_options)
+            for option in options
+        ])
+        
+        logger.info(f"{len(responses)} responses saved for submission {submission.id}")
     
-    def _calculate_multiple_choice_points(self, selected_options):
+    def _calculate_multiple_choice_points(self, question, selected_options):
         """
         Calcula puntos para preguntas de multiple choice con lógica flexible.
         
@@ -298,12 +312,9 @@ class SurveySubmitView(View):
         # Si no hay opciones exclusivas, usar lógica normal o especial
         elif non_exclusive_options:
             # Detectar si es la pregunta especial de datos sensibles (pregunta 3, sección 1)
-            first_option = non_exclusive_options[0]
-            question = first_option.question
-            
             if (question.order == 3 and 
                 question.section.order == 1 and 
-                any("información sensible" in opt.option_text.lower() for opt in question.options.all())):
+                any("información sensible" in opt.option_text.lower() for opt in question.options)):
                 
                 # Lógica especial para pregunta de datos sensibles
                 num_selected = len(non_exclusive_options)
@@ -320,10 +331,5 @@ class SurveySubmitView(View):
         return 0
     
     def get_client_ip(self, request):
-        """Obtener la IP del cliente"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
\ No newline at end of file
+        """Obtener la IP del cliente (la agregada por el proxy, no la declarada por el cliente)"""
+        return client_ip(request)
\ No newline at end of file